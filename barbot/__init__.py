@@ -2,9 +2,22 @@
 
 import logging
 
-logging.basicConfig(
-    level=logging.INFO, format='[%(asctime)s]: %(message)s',
-    datefmt='%d.%m.%Y %I:%M:%S'
-)
-logging.getLogger('requests').setLevel(logging.CRITICAL)
-logger = logging.getLogger()
+logger = logging.getLogger('barbot')
+logger.addHandler(logging.NullHandler())
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Print messages of bot to console.
+
+    Logging is not configured on import, so applications which use
+    `barbot` as library keep their own settings.
+
+    :param level (optional): level of messages.
+    """
+    logging.basicConfig(
+        level=level, format='[%(asctime)s]: %(message)s',
+        datefmt='%d.%m.%Y %I:%M:%S'
+    )
+    logging.getLogger('requests').setLevel(logging.CRITICAL)
+    logger.setLevel(level)
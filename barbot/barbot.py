@@ -1,34 +1,165 @@
 # coding=utf-8
 
-import importlib
-
-import configobj
-from lxml import html
-import requests
-import randua
-import dotmap
+import os
+import re
+import time
+import collections
+
+from . import (
+    cache, utils, logger, decorators, constants, exceptions, games, graph,
+    history, maintenance, selectors
+)
+from .utils import configobj, html, validate
+from .metrics import Metrics
+
+# Names of sides of heroes in names of files.
+SIDES = {constants.NORTH: 'north', constants.SOUTH: 'south'}
+
+requests = utils.LazyModule('requests')
+randua = utils.LazyModule('randua')
+transports = utils.LazyModule('barbot.transports')
+
+
+# Options which are hidden in representation of settings.
+SECRETS = ('password',)
+
+_sections = {}  # Classes of sections by name and options.
+
+
+def _get_section_class(name, options):
+    """
+    Get immutable class of section of settings.
+
+    :param name: name of section.
+    :param options: `tuple` of names of options.
+    :returns: subclass of `collections.namedtuple`.
+    """
+    key = (name, options)
+    cls = _sections.get(key)
+    if cls is None:
+        base = collections.namedtuple(name.title(), options)
+        cls = _sections[key] = type(base.__name__, (base,), {
+            '__slots__': (), '__repr__': _format_section,
+        })
+    return cls
+
+
+def _format_section(section):
+    """Represent section of settings with hidden secrets."""
+    return '{}({})'.format(type(section).__name__, ', '.join(
+        '{}={!r}'.format(option, '***' if option in SECRETS else value)
+        for option, value in zip(section._fields, section)
+    ))
+
+
+def _get_section(name, values):
+    """
+    Create immutable section of settings.
+
+    :param name: name of section.
+    :param values: `dict` of options.
+    :returns: section instance.
+    """
+    options = tuple(sorted(values))
+    return _get_section_class(name, options)(
+        *[values[option] for option in options]
+    )
+
+
+def _freeze(configuration, configspec):
+    """
+    Compile `dict` of settings to immutable sections.
+
+    :param configuration: `dict` of validated settings.
+    :param configspec: `dict` of configspec.
+    :returns: section instance with sections, sections of many
+        subsections (like `accounts`) are `dict` of sections by name.
+    """
+    sections = {}
+    for name, values in configuration.items():
+        if '__many__' in configspec.get(name, {}):
+            sections[name] = {
+                key: _get_section(name, value) for key, value in values.items()
+            }
+        else:
+            sections[name] = _get_section(name, values)
+    return _get_section('configuration', sections)
+
+
+def _check(configuration):
+    """
+    Check relations between options which configspec does not check.
+
+    :param configuration: `dict` of validated settings.
+    :raises: `exceptions.SettingsError` if settings are not consistent.
+    """
+    for name, account in configuration['accounts'].items():
+        if not account.get('username') or not account.get('password'):
+            raise exceptions.SettingsError(
+                u'Account {} needs username and password.'.format(name)
+            )
+
+    fleet = configuration['fleet']
+    if fleet['max_backoff'] < fleet['backoff']:
+        raise exceptions.SettingsError(
+            'Option fleet.max_backoff is less than fleet.backoff.'
+        )
 
-from . import utils, logger, decorators, constants
+    templates = (
+        ('metrics', {'worker': 0}), ('journal', {'worker': 0}),
+        ('graph', {'side': 'north'}),
+    )
+    for section, fields in templates:
+        try:
+            configuration[section]['filename'].format(**fields)
+        except (KeyError, IndexError, ValueError):
+            raise exceptions.SettingsError(
+                u'Option {}.filename may contain only {{{}}}.'.format(
+                    section, u'}, {'.join(fields)
+                )
+            )
 
 
 class Settings(object):
 
-    """Class for keep settings from configuration file."""
+    """
+    Class for keep settings from configuration file.
+
+    Settings are compiled to immutable sections (named tuples), so access
+    to option is access to attribute of tuple. `reload` replaces all
+    sections at once when file is changed, sections taken before reload
+    keep old values.
+    """
 
-    def __init__(self, filename):
+    __slots__ = ('_filename', '_configuration', '_mtime', '_checked',
+                 'check_interval')
+
+    def __init__(self, filename, check_interval=5):
         """
         Initialization class.
 
         :param filename: path to configuration file.
+        :param check_interval (optional): min seconds between checks of
+            change of file.
+        :raises: `exceptions.SettingsError` if settings are not valid.
         """
         self._filename = filename
-        self._configuration = dotmap.DotMap(self._get_from_file(filename))
+        self._mtime = self._get_mtime()
+        self._configuration = _freeze(
+            self._get_from_file(filename), utils.get_configspec()
+        )
+        self._checked = time.time()
+        self.check_interval = check_interval
 
     def __getattr__(self, attr):
-        try:
-            return self.__dict__[attr]
-        except KeyError:
-            return getattr(self._configuration, attr)
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._configuration, attr)
+
+    def __repr__(self):
+        return 'Settings({!r}, {!r})'.format(
+            self._filename, self._configuration
+        )
 
     @staticmethod
     def _get_from_file(filename, configspec=utils.get_configspec()):
@@ -37,26 +168,163 @@ class Settings(object):
 
         :param filename: path to configuration file.
         :returns: `dict` of settings.
+        :raises: `exceptions.SettingsError` if value of option is not valid,
+            option is unknown or settings are not consistent.
+        """
+        try:
+            configuration = configobj.ConfigObj(
+                filename, configspec=configspec
+            )
+        except configobj.ConfigObjError as e:
+            raise exceptions.SettingsError(u'{}'.format(e))
+
+        result = configuration.validate(
+            validate.Validator(), preserve_errors=True
+        )
+        for sections, option, error in configobj.flatten_errors(
+                configuration, result):
+            if error is not False:  # Missing options are `None`.
+                raise exceptions.SettingsError(u'Option {}: {}.'.format(
+                    '.'.join(sections + [option or '']), error
+                ))
+
+        extra = configobj.get_extra_values(configuration)
+        if extra:
+            raise exceptions.SettingsError(u'Unknown options: {}.'.format(
+                u', '.join('.'.join(sections + (option,))
+                           for sections, option in extra)
+            ))
+
+        values = configuration.dict()
+        for section, options in configspec.items():
+            if '__many__' not in options:
+                for option in options:
+                    values[section].setdefault(option, None)
+        _check(values)
+        return values
+
+    def _get_mtime(self):
+        """Get time and size of last change of file."""
+        try:
+            stat = os.stat(self._filename)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def reload(self):
+        """
+        Reload settings if file is changed.
+
+        File is checked at most once per `check_interval` seconds. Not
+        valid file is logged and skipped, old settings are kept.
+
+        :returns: `True` if settings are reloaded.
         """
-        return configobj.ConfigObj(filename, configspec=configspec).dict()
+        now = time.time()
+        if now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+
+        mtime = self._get_mtime()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            configuration = _freeze(
+                self._get_from_file(self._filename), utils.get_configspec()
+            )
+        except exceptions.SettingsError as e:
+            logger.info(u'Settings are not reloaded: {}'.format(e))
+            return False
+
+        self._configuration = configuration
+        return True
 
 
 class Account(object):
 
     """Class for actions with user data."""
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, transport=None, cache=None,
+                 metrics=None):
         """
         Initialization class.
 
         :param username: Username on barbars.ru.
         :param password: Password on barbars.ru.
+        :param transport (optional): section `transport` of settings.
+        :param cache (optional): `cache.SessionCache` instance.
+        :param metrics (optional): `metrics.Metrics` instance for latency
+            of requests.
         """
         self._username = username
         self._password = password
+        self._cache = cache
+        self._response = None  # Response of last login.
+        self._user_response = None  # Hero page from check of login.
+        self.is_expired = False  # Request was redirected to login.
 
         self._session = requests.Session()
         self._session.headers.update({'User-Agent': randua.generate()})
+        self._session.hooks['response'].append(self._check_expired)
+        if metrics is not None:
+            self._session.hooks['response'].append(metrics.hook)
+        if transport is not None:
+            transports.configure(self._session, transport)
+
+    def _check_expired(self, response, *args, **kwargs):
+        """Invalidate session if response redirects to login."""
+        location = response.headers.get('Location', '') if (
+            response.is_redirect) else ''
+        if re.search(r'(?:^|/)login\b', location):
+            self.is_expired = True
+            if self._cache is not None:
+                self._cache.invalidate(self._username, self._password)
+
+    def restore(self):
+        """
+        Restore session from cache.
+
+        :returns: `dict` of information about hero or `None` if no valid
+            session in cache.
+        """
+        if self._cache is None:
+            return None
+
+        entry = self._cache.get(self._username, self._password)
+        if entry is None:
+            return None
+
+        for cookie in entry['session']['cookies']:
+            self._session.cookies.set(**cookie)
+        self._session.headers.update(entry['session']['headers'])
+        self.is_expired = False
+
+        return entry['hero']
+
+    def save(self, hero):
+        """
+        Save session to cache.
+
+        :param hero: `dict` of information about hero.
+        """
+        if self._cache is None:
+            return
+
+        session = {
+            'cookies': [
+                {
+                    'name': cookie.name, 'value': cookie.value,
+                    'domain': cookie.domain, 'path': cookie.path,
+                }
+                for cookie in self._session.cookies
+            ],
+            'headers': {
+                'User-Agent': self._session.headers['User-Agent'],
+            },
+        }
+        self._cache.set(self._username, self._password, session, hero)
 
     def authentication(self):
         """
@@ -69,7 +337,8 @@ class Account(object):
         )
         data = {'login': self._username, 'password': self._password}
 
-        self._session.post(url, data=data)
+        self.is_expired = False
+        self._response = self._session.post(url, data=data)
 
         return self._session
 
@@ -78,23 +347,83 @@ class Account(object):
         """
         Check authentication on barbars.ru.
 
+        Successful login redirects to hero page, so response of last login
+        is checked instead of request of hero page.
+
         :returns: `bool`.
         """
-        response = self._session.get(utils.build_url('user'))
-        return response.url == utils.build_url('user')
+        response, self._response = self._response, None
+        if response is None:
+            response = self._session.get(utils.build_url('user'))
+
+        if response.url != utils.build_url('user'):
+            return False
+
+        self._user_response = response
+        return True
+
+    def get_user_page(self):
+        """
+        Get hero page received by last check of authentication.
+
+        :returns: `lxml.html` instance or `None` if there is no page.
+        """
+        response, self._user_response = self._user_response, None
+        if response is None:
+            return None
+        return html.fromstring(response.content)
+
+
+def get_status(page):
+    """
+    Get health and energy points and tire from hero or game page.
+
+    :param page: `lxml.html` instance.
+    :returns: `tuple` of health points, energy points and tire or `None`
+        if page has no status.
+    """
+    blocks = selectors.STATUS(page)
+    if len(blocks) < 2:
+        return None
+    return int(blocks[0]), int(blocks[1]), selectors.TIRE(page)
 
 
 class Hero(object):
 
     """Class for actions with hero."""
 
-    def __init__(self, session):
+    __slots__ = (
+        '_session', '_status_ttl', '_streaming', '_chunk_size',
+        '_status_time', '_tired', '_id', '_name', '_side', '_class',
+        '_level', '_metrics', '_pages', 'hp', 'ep', 'history',
+    )
+
+    # Footer follows every needed part of page (information, status, tire).
+    stream_stop = re.compile(r'<div class="footer"')
+
+    def __init__(self, session, status_ttl=60, streaming=False,
+                 chunk_size=4096, history_size=1024, metrics=None,
+                 pages=None):
         """
         Initialization class.
 
         :param session: `requests.Session` instance with authentication.
+        :param status_ttl (optional): seconds before refetch of hero page.
+        :param streaming (optional): parse responses while they are received.
+        :param chunk_size (optional): `int` size of chunk for streaming.
+        :param history_size (optional): `int` count of turns in history.
+        :param metrics (optional): `metrics.Metrics` instance.
+        :param pages (optional): `cache.PageCache` instance for reuse of
+            parsed pages and status.
         """
         self._session = session
+        self._status_ttl = status_ttl
+        self._streaming = streaming
+        self._chunk_size = chunk_size
+        self._status_time = 0
+        self._tired = None
+        self._metrics = metrics if metrics is not None else Metrics()
+        self._pages = pages
 
         self._id = int(self._session.cookies['id'])
         self._name = None
@@ -104,6 +433,7 @@ class Hero(object):
 
         self.hp = None  # Health points.
         self.ep = None  # Energy points.
+        self.history = history.History(history_size)  # State per turn.
 
     def _get_hero_page(self):
         """
@@ -111,23 +441,29 @@ class Hero(object):
 
         :returns: `lxml.html` instance.
         """
-        return html.fromstring(
-            self._session.get(utils.build_url('user')).content
-        )
+        with self._metrics.span('hero_page'):
+            return utils.get_page(
+                self._session, utils.build_url('user'), self._streaming,
+                self._chunk_size, self.stream_stop, self._pages,
+                self._metrics
+            )
 
-    def _update_information(self):
+    def _update_information(self, page=None):
         """
-        Update information about hero.
+        Update information and status of hero.
 
+        :param page (optional): `lxml.html` instance of hero page, by default
+            page is fetched.
         :returns: `bool`.
         """
-        page = self._get_hero_page()
+        if page is None:
+            page = self._get_hero_page()
+        self._update_status(page, hero_page=True)
 
-        blocks = page.xpath((
-            '//*[contains(img/@src, "blue_") or contains(img/@src, "red_")]'
-            '//span/text()'
-        ))
-        blocks = [utils.remove_spaces(block, 0) for block in blocks]
+        blocks = [
+            utils.remove_spaces(block, 0)
+            for block in selectors.HERO_BLOCKS(page)
+        ]
 
         self._name = blocks[0]
         self._level = int(blocks[1])
@@ -136,18 +472,59 @@ class Hero(object):
 
         return True
 
-    def _update_status(self, page):
+    @property
+    def information(self):
         """
-        Get health and energy points.
+        Get information about hero.
 
-        :param page: `lxml.html` instance.
-        :returns: `bool`.
+        :returns: `dict` with name, level, class and side.
         """
-        blocks = page.xpath('//*[contains(img/@src, "life")]/span/text()')
+        return {
+            'name': self._name,
+            'level': self._level,
+            'class': self._class,
+            'side': self._side,
+        }
 
-        self.hp = int(blocks[0])
-        self.ep = int(blocks[1])
+    @information.setter
+    def information(self, information):
+        """
+        Set information about hero, for example from cache.
+
+        :param information: `dict` with name, level, class and side.
+        """
+        self._name = information['name']
+        self._level = information['level']
+        self._class = information['class']
+        self._side = information['side']
 
+    def _update_status(self, page, hero_page=False):
+        """
+        Get health and energy points and tire from hero or game page.
+
+        Tire is known to be shown on hero page, so only hero page makes
+        status fresh for `status_ttl` seconds and clears tire. Tire link of
+        game page is taken too.
+
+        :param page: `lxml.html` instance.
+        :param hero_page (optional): page is hero page.
+        :returns: `True` if page contains status else `False`.
+        """
+        if self._pages is None:
+            status = get_status(page)
+        else:
+            status = self._pages.memoize(page, 'status', get_status)
+
+        if status is None:
+            self._tired = None
+            return False
+
+        self.hp, self.ep, tired = status
+        if hero_page:
+            self._tired = tired
+            self._status_time = time.time()
+        elif tired:
+            self._tired = True
         return True
 
     def repair_equipment(self, check=False):
@@ -161,7 +538,7 @@ class Hero(object):
         response = self._session.get(url)
         page = html.fromstring(response.content)
 
-        link = page.xpath('//a[contains(@href, "repairLink")]/@href')
+        link = selectors.REPAIR_HREF(page)
         if check:
             return bool(link)
 
@@ -175,72 +552,190 @@ class Hero(object):
         """
         Check tire of hero.
 
+        Tire is taken from hero page and from tire link of game pages. Hero
+        page is fetched when last page has no status or last hero page is
+        older than `status_ttl` seconds.
+
         :returns: `bool`.
         """
-        page = self._get_hero_page()
-        link = page.xpath('//a[contains(@href, "tire")]')
+        self._refresh_status()
+        return bool(self._tired)
+
+    def _refresh_status(self, ahead=0):
+        """
+        Fetch hero page if status is absent or expires in `ahead` seconds.
 
-        return bool(link)
+        :param ahead (optional): seconds before status is used.
+        :returns: `True` if hero page is fetched else `False`.
+        """
+        if self._tired is not None and (
+                time.time() + ahead - self._status_time <= self._status_ttl):
+            return False
+
+        self._update_status(self._get_hero_page(), hero_page=True)
+        return True
 
 
 class Bot(object):
 
     """Bot interface class."""
 
-    def __init__(self, filename):
+    def __init__(self, filename, account=None):
         """
         Initialization class.
 
         :param filename: path to configuration file.
+        :param account (optional): name of account in section `accounts`,
+            by default account from section `account` is used.
+        :raises: `exceptions.AuthenticationError` if login failed.
         """
         self._settings = Settings(filename)
-        print(self._settings._configuration)
+
+        if account is None:
+            account = self._settings.account
+        else:
+            account = self._settings.accounts[account]
+
+        self.metrics = Metrics(account.username)
+
+        self._pages = None
+        if self._settings.parser.page_cache:
+            self._pages = cache.PageCache(
+                self._settings.parser.page_cache, self.metrics
+            )
+
+        session_cache = None
+        if self._settings.cache.enabled:
+            session_cache = cache.SessionCache(
+                self._settings.cache.directory, self._settings.cache.ttl
+            )
 
         self._account = Account(
-            self._settings.account.username, self._settings.account.password
+            account.username, account.password, self._settings.transport,
+            session_cache, self.metrics
+        )
+        self._session = self._account._session
+        self._game = None
+        self.journal = None  # `journal.Journal` shared by bots of process.
+
+        information = self._account.restore()
+        if information is None:
+            self._login()
+        else:
+            logger.info('Session is restored from cache.')
+            self._create_hero()
+            self.hero.information = information
+
+        # Chores in pause between turns.
+        self.maintenance = maintenance.get_maintenance(
+            self, self._settings.maintenance
+        )
+
+    def reload_settings(self):
+        """
+        Apply changed settings between turns without new login.
+
+        Status of hero and chores are changed at once, pacing is changed by
+        owner of pacer. Account, transport, cache and parser need restart.
+
+        :returns: `True` if settings are reloaded.
+        """
+        chores = self._settings.maintenance
+        if not self._settings.reload():
+            return False
+
+        self.hero._status_ttl = self._settings.hero.status_ttl
+        if self._settings.maintenance != chores:
+            self.maintenance = maintenance.get_maintenance(
+                self, self._settings.maintenance
+            )
+
+        logger.info('Settings are reloaded.')
+        return True
+
+    def _create_hero(self):
+        """Create hero for session of account."""
+        self.hero = Hero(
+            session=self._session,
+            status_ttl=self._settings.hero.status_ttl,
+            streaming=self._settings.parser.streaming,
+            chunk_size=self._settings.parser.chunk_size,
+            history_size=self._settings.hero.history_size,
+            metrics=self.metrics, pages=self._pages
         )
 
+    def _login(self):
+        """
+        Authenticate account, get information about hero and save session.
+
+        :raises: `exceptions.AuthenticationError` if login failed.
+        """
         logger.info('Authentication...')
+        self.metrics.increment('logins')
 
         self._account.authentication()
         if not self._account.is_authenticated:
-            logger.info('Incorrect login or password.')
-            exit()
-
-        self._session = self._account._session
+            raise exceptions.AuthenticationError(
+                'Incorrect login or password.'
+            )
 
-        self.hero = Hero(session=self._session)
+        self._create_hero()
 
         logger.info('Getting information about the hero...')
 
-        self.hero._update_information()
-
-        self._game = None
+        self.hero._update_information(self._account.get_user_page())
+        self._account.save(self.hero.information)
 
     def change_game(self, name):
         """
         Change game mode.
 
-        Available game modes: `towers`.
+        Available game modes: `towers`. Graph of locations of game is kept
+        in file from section `graph`, `{side}` is replaced by `north` or
+        `south`.
 
         :param name: name of game mode.
-        :returns: True if successfuly changed.
-        """
-        try:
-            module = importlib.import_module('barbot.games.{}'.format(name))
-            self._game = module.GAME(self._session)
-        except (ImportError, AttributeError):
-            logger.info('No available game named {}.'.format(name))
-            exit()
+        :raises: `exceptions.GameError` if no game with this name.
+        """
+        self.save_graph()  # Locations learned in previous game.
+        if self._pages is not None:
+            self._pages.clear()  # Extracted data is bound to game.
+        self._game = games.get_game(name)(
+            self._session, self._settings.parser.streaming,
+            self._settings.parser.chunk_size, pages=self._pages,
+            metrics=self.metrics
+        )
+
+        filename = self._settings.graph.filename
+        if filename and getattr(self._game, 'graph', None) is not None:
+            side = SIDES.get(self.hero._side, 'unknown')
+            self._game.graph = graph.LocationGraph(filename.format(side=side))
 
     @decorators.game
     def entry(self):
         """
         Enter to current game.
 
+        Session is authenticated again if it was expired.
+
         :returns: `lxml.html` instance.
         """
-        return self._game.entry()
+        if self._account.is_expired:
+            self._login()
+
+        self.metrics.increment('entries')
+        try:
+            with self.metrics.span('entry'):
+                page = self._game.entry()
+        except Exception:
+            if not self._account.is_expired:
+                raise
+            self._login()
+            page = self._game.entry()
+
+        self.hero._update_status(page)
+        self._record()
+        return page
 
     @decorators.game
     def get_actions(self):
@@ -249,7 +744,8 @@ class Bot(object):
 
         :returns: `dict` of actions.
         """
-        return self._game.get_actions()
+        with self.metrics.span('actions'):
+            return self._game.get_actions()
 
     @decorators.game
     def move(self, action):
@@ -259,7 +755,39 @@ class Bot(object):
         :param action: `str` action url.
         :returns: `lxml.html` instance.
         """
-        return self._game.move(action)
+        started = time.time()
+        with self.metrics.span('move'):
+            page = self._game.move(action)
+        latency = time.time() - started
+        self.metrics.increment('actions')
+        if self.maintenance is not None:
+            self.maintenance.count_action()
+            for name in self._game.get_signals():
+                self.maintenance.trigger(name)  # Run in next pause.
+        self.hero._update_status(page)
+        self._record(action, latency)
+        return page
+
+    def _record(self, action=None, latency=None):
+        """
+        Add state of hero after action to history and journal.
+
+        :param action (optional): `str` action url.
+        :param latency (optional): `float` seconds of request and parse of
+            action.
+        """
+        now = time.time()
+        name = utils.get_link_name(action)
+        self.hero.history.append(
+            now, self.hero.hp, self.hero.ep, self._game._location, name
+        )
+        if self.journal is not None and not self.journal.write({
+            'time': now, 'account': self.metrics.account,
+            'location': self._game._location, 'hp': self.hero.hp,
+            'ep': self.hero.ep, 'action': name, 'latency': latency,
+            'log': self._game.get_log_line(),
+        }):
+            self.metrics.increment('journal_dropped')  # Writer is behind.
 
     @decorators.game
     def get_action_log(self):
@@ -273,6 +801,24 @@ class Bot(object):
             self.hero.hp, self.hero.ep, self._game.get_action_log()
         )
 
+    def save_graph(self):
+        """
+        Save graph of locations learned in current game, it is called in
+        pause between turns and on leave of game. Errors are logged, graph
+        is saved again in next pause.
+
+        :returns: `True` if file of graph is written.
+        """
+        graph = getattr(self._game, 'graph', None)
+        if graph is None:
+            return False
+        try:
+            return graph.save()
+        except (IOError, OSError) as e:
+            logger.info(u'Graph is not saved: {}'.format(e))
+            return False
+
     def leave_game(self):
         """Leave game."""
         self._session.get(constants.HOST)
+        self.save_graph()
@@ -0,0 +1,336 @@
+# coding=utf-8
+"""
+Caches of bot.
+
+`SessionCache` keeps cookies and information about hero of every account
+on disk so restarted bot can reuse still valid session without login.
+
+`PageCache` keeps parsed pages of one bot in memory so same response is
+not parsed again, and data extracted from page (status, location, index
+of links, actions) is reused with it.
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import errno
+import hashlib
+import binascii
+import tempfile
+import collections
+
+from .utils import html
+
+
+class SessionCache(object):
+
+    """
+    Class for keep sessions of accounts in directory.
+
+    Every account is kept in own file named by hash of username, so many
+    processes can use one directory. File keeps salted hash of password
+    (PBKDF2), so changed password invalidates session and password can not
+    be found by lookup of hash.
+    """
+
+    iterations = 10000  # Iterations of PBKDF2 for hash of password.
+
+    def __init__(self, directory, ttl=3600):
+        """
+        Initialization class.
+
+        :param directory: path to directory of cache.
+        :param ttl (optional): seconds while session is valid.
+        """
+        self._directory = directory
+        self._ttl = ttl
+
+    def _get_path(self, username):
+        """Get path to file of account."""
+        key = u'{}'.format(username).encode('utf-8')
+        return os.path.join(
+            self._directory, hashlib.sha1(key).hexdigest() + '.json'
+        )
+
+    def _hash_password(self, password, salt):
+        """
+        Get salted hash of password.
+
+        :param password: password on barbars.ru.
+        :param salt: `str` hex salt.
+        :returns: `str` hex hash.
+        """
+        key = hashlib.pbkdf2_hmac(
+            'sha256', u'{}'.format(password).encode('utf-8'),
+            binascii.unhexlify(salt), self.iterations
+        )
+        return binascii.hexlify(key)
+
+    def get(self, username, password):
+        """
+        Get valid session of account.
+
+        :param username: username on barbars.ru.
+        :param password: password on barbars.ru.
+        :returns: `dict` with `session` and `hero` or `None`.
+        """
+        try:
+            with open(self._get_path(username)) as f:
+                entry = json.load(f)
+            salt, key = entry['salt'], entry['password']
+        except (IOError, ValueError, KeyError):
+            return None
+
+        if time.time() - entry.get('time', 0) > self._ttl:
+            return None
+        if not hmac.compare_digest(
+                self._hash_password(password, salt).decode('ascii'), key):
+            return None  # Password is changed.
+        return entry
+
+    def set(self, username, password, session, hero):
+        """
+        Save session of account.
+
+        :param username: username on barbars.ru.
+        :param password: password on barbars.ru.
+        :param session: `dict` of cookies and headers of session.
+        :param hero: `dict` of information about hero.
+        """
+        try:
+            os.makedirs(self._directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        salt = binascii.hexlify(os.urandom(16))
+        entry = {
+            'time': time.time(), 'salt': salt,
+            'password': self._hash_password(password, salt),
+            'session': session, 'hero': hero,
+        }
+        descriptor, filename = tempfile.mkstemp(dir=self._directory)
+        with os.fdopen(descriptor, 'w') as f:
+            json.dump(entry, f)
+        os.rename(filename, self._get_path(username))
+
+    def invalidate(self, username, password):
+        """
+        Remove session of account.
+
+        :param username: username on barbars.ru.
+        :param password: password on barbars.ru.
+        """
+        try:
+            os.remove(self._get_path(username))
+        except OSError:
+            pass
+
+
+class PageEntry(object):
+
+    """Class for keep parsed page and data extracted from it."""
+
+    __slots__ = ('page', 'key', 'parsed', 'counters', 'data')
+
+    def __init__(self, page, key, counters):
+        """
+        Initialization class.
+
+        :param page: `lxml.html` instance.
+        :param key: hash of body without volatile counters.
+        :param counters: `list` of volatile counters of body.
+        """
+        self.page = page
+        self.key = key
+        self.parsed = counters  # Counters of links of page.
+        self.counters = counters  # Counters of the last body.
+        self.data = {}  # Name of data -> value extracted from page.
+
+
+class PageCache(object):
+
+    """
+    Class for bounded in-memory cache of parsed pages.
+
+    Pages are found by hash of body of response without counters of
+    Wicket links (`interface=:<counter>:`) and by the counters. If only
+    counters are changed, page is not parsed again too: counters in
+    extracted data (strings in dicts, lists and tuples) are replaced by new
+    ones and other data is dropped. Links of page itself keep counters of
+    the first body, `translate` replaces them. The least recently used
+    pages are removed first.
+    """
+
+    volatile = re.compile(br'interface=:(\d+):')
+
+    def __init__(self, size=16, metrics=None):
+        """
+        Initialization class.
+
+        :param size (optional): `int` max count of pages.
+        :param metrics (optional): `metrics.Metrics` instance for counters
+            `page_hits`, `page_rewrites` and `page_misses`.
+        """
+        self._size = size
+        self._metrics = metrics
+        self._entries = collections.OrderedDict()  # Key -> entry.
+        self._pages = {}  # Id of page -> entry.
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, name):
+        """Increase counter of metrics."""
+        if self._metrics is not None:
+            self._metrics.increment(name)
+
+    def get(self, content):
+        """
+        Get parsed page by body of response, page is parsed on miss.
+
+        Returned page is shared with later calls, so it must not be
+        changed.
+
+        :param content: `str` body of response.
+        :returns: `lxml.html` instance.
+        """
+        counters = self.volatile.findall(content)
+        key = hashlib.sha1(
+            self.volatile.sub(b'interface=::', content)
+        ).digest()
+
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry  # The most recently used.
+            if entry.counters == counters:
+                self._count('page_hits')
+                return entry.page
+            if self._rewrite(entry, counters):
+                self._count('page_rewrites')
+                return entry.page
+            del self._entries[key]
+            del self._pages[id(entry.page)]
+
+        self._count('page_misses')
+        entry = PageEntry(html.fromstring(content), key, counters)
+        self._entries[key] = entry
+        self._pages[id(entry.page)] = entry
+        while len(self._entries) > self._size:
+            del self._pages[id(self._entries.popitem(last=False)[1].page)]
+        return entry.page
+
+    @classmethod
+    def _get_replace(cls, old, new):
+        """
+        Get function which replaces counters in string.
+
+        :returns: function or `None` if counters can not be mapped.
+        """
+        mapping = {}
+        for before, after in zip(old, new):
+            if mapping.setdefault(before, after) != after:
+                return None
+
+        def replace(value):
+            if 'interface=:' not in value:
+                return value
+            return cls.volatile.sub(
+                lambda match: 'interface=:{}:'.format(
+                    mapping.get(match.group(1), match.group(1))
+                ), value
+            )
+        return replace
+
+    @classmethod
+    def _translate(cls, value, replace):
+        """
+        Replace counters in strings of data.
+
+        :raises: `TypeError` if data has other objects.
+        """
+        if value is None or isinstance(value, (bool, int, long, float)):
+            return value
+        elif isinstance(value, basestring):
+            return replace(value)
+        elif type(value) is dict:
+            return {
+                key: cls._translate(item, replace)
+                for key, item in value.items()
+            }
+        elif type(value) in (list, tuple):
+            return type(value)(
+                cls._translate(item, replace) for item in value
+            )
+        raise TypeError('Data with counters can not be translated.')
+
+    def _rewrite(self, entry, counters):
+        """
+        Replace counters in extracted data of entry by new ones.
+
+        :returns: `False` if old counters can not be mapped to new ones.
+        """
+        if self._get_replace(entry.parsed, counters) is None:
+            return False
+        replace = self._get_replace(entry.counters, counters)
+        if replace is None:
+            return False
+
+        data = {}
+        for name, value in entry.data.items():
+            try:
+                data[name] = self._translate(value, replace)
+            except TypeError:
+                pass
+        entry.data = data
+        entry.counters = counters
+        return True
+
+    def translate(self, page, value):
+        """
+        Replace counters of links of cached page by counters of the last
+        body of page.
+
+        :param page: `lxml.html` instance.
+        :param value: `str` href from page.
+        :returns: `str` href.
+        """
+        entry = self._pages.get(id(page))
+        if entry is None or entry.page is not page:
+            return value
+        return self._get_replace(entry.parsed, entry.counters)(value)
+
+    def clear(self):
+        """Remove all pages."""
+        self._entries.clear()
+        self._pages.clear()
+
+    def get_data(self, page):
+        """
+        Get data extracted from cached page.
+
+        :param page: `lxml.html` instance.
+        :returns: `dict` of data or `None` if page is not cached.
+        """
+        entry = self._pages.get(id(page))
+        if entry is None or entry.page is not page:
+            return None
+        return entry.data
+
+    def memoize(self, page, name, function):
+        """
+        Get data extracted from page once while page is cached.
+
+        :param page: `lxml.html` instance.
+        :param name: name of data.
+        :param function: function which extracts data from page.
+        :returns: extracted data.
+        """
+        data = self.get_data(page)
+        if data is None:
+            return function(page)
+        if name not in data:
+            data[name] = function(page)
+        return data[name]
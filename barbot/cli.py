@@ -0,0 +1,103 @@
+# coding=utf-8
+
+import argparse
+import importlib
+
+from . import constants, fleet, setup_logging
+
+
+def get_parser():
+    """
+    Create parser of command line arguments.
+
+    :returns: `argparse.ArgumentParser` instance.
+    """
+    parser = argparse.ArgumentParser(
+        prog='barbot', description='Create your bot for barbars.ru.'
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    fleet_parser = commands.add_parser(
+        'fleet', help='play towers by all accounts from section `accounts`.'
+    )
+    fleet_parser.add_argument(
+        'config', nargs='?', default='barbot.conf',
+        help='path to configuration file.'
+    )
+
+    simulate_parser = commands.add_parser(
+        'simulate', help='compare strategies in offline towers (numpy).'
+    )
+    simulate_parser.add_argument(
+        '--class', dest='hero_class', choices=('warrior', 'medic'),
+        default='warrior', help='class of heroes.'
+    )
+    simulate_parser.add_argument(
+        '--policy', action='append', default=[], metavar='MODULE:FUNCTION',
+        help='strategy to compare with built-in one, may be repeated.'
+    )
+    simulate_parser.add_argument(
+        '--battles', type=int, default=1000, help='count of battles.'
+    )
+    simulate_parser.add_argument(
+        '--turns', type=int, default=200, help='turns of every battle.'
+    )
+    simulate_parser.add_argument(
+        '--seed', type=int, default=0, help='seed of random numbers.'
+    )
+
+    return parser
+
+
+def get_function(path):
+    """
+    Import function by path.
+
+    :param path: `str` `module:function`.
+    :returns: function.
+    """
+    module, name = path.split(':', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def simulate(arguments):
+    """
+    Print reports of simulation of strategies.
+
+    :param arguments: parsed command line arguments.
+    """
+    from . import simulator, strategies  # numpy is imported by command only.
+    if simulator.numpy is None:
+        exit('Module `numpy` is not available.')
+
+    if arguments.hero_class == 'warrior':
+        hero_class = constants.WARRIOR
+        policies = {'built-in': strategies.choice_warrior_action}
+    else:
+        hero_class = constants.MEDIC
+        policies = {'built-in': strategies.choice_medic_action}
+    for path in arguments.policy:
+        policies[path] = get_function(path)
+
+    reports = simulator.Simulator(
+        hero_class, arguments.battles, arguments.turns, seed=arguments.seed
+    ).compare(policies)
+    print(simulator.format_reports(reports))
+
+
+def main(arguments=None):
+    """
+    Entry point of `barbot` command.
+
+    :param arguments (optional): `list` of command line arguments.
+    """
+    arguments = get_parser().parse_args(arguments)
+    setup_logging()
+
+    if arguments.command == 'fleet':
+        fleet.Fleet(arguments.config).run()
+    elif arguments.command == 'simulate':
+        simulate(arguments)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# coding=utf-8
+
+import time
+import heapq
+import threading
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from . import logger, scheduler
+
+
+class Engine(object):
+
+    """
+    Class for run many players in one process.
+
+    Turns of players run on bounded pool of threads. Waiting between
+    turns does not hold a thread: players wait in queue ordered by time
+    of next turn.
+    """
+
+    def __init__(self, concurrency=10, delay=(4, 7), callback=None,
+                 pacing=None):
+        """
+        Initialization class.
+
+        :param concurrency (optional): `int` max count of parallel turns.
+        :param delay (optional): `tuple` min and max seconds between turns.
+        :param callback (optional): function called with player after
+            each action.
+        :param pacing (optional): function which creates
+            `scheduler.Pacer` for player, by default pacer keeps mean of
+            `delay` between actions.
+        """
+        self._pool = ThreadPool(concurrency)
+        self._delay = delay
+        self._callback = callback
+        self._pacing = pacing or (lambda: scheduler.from_delay(delay))
+        self._pacers = {}
+
+        self._queue = []  # Heap of (time of turn, number, player).
+        self._count = 0
+        self._active = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+
+    def add(self, player, delay=0):
+        """
+        Add player to engine. Player enters to game on first turn.
+
+        :param player: `barbot.strategies.Player` instance.
+        :param delay (optional): seconds before first turn.
+        """
+        pacer = self._pacing()
+        pacer.hooks.append(lambda: player.is_urgent)
+        self._pacers[player] = pacer
+
+        with self._condition:
+            self._push(player, time.time() + delay)
+            self._condition.notify()
+
+    def _push(self, player, at):
+        """Add player to queue. Must be called with acquired condition."""
+        self._count += 1
+        heapq.heappush(self._queue, (at, self._count, player))
+
+    def _pop(self):
+        """
+        Wait and get player with next turn.
+
+        :returns: `barbot.strategies.Player` instance or `None` if no players.
+        """
+        with self._condition:
+            while not self._stopped:
+                if not self._queue and not self._active:
+                    return None
+
+                timeout = None
+                if self._queue:
+                    timeout = self._queue[0][0] - time.time()
+                    if timeout <= 0:
+                        self._active += 1
+                        return heapq.heappop(self._queue)[2]
+
+                self._condition.wait(timeout)
+
+    def _turn(self, player, turns):
+        """
+        Do turn of player and return it to queue.
+
+        :param player: `barbot.strategies.Player` instance.
+        :param turns: `int` max count of actions for player or `None`.
+        """
+        pacer = self._pacers[player]
+        pacer.start()
+
+        delay = None
+        try:
+            if not player.is_started:
+                player.start()
+                delay = 0
+            elif player.is_over or turns is not None and player.turns >= turns:
+                self._leave(player)
+            elif player.turn():
+                if getattr(player.bot, 'journal', None) is None:
+                    logger.info(player.bot.get_action_log())
+                if self._callback is not None:
+                    self._callback(player)
+                self._reload(player, pacer)
+                self._maintain(player, pacer)
+                delay = pacer.get_delay()
+            else:
+                delay = 0
+        except Exception:
+            logger.info(traceback.format_exc())
+            self._leave(player)
+            delay = None
+
+        with self._condition:
+            self._active -= 1
+            stopped = self._stopped
+            if delay is not None and not stopped:
+                self._push(player, time.time() + delay)
+            self._condition.notify()
+
+        if delay is not None and stopped:
+            self._leave(player)
+
+    def run(self, turns=None):
+        """
+        Run turns of all players until all of them leave game.
+
+        :param turns (optional): `int` max count of actions for each player.
+        """
+        while True:
+            player = self._pop()
+            if player is None:
+                break
+            self._pool.apply_async(self._turn, (player, turns))
+
+        self._pool.close()
+        self._pool.join()
+
+        while self._queue:
+            self._leave(heapq.heappop(self._queue)[2])
+
+    def _reload(self, player, pacer):
+        """
+        Apply changed settings of player between turns.
+
+        :param player: `barbot.strategies.Player` instance.
+        :param pacer: `scheduler.Pacer` instance of player.
+        """
+        reload_settings = getattr(player.bot, 'reload_settings', None)
+        if reload_settings is None or not reload_settings():
+            return
+        if self._delay is None:  # Pacing is taken from settings.
+            scheduler.get_pacer(player.bot._settings.pacing, pacer)
+
+    @staticmethod
+    def _maintain(player, pacer):
+        """
+        Save learned graph and run due chores of player in time of pause
+        before next turn.
+
+        :param player: `barbot.strategies.Player` instance.
+        :param pacer: `scheduler.Pacer` instance of player.
+        """
+        if pacer.is_urgent:
+            return
+        save_graph = getattr(player.bot, 'save_graph', None)
+        if save_graph is not None:
+            save_graph()
+        maintenance = getattr(player.bot, 'maintenance', None)
+        if maintenance is not None:
+            maintenance.run(pacer.interval)
+
+    @staticmethod
+    def _leave(player):
+        """
+        Leave game by player and ignore errors.
+
+        :param player: `barbot.strategies.Player` instance.
+        """
+        try:
+            player.bot.leave_game()
+        except Exception:
+            logger.info(traceback.format_exc())
+
+    def stop(self):
+        """Stop engine after current turns."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
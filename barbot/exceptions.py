@@ -0,0 +1,21 @@
+# coding=utf-8
+
+
+class BarbotError(Exception):
+
+    """Base class for errors of bot."""
+
+
+class AuthenticationError(BarbotError):
+
+    """Incorrect login or password."""
+
+
+class GameError(BarbotError):
+
+    """No available game."""
+
+
+class SettingsError(BarbotError):
+
+    """Invalid configuration file."""
@@ -0,0 +1,268 @@
+# coding=utf-8
+
+import os
+import time
+import Queue
+import signal
+import functools
+import threading
+import multiprocessing
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from . import (
+    logger, barbot, engine, journal, metrics, scheduler, strategies,
+    exceptions
+)
+
+
+def pin(index):
+    """
+    Pin current process to one of available cores.
+
+    :param index: `int` number of worker.
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, [cores[index % len(cores)]])
+    elif psutil is not None and hasattr(psutil.Process, 'cpu_affinity'):
+        process = psutil.Process()
+        cores = process.cpu_affinity()
+        process.cpu_affinity([cores[index % len(cores)]])
+
+
+def work(filename, accounts, index, queue, stop, delay, turns):
+    """
+    Play towers by accounts in worker process.
+
+    :param filename: path to configuration file.
+    :param accounts: `list` of names of accounts in section `accounts`.
+    :param index: `int` number of worker.
+    :param queue: `multiprocessing.Queue` for report about actions.
+    :param stop: `multiprocessing.Event` for stop worker.
+    :param delay: `tuple` min and max seconds between turns or `None`
+        for pacing from settings.
+    :param turns: `int` max count of actions for each account or `None`.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pin(index)
+
+    settings = barbot.Settings(filename)
+    pacing = None
+    if delay is None:
+        pacing = functools.partial(scheduler.get_pacer, settings.pacing)
+    bots = engine.Engine(
+        concurrency=settings.fleet.concurrency, delay=delay,
+        callback=lambda player: queue.put(index), pacing=pacing
+    )
+
+    exporter = metrics.get_exporter(settings.metrics, index)
+    turns_journal = journal.get_journal(settings.journal, index)
+
+    for name in accounts:
+        try:
+            bot = barbot.Bot(filename, account=name)
+        except exceptions.AuthenticationError as e:
+            logger.info(u'{}: {}'.format(name, e))
+            continue
+        bot.change_game('towers')
+        bot.journal = turns_journal
+        bots.add(strategies.Player(bot))
+        if exporter is not None:
+            exporter.add(bot.metrics)
+
+    def wait_stop():
+        stop.wait()
+        bots.stop()
+
+    thread = threading.Thread(target=wait_stop)
+    thread.daemon = True
+    thread.start()
+
+    if exporter is not None:
+        exporter.start()
+    if turns_journal is not None:
+        turns_journal.start()
+    try:
+        bots.run(turns)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        if turns_journal is not None:
+            turns_journal.stop()
+
+
+class Worker(object):
+
+    """Class for keep state of worker process."""
+
+    def __init__(self, index, accounts):
+        """
+        Initialization class.
+
+        :param index: `int` number of worker.
+        :param accounts: `list` of names of accounts.
+        """
+        self.index = index
+        self.accounts = accounts
+        self.process = None
+        self.started = None
+        self.failures = 0
+        self.restart = None  # Time of restart after crash.
+        self.finished = False
+
+        self.turns = 0  # Actions since last report.
+        self.total = 0  # Actions since start of fleet.
+
+
+class Fleet(object):
+
+    """Class for supervise worker processes of many accounts."""
+
+    def __init__(self, filename, delay=None, turns=None):
+        """
+        Initialization class.
+
+        :param filename: path to configuration file with section `accounts`.
+        :param delay (optional): `tuple` min and max seconds between turns,
+            by default section `pacing` of settings is used.
+        :param turns (optional): `int` max count of actions for each account.
+        """
+        self._filename = filename
+        self._delay = delay
+        self._turns = turns
+        settings = barbot.Settings(filename)
+        self._settings = settings.fleet
+
+        accounts = sorted(settings.accounts.keys())
+        count = self._settings.workers or multiprocessing.cpu_count()
+        count = min(count, len(accounts))
+
+        self.workers = [
+            Worker(index, accounts[index::count]) for index in range(count)
+        ]
+
+        self._queue = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._report = None
+
+    def get_backoff(self, failures):
+        """
+        Get delay before restart of crashed worker.
+
+        :param failures: `int` count of crashes in a row.
+        :returns: `float` seconds.
+        """
+        backoff = self._settings.backoff * 2 ** max(failures - 1, 0)
+        return min(backoff, self._settings.max_backoff)
+
+    def _start(self, worker):
+        """Start process of worker."""
+        worker.process = multiprocessing.Process(target=work, args=(
+            self._filename, worker.accounts, worker.index, self._queue,
+            self._stop, self._delay, self._turns
+        ))
+        worker.process.daemon = True
+        worker.process.start()
+        worker.started = time.time()
+        worker.restart = None
+
+        logger.info(u'Worker {} started: {}.'.format(
+            worker.index, u', '.join(worker.accounts)
+        ))
+
+    def _check(self, worker):
+        """Check process of worker and schedule restart if it crashed."""
+        if worker.finished or worker.restart is not None:
+            return
+        if worker.process.is_alive():
+            return
+
+        if worker.process.exitcode == 0 or self._stop.is_set():
+            worker.finished = True
+            return
+
+        if time.time() - worker.started > self._settings.max_backoff:
+            worker.failures = 0
+        worker.failures += 1
+
+        backoff = self.get_backoff(worker.failures)
+        worker.restart = time.time() + backoff
+
+        logger.info(u'Worker {} crashed with code {}, restart in {}s.'.format(
+            worker.index, worker.process.exitcode, backoff
+        ))
+
+    def _receive(self, timeout):
+        """Receive reports about actions from workers."""
+        try:
+            while True:
+                index = self._queue.get(timeout=timeout)
+                self.workers[index].turns += 1
+                self.workers[index].total += 1
+                timeout = 0
+        except Queue.Empty:
+            pass
+
+    def report(self):
+        """
+        Log actions per second of each worker since last report.
+
+        :returns: `dict` of actions per second by number of worker.
+        """
+        now = time.time()
+        elapsed = max(now - self._report, 1e-6)
+        self._report = now
+
+        rates = {}
+        for worker in self.workers:
+            rates[worker.index] = worker.turns / elapsed
+            worker.turns = 0
+            logger.info(u'Worker {}: {:.2f} turns/s ({}).'.format(
+                worker.index, rates[worker.index], u', '.join(worker.accounts)
+            ))
+
+        return rates
+
+    def run(self):
+        """Start workers and supervise them until all of them finish."""
+        handlers = [
+            (sig, signal.signal(sig, lambda *args: self.stop()))
+            for sig in (signal.SIGINT, signal.SIGTERM)
+        ]
+
+        self._report = time.time()
+        for worker in self.workers:
+            self._start(worker)
+
+        try:
+            while not all(worker.finished for worker in self.workers):
+                self._receive(timeout=0.5)
+
+                for worker in self.workers:
+                    self._check(worker)
+                    if worker.restart is not None and (
+                            worker.restart <= time.time()):
+                        if self._stop.is_set():
+                            worker.finished = True
+                        else:
+                            self._start(worker)
+
+                interval = self._settings.report_interval
+                if interval and time.time() - self._report >= interval:
+                    self.report()
+        finally:
+            for sig, handler in handlers:
+                signal.signal(sig, handler)
+
+        self._receive(timeout=0)
+        self.report()
+
+    def stop(self):
+        """Stop all workers. Bots leave game after current turns."""
+        logger.info('Stop fleet.')
+        self._stop.set()
@@ -1,42 +1,208 @@
 # coding=utf-8
 
-import copy
+import operator
+import importlib
 
-from lxml import html
+from barbot import constants, exceptions, selectors, utils
+from barbot.utils import html
 
-from barbot import constants, utils
+# Built-in games: name -> `module:class`. Other packages add games by
+# entry points of group `barbot.games`.
+GAMES = {
+    'towers': 'barbot.games.towers:Towers',
+}
+
+
+def get_game(name):
+    """
+    Get class of game by name.
+
+    Name is checked by table of built-in games and entry points before
+    import of module of game.
+
+    :param name: name of game.
+    :returns: subclass of `Game`.
+    :raises: `exceptions.GameError` if no game with this name.
+    """
+    if name in GAMES:
+        module, attribute = GAMES[name].split(':')
+        return getattr(importlib.import_module(module), attribute)
+
+    try:
+        import pkg_resources
+    except ImportError:
+        pkg_resources = None
+
+    if pkg_resources is not None:
+        for entry_point in pkg_resources.iter_entry_points(
+                'barbot.games', name):
+            return entry_point.load()
+
+    raise exceptions.GameError('No available game named {}.'.format(name))
+
+
+class Actions(dict):
+
+    """
+    Read-only mapping of actions, actions are resolved on first access.
+
+    Values of schema are url parts, functions of game, bound methods or
+    nested schemas. Url parts and functions are replaced by urls when they
+    are taken first time, nested schemas are returned as `Actions`.
+    Resolved actions are stored in dict itself, so repeated access is as
+    fast as for `dict`.
+    Note that `dict(...)` takes only resolved actions, use `copy` to get
+    all actions.
+    """
+
+    def __init__(self, game, schema):
+        """
+        Initialization class.
+
+        :param game: `Game` instance with current page.
+        :param schema: `dict` of actions.
+        """
+        super(Actions, self).__init__()
+        self._game = game
+        self._schema = schema
+
+    def __missing__(self, key):
+        """Resolve action which is taken first time."""
+        value = self._schema[key]
+        if isinstance(value, dict):
+            value = Actions(self._game, value)
+        elif isinstance(value, basestring):
+            value = self._game.get_action_url(value)
+        elif getattr(value, '__self__', None) is not None:
+            value = value()  # Bound method, for example from `get_actions`.
+        else:
+            value = value(self._game)
+
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __contains__(self, key):
+        return key in self._schema
+
+    def __iter__(self):
+        return iter(self._schema)
+
+    def __len__(self):
+        return len(self._schema)
+
+    def get(self, key, default=None):
+        """Get resolved action or default."""
+        return self[key] if key in self._schema else default
+
+    def keys(self):
+        """Get names of actions."""
+        return self._schema.keys()
+
+    def itervalues(self):
+        """Iterate over resolved actions."""
+        return (self[key] for key in self._schema)
+
+    def iteritems(self):
+        """Iterate over names and resolved actions."""
+        return ((key, self[key]) for key in self._schema)
+
+    def values(self):
+        """Get resolved actions."""
+        if dict.__len__(self) == len(self._schema):
+            return dict.values(self)
+        return list(self.itervalues())
+
+    def items(self):
+        """Get names and resolved actions."""
+        if dict.__len__(self) == len(self._schema):
+            return dict.items(self)
+        return list(self.iteritems())
+
+    iterkeys = __iter__
+
+    def copy(self):
+        """
+        Resolve all actions.
+
+        :returns: `dict` of actions.
+        """
+        return {
+            key: value.copy() if isinstance(value, Actions) else value
+            for key, value in self.iteritems()
+        }
+
+    def __eq__(self, other):
+        return self.copy() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Actions are read-only.')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _read_only
 
 
 class Game(object):
 
     """Abstract game class. All games classes should contain it."""
 
-    def __init__(self, session):
+    stream_stop = None  # Pattern of end of needed part of page.
+
+    # Schema of actions: url parts or functions of game which return urls.
+    # Schemas of subclasses are merged with schemas of parents.
+    _actions = {
+        'attack': {
+            'random': 'damageRandom',
+            'last': 'damageLast',
+        },
+        'heal': {
+            'random': 'healRandom',
+            'last': 'healLast',
+            'self': 'healSelf',
+        },
+        'burning': {
+            'random': 'energyDamageRandom',
+            'last': 'energyDamageLast',
+        },
+        'skills': operator.methodcaller('get_skills_url'),
+    }
+
+    # Url parts of links which signal chores of bot: name of chore -> part.
+    _signals = {
+        'repair': 'repairLink',  # Equipment is worn.
+    }
+
+    def __init__(self, session, streaming=False, chunk_size=4096, pages=None,
+                 metrics=None):
         """
         Initialization class.
 
         :param session: `requests.Session` instance with authentication.
+        :param streaming (optional): parse responses while they are received.
+        :param chunk_size (optional): `int` size of chunk for streaming.
+        :param pages (optional): `cache.PageCache` instance for reuse of
+            parsed pages and their index and actions.
+        :param metrics (optional): `metrics.Metrics` instance for time of
+            parse.
         """
         self._name = None
         self._session = session
+        self._streaming = streaming
+        self._chunk_size = chunk_size
+        self._pages = pages
+        self._metrics = metrics
         self._page = None
-
-        self._actions = {
-            'attack': {
-                'random': 'damageRandom',
-                'last': 'damageLast',
-            },
-            'heal': {
-                'random': 'healRandom',
-                'last': 'healLast',
-                'self': 'healSelf',
-            },
-            'burning': {
-                'random': 'energyDamageRandom',
-                'last': 'energyDamageLast',
-            },
-            'skills': self.get_skills_url,
-        }
+        self._index = None
+        self._page_actions = None
+        self._location = None
 
     def get_entry_url(self):
         """
@@ -67,8 +233,112 @@ class Game(object):
         :param url: `str` url of action.
         :returns: `lxml.html` instance.
         """
-        self._page = html.fromstring(self._session.get(url).content)
-        return self._page
+        return self._set_page(utils.get_page(
+            self._session, url, self._streaming, self._chunk_size,
+            self.stream_stop, self._pages, self._metrics
+        ))
+
+    def _set_page(self, page):
+        """
+        Save page of last action and index its links.
+
+        :param page: `lxml.html` instance.
+        :returns: `lxml.html` instance.
+        """
+        self._page = page
+        self._index = self._memoize('index', self._index_page)
+        self._page_actions = None
+        return page
+
+    def _memoize(self, name, function):
+        """
+        Extract data from current page once while page is cached.
+
+        :param name: name of data.
+        :param function: function which extracts data from page.
+        :returns: extracted data.
+        """
+        if self._pages is None:
+            return function(self._page)
+        return self._pages.memoize(self._page, name, function)
+
+    @classmethod
+    def _get_schema(cls):
+        """
+        Get schema of actions merged from all classes of game once.
+
+        :returns: `dict` of actions.
+        """
+        if '_schema' not in cls.__dict__:
+            schema = {}
+            for klass in reversed(cls.__mro__):
+                utils.update(schema, klass.__dict__.get('_actions', {}))
+            cls._schema = schema
+        return cls._schema
+
+    @classmethod
+    def _get_tokens(cls):
+        """
+        Get all url parts used by actions and signals.
+
+        :returns: `set` of `str` url parts.
+        """
+        if '_tokens' not in cls.__dict__:
+            tokens = set(cls._signals.values())
+            for types in cls._get_schema().values():
+                if isinstance(types, dict):
+                    values = types.values()
+                else:
+                    values = [types]
+                tokens.update(v for v in values if isinstance(v, basestring))
+            cls._tokens = frozenset(tokens)
+        return cls._tokens
+
+    def _new_index(self):
+        """
+        Create empty page index. Override to add game-specific keys.
+
+        :returns: `dict` of links.
+        """
+        return {'tokens': dict.fromkeys(self._get_tokens()), 'skills': []}
+
+    def _index_page(self, page):
+        """
+        Index all links of page by one walk over `<a>` elements.
+
+        :param page: `lxml.html` instance.
+        :returns: `dict` of links.
+        {
+            'tokens': {url part: href or `None`},
+            'skills': [hrefs],
+        }
+        """
+        index = self._new_index()
+        tokens = index['tokens'].keys()
+
+        for link in page.iter('a'):
+            href = link.get('href')
+            if href is None:
+                continue
+
+            for token in tokens:
+                if token in href and index['tokens'][token] is None:
+                    index['tokens'][token] = href
+
+            self._index_link(index, link, href)
+
+        return index
+
+    def _index_link(self, index, link, href):
+        """
+        Add link to page index. Override to index game-specific links.
+
+        :param index: `dict` of links.
+        :param link: `lxml.html` instance of `<a>` element.
+        :param href: `str` href of link.
+        """
+        if 'ability' in href and 'buff' not in link.get('class', ''):
+            index['skills'].append(href)
 
     def get_action_log(self):
         """
@@ -78,29 +348,32 @@ class Game(object):
         """
         raise NotImplementedError('Need override this function.')
 
+    def get_log_line(self):
+        """
+        Get last line from game log without location.
+
+        :returns: `unicode` line.
+        """
+        raise NotImplementedError('Need override this function.')
+
     def get_actions(self, actions={}):
         """
-        Get available actions.
+        Get available actions on current page.
+
+        Actions are resolved on first access and kept until next page.
 
         :param actions: `dict` with actions to add or override.
-        :returns: `dict` of actions.
+        :returns: `Actions` instance.
         """
-        actions = utils.update(copy.deepcopy(self._actions), actions)
-
-        for action, types in actions.items():
-            if isinstance(types, dict):
-                for target, value in types.items():
-                    if isinstance(value, basestring):
-                        actions[action][target] = self.get_action_url(value)
-                    else:
-                        actions[action][target] = value()
-            else:
-                if isinstance(types, basestring):
-                    actions[action] = self.get_action_url(types)
-                else:
-                    actions[action] = types()
+        if actions:
+            schema = utils.update({}, self._get_schema())
+            return Actions(self, utils.update(schema, actions))
 
-        return actions
+        if self._page_actions is None:
+            self._page_actions = self._memoize(
+                'actions', lambda page: Actions(self, self._get_schema())
+            )
+        return self._page_actions
 
     def get_action_url(self, url_part):
         """
@@ -109,11 +382,28 @@ class Game(object):
         :param url_part: part of url.
         :returns: `str` url or `None`.
         """
-        try:
-            xpath = '//a[contains(@href, "{}")]/@href'.format(url_part)
-            return utils.build_url(self._page.xpath(xpath)[0])
-        except IndexError:
+        tokens = self._index['tokens']
+        if url_part not in tokens:
+            hrefs = selectors.LINK_HREF(self._page, part=url_part)
+            tokens[url_part] = hrefs[0] if hrefs else None
+            if hrefs and self._pages is not None:
+                tokens[url_part] = self._pages.translate(self._page, hrefs[0])
+
+        if tokens[url_part] is None:
             return None
+        return utils.build_url(tokens[url_part])
+
+    def get_signals(self):
+        """
+        Get chores signaled by links of current page, for example repair of
+        worn equipment.
+
+        :returns: `list` of names of chores.
+        """
+        tokens = self._index['tokens']
+        return [
+            name for name, part in self._signals.items() if tokens.get(part)
+        ]
 
     def get_skills_url(self):
         """
@@ -121,8 +411,4 @@ class Game(object):
 
         :returns: `list` of `str` url.
         """
-        urls = self._page.xpath(
-            '//a[contains(@href, "ability") '
-            'and not(contains(@class, "buff"))]/@href'
-        )
-        return map(utils.build_url, urls)
+        return map(utils.build_url, self._index['skills'])
@@ -1,50 +1,102 @@
 # coding=utf-8
 
-from barbot import games, utils
+import re
+import operator
+
+from barbot import games, graph, selectors, utils
+
+
+def get_location(page):
+    """
+    Get name of location from page.
+
+    :param page: `lxml.html` instance.
+    :returns: `unicode` name or `None`.
+    """
+    location = selectors.LOCATION_TEXT(page)
+    return utils.remove_spaces(location[0]) if location else None
 
 
 class Towers(games.Game):
 
     """Towers game."""
 
-    def __init__(self, session):
+    # Footer follows every needed part of page (links, log, status, tire).
+    stream_stop = re.compile(r'<div class="footer"')
+
+    _actions = {
+        'attack': {
+            'tower': 'damageTower',
+        },
+        'move': {
+            'backward': operator.methodcaller('get_move_backward_urls'),
+            'forward': operator.methodcaller('get_move_forward_urls'),
+            'capital': operator.methodcaller('get_move_capital_url'),
+            'retreat': operator.methodcaller('get_retreat_url'),
+            'tower': operator.methodcaller('get_tower_url'),
+        },
+    }
+
+    def __init__(self, session, streaming=False, chunk_size=4096, pages=None,
+                 metrics=None):
         """
         Initialization class.
 
         :param session: `requests.Session` instance with authentication.
+        :param streaming (optional): parse responses while they are received.
+        :param chunk_size (optional): `int` size of chunk for streaming.
+        :param pages (optional): `cache.PageCache` instance.
+        :param metrics (optional): `metrics.Metrics` instance.
         """
-        super(Towers, self).__init__(session)
+        super(Towers, self).__init__(
+            session, streaming, chunk_size, pages, metrics
+        )
 
         self._name = 'towers'
         self._capital = None
         self._tower = None
-        self._location = None
+        self._tower_url = None  # Link to tower from last entry.
+        self.graph = graph.LocationGraph()  # Learned from visited pages.
 
     def entry(self):
         """
         Enter to game.
 
-        :returns: `str` url for entry to game.
+        Link to tower from last entry is tried first, entry page of game is
+        requested if that link does not lead to location.
+
+        :returns: `lxml.html` instance of location.
         """
+        if self._tower_url is not None:
+            page = self.move(self._tower_url)
+            if self._location is not None:
+                return page
+
         page = super(Towers, self).entry()
 
-        self._capital = utils.remove_spaces(page.xpath('//h1//text()')[0])
+        self._capital = utils.remove_spaces(selectors.TITLE_TEXT(page)[0])
 
-        tower_link = page.xpath('//a[contains(@href, "nearLocation")]')[0]
-        self._tower = utils.remove_spaces(tower_link.xpath('span/text()')[0])
-        self._location = self._tower
+        tower_link = selectors.NEAR_LOCATION(page)[0]
+        self._tower = utils.remove_spaces(selectors.SPAN_TEXT(tower_link)[0])
+        self._tower_url = utils.build_url(selectors.HREF(tower_link)[0])
+        self.graph.learn(self._capital, [self._tower], capital=True)
 
-        return self.move(utils.build_url(tower_link.xpath('@href')[0]))
+        return self.move(self._tower_url)
 
-    def move(self, url):
+    def _set_page(self, page):
         """
-        Do action (change location, attack or etc.) and save response.
+        Save page of last action and get location from it.
 
-        :param url: `str` url of action.
+        :param page: `lxml.html` instance.
         :returns: `lxml.html` instance.
         """
-        page = super(Towers, self).move(url)
-        self._location = utils.remove_spaces(page.xpath('//h1/span/text()')[0])
+        page = super(Towers, self)._set_page(page)
+        self._location = self._memoize('location', get_location)
+        if self._location is not None:
+            self.graph.learn(  # Saved in pause, not on path of turn.
+                self._location, self._index['names'],
+                tower=self._index['tokens'].get('damageTower') is not None
+            )
         return page
 
     def get_action_log(self):
@@ -53,16 +105,24 @@ class Towers(games.Game):
 
         :returns: `str` of log.
         """
-        log = self._page.xpath(u'//div[contains(text(), "Ты")][1]//text()')
         return u'Location: {}\n{}'.format(
-            self._location, utils.remove_spaces(''.join(log))
+            self._location, self.get_log_line()
         )
 
-    def get_actions(self):
+    def get_log_line(self):
         """
-        Get available actions.
+        Get last line from game log without location.
 
-        :returns: dict of actions.
+        :returns: `unicode` line.
+        """
+        return utils.remove_spaces(''.join(selectors.LOG_TEXT(self._page)))
+
+    def get_actions(self, actions={}):
+        """
+        Get available actions on current page.
+
+        :param actions: `dict` with actions to add or override.
+        :returns: `Actions` instance.
         {
             'attack': {
                 'random': url or `None`,
@@ -83,73 +143,146 @@ class Towers(games.Game):
                 'backward': [urls],
                 'forward': [urls],
                 'capital': url or `None`,
+                'retreat': url or `None`,
+                'tower': url or `None`,
             },
         }
         """
-        actions = {
-            'attack': {
-                'tower': 'damageTower',
-            },
-            'move': {
-                'backward': self.get_move_backward_urls,
-                'forward': self.get_move_forward_urls,
-                'capital': self.get_move_capital_url,
-            },
-        }
-
         return super(Towers, self).get_actions(actions)
 
-    def get_move_backward_urls(self):
+    def _new_index(self):
         """
-        Get backward towers url from page.
+        Create empty page index with locations.
 
+        :returns: `dict` of links.
+        """
+        index = super(Towers, self)._new_index()
+        index.update({
+            'locations': [],
+            'directions': {'-n': [], '-s': []},
+            'names': {},
+        })
+        return index
+
+    def _index_link(self, index, link, href):
+        """
+        Add link to page index with locations by direction and name.
+
+        :param index: `dict` of links.
+        :param link: `lxml.html` instance of `<a>` element.
+        :param href: `str` href of link.
+        """
+        super(Towers, self)._index_link(index, link, href)
+
+        if 'location' not in href:
+            return
+
+        image = link.find('img')
+        source = image.get('src', '') if image is not None else ''
+        direction = None
+        if '-n' in source:
+            direction = '-n'
+        elif '-s' in source:
+            direction = '-s'
+
+        span = link.find('span')
+        name = None
+        if span is not None and span.text:
+            name = utils.remove_spaces(span.text)
+
+        index['locations'].append((href, direction))
+        if direction is not None:
+            index['directions'][direction].append(href)
+        if name is not None:
+            index['names'].setdefault(name, href)
+
+    def _get_move_urls(self, position):
+        """
+        Get towers url with same direction as location at position.
+
+        :param position: `int` position of location on page.
         :returns: `list` of `str` url.
         """
-        urls = self._page.xpath('//a[contains(@href, "location")]')
+        locations = self._index['locations']
+        if not locations:
+            return []
 
-        if '-n' in urls[0].xpath('img/@src')[0]:
-            backward = '-n'
-        elif '-s' in urls[0].xpath('img/@src')[0]:
-            backward = '-s'
-        else:
+        direction = locations[position][1]
+        if direction is None:
             return []
 
-        urls = filter(lambda x: backward in x.xpath('img/@src')[0], urls)
-        return map(lambda x: utils.build_url(x.xpath('@href')[0]), urls)
+        return map(utils.build_url, self._index['directions'][direction])
 
-    def get_move_forward_urls(self):
+    def get_move_backward_urls(self):
         """
         Get backward towers url from page.
 
         :returns: `list` of `str` url.
         """
-        urls = self._page.xpath('//a[contains(@href, "location")]')
+        return self._get_move_urls(0)
 
-        if '-n' in urls[-1].xpath('img/@src')[0]:
-            forward = '-n'
-        elif '-s' in urls[-1].xpath('img/@src')[0]:
-            forward = '-s'
-        else:
-            return []
+    def get_move_forward_urls(self):
+        """
+        Get forward towers url from page.
 
-        urls = filter(lambda x: forward in x.xpath('img/@src')[0], urls)
-        return map(lambda x: utils.build_url(x.xpath('@href')[0]), urls)
+        :returns: `list` of `str` url.
+        """
+        return self._get_move_urls(-1)
 
     def get_move_capital_url(self):
         """
-        Get capital url from page.
+        Get capital url from page or url of next location of route to
+        capital if it is not a neighbour.
 
         :returns: `str` url or `None`.
         """
-        urls = self._page.xpath('//a[contains(@href, "location")]')
+        href = self._index['names'].get(self._capital)
+        if href is None:
+            return self.get_retreat_url()
+        return utils.build_url(href)
 
-        condition = lambda x: (
-            utils.remove_spaces(x.xpath('span/text()')[0]) == self._capital
-        )
+    def _get_location_url(self, location):
+        """
+        Get url of neighbour location.
 
-        try:
-            return filter(condition, urls)[0]
-        except IndexError:
+        :param location: name of location or `None`.
+        :returns: `str` url or `None`.
+        """
+        href = self._index['names'].get(location)
+        if href is None:
             return None
+        return utils.build_url(href)
+
+    def get_route_url(self, target):
+        """
+        Get url of next location of the shortest known route.
+
+        :param target: name of location.
+        :returns: `str` url or `None` if no route or hero is at target.
+        """
+        return self._get_location_url(
+            self.graph.get_next(self._location, target)
+        )
+
+    def _get_nearest_url(self, kind):
+        """Get url of next location of route to the nearest location."""
+        nearest = self.graph.get_nearest(self._location, kind)
+        return self._get_location_url(nearest and nearest[1])
+
+    def get_retreat_url(self):
+        """
+        Get url of next location of route to capital.
+
+        :returns: `str` url or `None`.
+        """
+        return self._get_nearest_url('capital')
+
+    def get_tower_url(self):
+        """
+        Get url of next location of route to the nearest known tower.
+
+        :returns: `str` url or `None`.
+        """
+        return self._get_nearest_url('tower')
 
 GAME = Towers
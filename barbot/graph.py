@@ -0,0 +1,194 @@
+# coding=utf-8
+"""
+Graph of locations of towers.
+
+`LocationGraph` learns locations, their neighbours, towers and capitals
+from visited pages, keeps them in JSON file and precomputes shortest
+routes, so next location to any target, to the nearest tower or capital
+is found by lookup. Bots of one side may share one file: learned
+locations are merged with file before write under lock of file
+`<filename>.lock`. Graph is written only by `save`, so owner calls it in
+pause between turns.
+"""
+
+import os
+import json
+import errno
+import tempfile
+import collections
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # No lock of shared file.
+
+KINDS = ('tower', 'capital')
+
+
+class LocationGraph(object):
+
+    """Class for keep locations and routes between them."""
+
+    def __init__(self, filename=None):
+        """
+        Initialization class.
+
+        :param filename (optional): path to JSON file of graph, by default
+            graph is kept in memory only.
+        """
+        self._filename = filename
+        self._neighbours = collections.defaultdict(set)
+        self._kinds = {kind: set() for kind in KINDS}
+
+        self._next = None  # Source -> target -> next location.
+        self._nearest = None  # Kind -> source -> (target, next location).
+
+        if filename is not None:
+            self._merge(self._read())
+        self.changed = False  # Locations are learned after last save.
+
+    def __len__(self):
+        return len(self._neighbours)
+
+    def __contains__(self, location):
+        return location in self._neighbours
+
+    def _read(self):
+        """Read graph from file, empty graph if there is no file."""
+        try:
+            with open(self._filename) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _merge(self, data):
+        """
+        Add locations of serialized graph.
+
+        :returns: `True` if graph is changed.
+        """
+        changed = False
+        for location, item in data.get('locations', {}).items():
+            changed |= self.learn(location, item.get('neighbours', ()), **{
+                kind: item.get(kind, False) for kind in KINDS
+            })
+        return changed
+
+    def learn(self, location, neighbours=(), tower=False, capital=False):
+        """
+        Add location, links to its neighbours and its kind.
+
+        :param location: name of location.
+        :param neighbours (optional): names of neighbour locations.
+        :param tower (optional): location has tower for attack.
+        :param capital (optional): location is capital of hero.
+        :returns: `True` if graph is changed.
+        """
+        known = self._neighbours.get(location)
+        new = set(neighbours) - (known or set())
+        kinds = [
+            kind for kind, value in (('tower', tower), ('capital', capital))
+            if value and location not in self._kinds[kind]
+        ]
+        if known is not None and not new and not kinds:
+            return False
+
+        self._neighbours[location].update(new)
+        for neighbour in new:
+            self._neighbours[neighbour].add(location)  # Ways are two-way.
+        for kind in kinds:
+            self._kinds[kind].add(location)
+
+        self._next = self._nearest = None
+        self.changed = True
+        return True
+
+    def _compute(self):
+        """Compute shortest routes by breadth-first search."""
+        self._next = {}
+        self._nearest = {kind: {} for kind in KINDS}
+
+        for source in self._neighbours:
+            distances = {source: 0}
+            next_locations = {source: None}
+            queue = collections.deque([source])
+            while queue:
+                location = queue.popleft()
+                for neighbour in sorted(self._neighbours[location]):
+                    if neighbour not in distances:
+                        distances[neighbour] = distances[location] + 1
+                        next_locations[neighbour] = (
+                            next_locations[location] or neighbour
+                        )
+                        queue.append(neighbour)
+            self._next[source] = next_locations
+
+            for kind in KINDS:
+                targets = self._kinds[kind] & set(distances)
+                if targets:
+                    target = min(targets, key=lambda x: (distances[x], x))
+                    self._nearest[kind][source] = (
+                        target, next_locations[target]
+                    )
+
+    def get_next(self, source, target):
+        """
+        Get next location of shortest route.
+
+        :param source: name of current location.
+        :param target: name of target location.
+        :returns: name of neighbour location or `None` if there is no route
+            or source is target.
+        """
+        if self._next is None:
+            self._compute()
+        return self._next.get(source, {}).get(target)
+
+    def get_nearest(self, source, kind):
+        """
+        Get the nearest location of kind and next location of route to it.
+
+        :param source: name of current location.
+        :param kind: `tower` or `capital`.
+        :returns: `tuple` of names of target and next location (`None` if
+            source is target) or `None` if no location of kind is known.
+        """
+        if self._nearest is None:
+            self._compute()
+        return self._nearest[kind].get(source)
+
+    def save(self):
+        """
+        Merge graph with file and write it if locations are learned after
+        last save.
+
+        :returns: `True` if file is written.
+        """
+        if self._filename is None or not self.changed:
+            return False
+
+        directory = os.path.dirname(os.path.abspath(self._filename))
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        with open(self._filename + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # Released by close.
+            self._merge(self._read())  # Locations learned by other bots.
+            data = {'locations': {
+                location: dict(
+                    neighbours=sorted(neighbours),
+                    **{kind: location in self._kinds[kind] for kind in KINDS}
+                ) for location, neighbours in self._neighbours.items()
+            }}
+
+            descriptor, filename = tempfile.mkstemp(dir=directory)
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.rename(filename, self._filename)
+
+        self.changed = False
+        return True
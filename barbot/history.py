@@ -0,0 +1,152 @@
+# coding=utf-8
+"""
+Bounded history of hero state.
+
+`History` keeps samples of every turn (time, health and energy points,
+location and action) in preallocated arrays, so memory does not grow
+during long runs and no pages are kept.
+"""
+
+import array
+import collections
+
+Sample = collections.namedtuple(
+    'Sample', ('time', 'hp', 'ep', 'location', 'action')
+)
+
+
+class History(object):
+
+    """
+    Ring buffer of samples of hero state.
+
+    Damage is kept as cumulative sum for every sample, so damage over the
+    last turns is a difference of two sums. Locations and actions are kept
+    as codes of table of names with limited size, names after the limit
+    are kept as `None`.
+    """
+
+    __slots__ = (
+        '_size', '_count', '_times', '_hp', '_ep', '_damage', '_locations',
+        '_actions', '_names', '_codes', '_max_names',
+    )
+
+    def __init__(self, size=1024, max_names=1024):
+        """
+        Initialization class.
+
+        :param size (optional): `int` max count of samples.
+        :param max_names (optional): `int` max count of names of locations
+            and actions.
+        """
+        self._size = size
+        self._max_names = max_names
+        self._count = 0  # All samples, including overwritten.
+
+        self._times = array.array('d', [0.0]) * size
+        self._hp = array.array('i', [0]) * size
+        self._ep = array.array('i', [0]) * size
+        self._damage = array.array('d', [0.0]) * size
+        self._locations = array.array('H', [0]) * size
+        self._actions = array.array('H', [0]) * size
+
+        self._names = [None]
+        self._codes = {None: 0}
+
+    def __len__(self):
+        return min(self._count, self._size)
+
+    def _encode(self, name):
+        """Get code of name, add name to table if there is place."""
+        code = self._codes.get(name)
+        if code is None:
+            if len(self._names) >= self._max_names:
+                return 0
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def append(self, time, hp, ep, location=None, action=None):
+        """
+        Add sample and overwrite the oldest one if history is full.
+
+        :param time: `float` timestamp.
+        :param hp: `int` health points or `None`.
+        :param ep: `int` energy points or `None`.
+        :param location (optional): name of location.
+        :param action (optional): name of action which led to this state.
+        """
+        hp = -1 if hp is None else hp
+        ep = -1 if ep is None else ep
+
+        damage = 0.0
+        if self._count:
+            last = (self._count - 1) % self._size
+            damage = self._damage[last]
+            if 0 <= hp < self._hp[last]:
+                damage += self._hp[last] - hp
+
+        index = self._count % self._size
+        self._times[index] = time
+        self._hp[index] = hp
+        self._ep[index] = ep
+        self._damage[index] = damage
+        self._locations[index] = self._encode(location)
+        self._actions[index] = self._encode(action)
+        self._count += 1
+
+    def __getitem__(self, index):
+        """
+        Get sample, negative index counts from the last sample.
+
+        :returns: `Sample` instance.
+        """
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('History index out of range.')
+
+        index = (self._count - length + index) % self._size
+        hp = self._hp[index]
+        ep = self._ep[index]
+        return Sample(
+            self._times[index], None if hp < 0 else hp,
+            None if ep < 0 else ep, self._names[self._locations[index]],
+            self._names[self._actions[index]]
+        )
+
+    def _get_span(self, turns):
+        """Get indexes of first and last samples of last turns."""
+        turns = min(turns, len(self) - 1)
+        if turns <= 0:
+            return None
+        last = (self._count - 1) % self._size
+        return (last - turns) % self._size, last
+
+    def get_damage(self, turns=1):
+        """
+        Get lost health points over last turns.
+
+        :param turns (optional): `int` count of turns.
+        :returns: `float` health points.
+        """
+        span = self._get_span(turns)
+        if span is None:
+            return 0.0
+        return self._damage[span[1]] - self._damage[span[0]]
+
+    def get_damage_rate(self, turns=10):
+        """
+        Get lost health points per second over last turns.
+
+        :param turns (optional): `int` count of turns.
+        :returns: `float` health points per second.
+        """
+        span = self._get_span(turns)
+        if span is None:
+            return 0.0
+        elapsed = self._times[span[1]] - self._times[span[0]]
+        if elapsed <= 0:
+            return 0.0
+        return (self._damage[span[1]] - self._damage[span[0]]) / elapsed
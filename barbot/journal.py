@@ -0,0 +1,203 @@
+# coding=utf-8
+"""
+Structured journal of turns.
+
+`Journal` keeps one JSON line per turn (time, account, location, health
+and energy points, action, latency of request and line of game log).
+Bots only put entries to bounded queue, background thread serializes
+and writes them in batches, so write never blocks turn: entries are
+dropped (and counted) if writer is behind or file can not be written,
+I/O errors are logged and writer goes on. File is append-only, when it
+grows over `max_bytes` it is compressed to `<filename>.1.gz` and older
+files are shifted up to `backups`.
+
+`read` yields entries of all files from the oldest for analysis.
+"""
+
+import os
+import re
+import gzip
+import json
+import Queue
+import shutil
+import threading
+import traceback
+
+from . import logger
+
+_STOP = object()  # Marker of the end of queue.
+
+
+class Journal(object):
+
+    """Class for write entries of turns of bots in background thread."""
+
+    def __init__(self, filename, max_bytes=10485760, backups=5,
+                 queue_size=10000):
+        """
+        Initialization class.
+
+        :param filename: path to JSON lines file.
+        :param max_bytes (optional): `int` size of file before rotation,
+            0 for no rotation.
+        :param backups (optional): `int` count of compressed old files.
+        :param queue_size (optional): `int` max count of not written
+            entries.
+        """
+        self.filename = filename
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._queue = Queue.Queue(queue_size)
+        self._thread = None
+
+        self.dropped = 0  # Entries lost because writer is behind.
+
+    def write(self, entry):
+        """
+        Add entry without wait.
+
+        :param entry: `dict` serializable to JSON.
+        :returns: `False` if queue is full and entry is dropped.
+        """
+        try:
+            self._queue.put_nowait(entry)
+        except Queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def start(self):
+        """Start writer in background thread."""
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        """
+        Write entries in batches until stop.
+
+        I/O errors are logged and entries of failed batch are dropped,
+        file is opened again for next batch.
+        """
+        f = None
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            entries = [entry for entry in batch if entry is not _STOP]
+            try:
+                if f is None:
+                    f = open(self.filename, 'ab')
+                for entry in entries:
+                    try:
+                        f.write(json.dumps(entry, sort_keys=True) + '\n')
+                    except (TypeError, ValueError):
+                        logger.info(traceback.format_exc())
+                f.flush()
+
+                if self._max_bytes and f.tell() >= self._max_bytes:
+                    f.close()
+                    f = None
+                    self.rotate()
+                    f = open(self.filename, 'ab')
+            except (IOError, OSError):
+                logger.info(traceback.format_exc())
+                self.dropped += len(entries)
+                f = self._close(f)
+
+            if len(entries) < len(batch):  # Stop marker.
+                break
+        self._close(f)
+
+    @staticmethod
+    def _close(f):
+        """
+        Close file and ignore I/O errors.
+
+        :returns: `None`.
+        """
+        if f is not None:
+            try:
+                f.close()
+            except (IOError, OSError):
+                logger.info(traceback.format_exc())
+        return None
+
+    def rotate(self):
+        """Compress current file and shift old files."""
+        if self._backups:
+            for number in range(self._backups - 1, 0, -1):
+                source = '{}.{}.gz'.format(self.filename, number)
+                if os.path.exists(source):
+                    os.rename(source, '{}.{}.gz'.format(
+                        self.filename, number + 1
+                    ))
+            target = '{}.1.gz'.format(self.filename)
+            with open(self.filename, 'rb') as f, gzip.open(target, 'wb') as g:
+                shutil.copyfileobj(f, g)
+        os.remove(self.filename)
+
+    def stop(self, timeout=10):
+        """
+        Write queued entries and stop writer.
+
+        :param timeout (optional): seconds to wait for writer.
+        """
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except Queue.Full:
+                logger.info('Journal writer is stuck, entries are lost.')
+            else:
+                self._thread.join(timeout)
+        self._thread = None
+
+
+def read(filename):
+    """
+    Read entries of journal from the oldest.
+
+    :param filename: path to current file of journal.
+    :returns: generator of `dict` entries.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    name = re.escape(os.path.basename(filename))
+    number = re.compile(name + r'\.(\d+)\.gz$')
+    backups = sorted([
+        (int(match.group(1)), os.path.join(directory, match.group(0)))
+        for match in map(number.match, os.listdir(directory)) if match
+    ], reverse=True)
+
+    files = [path for _, path in backups]
+    if os.path.exists(filename):
+        files.append(filename)
+
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                if line.endswith('\n'):  # Last line may be not written yet.
+                    yield json.loads(line)
+
+
+def get_journal(settings, worker=0):
+    """
+    Create journal by settings.
+
+    :param settings: section `journal` of settings.
+    :param worker (optional): `int` number of worker process for name of
+        file.
+    :returns: `Journal` instance or `None` if journal is disabled.
+    """
+    if not settings.enabled:
+        return None
+    return Journal(
+        settings.filename.format(worker=worker), settings.max_bytes,
+        settings.backups, settings.queue_size
+    )
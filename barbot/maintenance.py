@@ -0,0 +1,194 @@
+# coding=utf-8
+"""
+Out-of-battle chores of bot.
+
+`Maintenance` runs chores (repair of equipment, refresh of hero page for
+tire) in pause between turns, never between choice and request of
+action. Chore is due after `interval` seconds, after `actions` actions
+of game (equipment wears with actions) or when it is triggered. First
+due time of every account is shifted by stable part of interval, so
+chores of many accounts of fleet do not hit server at once. Every chore
+is measured as phase `chore_<name>` and counted in metrics.
+"""
+
+import time
+import zlib
+import traceback
+
+from . import logger
+
+
+class Chore(object):
+
+    """Class for keep schedule of one chore."""
+
+    __slots__ = ('name', 'function', 'interval', 'actions', 'due', 'count')
+
+    def __init__(self, name, function, interval=0, actions=0, due=None):
+        """
+        Initialization class.
+
+        :param name: name of chore for metrics.
+        :param function: function which does chore, it takes seconds
+            before next turn.
+        :param interval (optional): seconds between runs, 0 for no
+            schedule by time.
+        :param actions (optional): `int` actions between runs, 0 for no
+            schedule by actions.
+        :param due (optional): time of first run by schedule.
+        """
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.actions = actions
+        self.due = due  # Time of next run by schedule.
+        self.count = 0  # Actions since last run.
+
+    def is_due(self, now):
+        """
+        Check need of run.
+
+        :param now: `float` current time.
+        :returns: `bool`.
+        """
+        if self.actions and self.count >= self.actions:
+            return True
+        return self.due is not None and self.due <= now
+
+    def reset(self, now):
+        """
+        Schedule next run after run.
+
+        :param now: `float` current time.
+        """
+        self.count = 0
+        if self.interval:
+            self.due = now + self.interval
+        else:
+            self.due = None
+
+
+class Maintenance(object):
+
+    """Class for run chores of one bot in pause between turns."""
+
+    def __init__(self, bot, spread=True, clock=time.time):
+        """
+        Initialization class.
+
+        :param bot: `barbot.Bot` instance.
+        :param spread (optional): shift first runs by name of account.
+        :param clock (optional): function which returns current time.
+        """
+        self._bot = bot
+        self._clock = clock
+        self._offset = 0.0
+        if spread:
+            account = bot.metrics.account or ''
+            if isinstance(account, unicode):
+                account = account.encode('utf-8')
+            self._offset = zlib.crc32(account) % 1000 / 1e3
+        self.chores = []
+
+    def add(self, name, function, interval=0, actions=0):
+        """
+        Add chore.
+
+        :param name: name of chore for metrics.
+        :param function: function which takes seconds before next turn.
+        :param interval (optional): seconds between runs.
+        :param actions (optional): `int` actions between runs.
+        :returns: `Chore` instance.
+        """
+        due = None
+        if interval:
+            due = self._clock() + interval * self._offset
+        chore = Chore(name, function, interval, actions, due)
+        self.chores.append(chore)
+        return chore
+
+    def count_action(self):
+        """Count action of game for chores scheduled by actions."""
+        for chore in self.chores:
+            chore.count += 1
+
+    def trigger(self, name):
+        """
+        Run chore in next pause, for example by signal of game page.
+
+        :param name: name of chore.
+        """
+        for chore in self.chores:
+            if chore.name == name:
+                chore.due = self._clock()
+
+    def run(self, ahead=0):
+        """
+        Run due chores, errors are logged and chores are rescheduled.
+
+        :param ahead (optional): seconds before next turn.
+        :returns: `list` of names of done chores.
+        """
+        done = []
+        metrics = self._bot.metrics
+        for chore in self.chores:
+            now = self._clock()
+            if not chore.is_due(now):
+                continue
+            try:
+                with metrics.span('chore_' + chore.name):
+                    chore.function(ahead)
+            except Exception:
+                logger.info(traceback.format_exc())
+            metrics.increment('chore_' + chore.name)
+            chore.reset(self._clock())
+            done.append(chore.name)
+        return done
+
+
+def repair(bot):
+    """
+    Create chore which repairs equipment by one request if it is needed.
+
+    :param bot: `barbot.Bot` instance, hero is taken on every run because
+        it is created again by login.
+    :returns: function of chore.
+    """
+    def chore(ahead):
+        if bot.hero.repair_equipment():
+            logger.info('Equipment is repaired.')
+    return chore
+
+
+def refresh_status(bot):
+    """
+    Create chore which fetches hero page if status expires before turn.
+
+    :param bot: `barbot.Bot` instance.
+    :returns: function of chore.
+    """
+    return lambda ahead: bot.hero._refresh_status(ahead)
+
+
+def get_maintenance(bot, settings):
+    """
+    Create maintenance of bot by settings.
+
+    :param bot: `barbot.Bot` instance.
+    :param settings: section `maintenance` of settings.
+    :returns: `Maintenance` instance or `None` if it is disabled.
+    """
+    if not settings.enabled:
+        return None
+
+    maintenance = Maintenance(bot, settings.spread)
+    if settings.repair_interval or settings.repair_actions:
+        maintenance.add(
+            'repair', repair(bot), settings.repair_interval,
+            settings.repair_actions
+        )
+    if settings.status_interval:
+        maintenance.add(
+            'status', refresh_status(bot), settings.status_interval
+        )
+    return maintenance
@@ -0,0 +1,298 @@
+# coding=utf-8
+"""
+Latency of phases of turn and counters of bots.
+
+`Metrics` of every account aggregates seconds of phases into histograms
+with fixed buckets and counts actions, entries and requests. Phases:
+
+- `ttfb`: request until headers of response (with connect of new
+  connections, DNS and connect are not separated by `requests`);
+- `body`: read of body of response;
+- `move`, `hero_page`: request and parse of game and hero pages;
+- `parse`: parse of game and hero pages (with reuse of cached pages),
+  for streaming only time of parser without receipt of chunks;
+- `actions`: parse of actions of page;
+- `decision`: choice of action by strategy.
+
+`Exporter` periodically writes metrics of all bots of process to file in
+Prometheus text format (for textfile collector) or as JSON snapshot.
+"""
+
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+import contextlib
+
+# Upper bounds of buckets of histograms, seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+
+    """Class for count values in buckets."""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=BUCKETS):
+        """
+        Initialization class.
+
+        :param buckets (optional): sorted upper bounds of buckets.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last is for overflow.
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Add value.
+
+        :param value: `float` value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        """
+        Get state of histogram.
+
+        :returns: `dict` with cumulative counts of buckets, count and sum.
+        """
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return {
+            'buckets': list(self.buckets) + ['+Inf'],
+            'cumulative': cumulative,
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+
+class Metrics(object):
+
+    """Class for collect metrics of one account."""
+
+    def __init__(self, account=None, buckets=BUCKETS):
+        """
+        Initialization class.
+
+        :param account (optional): name of account for labels.
+        :param buckets (optional): upper bounds of buckets of histograms.
+        """
+        self.account = account
+        self._buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()  # Turns and prefetch run in threads.
+
+    def observe(self, phase, seconds):
+        """
+        Add duration of phase.
+
+        :param phase: name of phase.
+        :param seconds: `float` duration.
+        """
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1):
+        """
+        Increase counter.
+
+        :param name: name of counter.
+        :param value (optional): `int` increment.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def span(self, phase):
+        """
+        Measure duration of block as phase.
+
+        :param phase: name of phase.
+        """
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.time() - started)
+
+    def hook(self, response, *args, **kwargs):
+        """
+        Response hook of `requests.Session` for network phases.
+
+        Body of not streamed response is read here to measure it, it is
+        read at this moment by `requests` anyway.
+        """
+        self.increment('requests')
+        self.observe('ttfb', response.elapsed.total_seconds())
+        if not kwargs.get('stream'):
+            started = time.time()
+            response.content
+            self.observe('body', time.time() - started)
+
+    def snapshot(self):
+        """
+        Get state of metrics.
+
+        :returns: `dict` with account, histograms of phases and counters.
+        """
+        with self._lock:
+            return {
+                'account': self.account,
+                'phases': {
+                    phase: histogram.to_dict()
+                    for phase, histogram in self._histograms.items()
+                },
+                'counters': dict(self._counters),
+            }
+
+
+def _format_labels(labels):
+    """Format labels of Prometheus sample."""
+    escaped = []
+    for name, value in labels:
+        value = u'{}'.format(value).replace('\\', '\\\\')
+        value = value.replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(u'{}="{}"'.format(name, value))
+    return u'{' + u','.join(escaped) + u'}'
+
+
+def to_prometheus(snapshots):
+    """
+    Format metrics in Prometheus text format.
+
+    :param snapshots: `list` of results of `Metrics.snapshot`.
+    :returns: `unicode` text.
+    """
+    lines = [u'# TYPE barbot_phase_seconds histogram']
+    for snapshot in snapshots:
+        account = (('account', snapshot['account'] or u''),)
+        for phase, histogram in sorted(snapshot['phases'].items()):
+            labels = account + (('phase', phase),)
+            for bound, count in zip(histogram['buckets'],
+                                    histogram['cumulative']):
+                lines.append(u'barbot_phase_seconds_bucket{} {}'.format(
+                    _format_labels(labels + (('le', bound),)), count
+                ))
+            lines.append(u'barbot_phase_seconds_sum{} {!r}'.format(
+                _format_labels(labels), histogram['sum']
+            ))
+            lines.append(u'barbot_phase_seconds_count{} {}'.format(
+                _format_labels(labels), histogram['count']
+            ))
+
+    names = sorted(set(
+        name for snapshot in snapshots for name in snapshot['counters']
+    ))
+    for name in names:
+        lines.append(u'# TYPE barbot_{}_total counter'.format(name))
+        for snapshot in snapshots:
+            if name in snapshot['counters']:
+                lines.append(u'barbot_{}_total{} {}'.format(
+                    name,
+                    _format_labels((('account', snapshot['account'] or u''),)),
+                    snapshot['counters'][name]
+                ))
+
+    return u'\n'.join(lines) + u'\n'
+
+
+def to_json(snapshots):
+    """
+    Format metrics as JSON snapshot.
+
+    :param snapshots: `list` of results of `Metrics.snapshot`.
+    :returns: `str` text.
+    """
+    return json.dumps({'time': time.time(), 'accounts': snapshots})
+
+
+class Exporter(object):
+
+    """Class for periodic write of metrics of bots to file."""
+
+    formats = {'prometheus': to_prometheus, 'json': to_json}
+
+    def __init__(self, filename, format='prometheus', interval=60):
+        """
+        Initialization class.
+
+        :param filename: path to file of metrics.
+        :param format (optional): `prometheus` or `json`.
+        :param interval (optional): seconds between writes.
+        """
+        self._filename = filename
+        self._format = self.formats[format]
+        self._interval = interval
+        self._metrics = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, metrics):
+        """
+        Add metrics of bot for export.
+
+        :param metrics: `Metrics` instance.
+        """
+        self._metrics.append(metrics)
+
+    def write(self):
+        """Write metrics to file at once."""
+        text = self._format([metrics.snapshot() for metrics in self._metrics])
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+
+        directory = os.path.dirname(os.path.abspath(self._filename))
+        descriptor, filename = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(text)
+        os.rename(filename, self._filename)
+
+    def start(self):
+        """Start periodic write in background thread."""
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        """Write metrics until stop."""
+        while not self._stop.wait(self._interval):
+            self.write()
+
+    def stop(self):
+        """Stop periodic write and write the last metrics."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+
+def get_exporter(settings, worker=0):
+    """
+    Create exporter by settings.
+
+    :param settings: section `metrics` of settings.
+    :param worker (optional): `int` number of worker process for name of
+        file.
+    :returns: `Exporter` instance or `None` if export is disabled.
+    """
+    if not settings.enabled:
+        return None
+    return Exporter(
+        settings.filename.format(worker=worker), settings.format,
+        settings.interval
+    )
@@ -0,0 +1,74 @@
+# coding=utf-8
+"""
+Prefetch of read-only data in pause between turns.
+
+`Prefetcher` runs requests and parsing which do not change state of game
+(hero page for tire, actions of current page) in background thread while
+bot waits for next turn, so the next turn makes only the request of
+action.
+
+Session of bot is not used by two threads at once: `wait` must be called
+before the next request of turn. So prefetch must not be started before
+urgent action without pause, it would delay the action by its requests.
+"""
+
+import threading
+import traceback
+
+from . import logger
+
+
+class Prefetcher(object):
+
+    """Class for prefetch of data of one bot."""
+
+    def __init__(self, bot, actions=True):
+        """
+        Initialization class.
+
+        :param bot: `barbot.Bot` instance with chosen game.
+        :param actions (optional): parse actions of current page.
+        """
+        self._bot = bot
+        self._actions = actions
+        self._thread = None
+
+    def start(self, ahead=0):
+        """
+        Start prefetch in background thread.
+
+        :param ahead (optional): seconds before next turn, hero page is
+            fetched if its status expires before next turn.
+        """
+        self.wait()
+        self._thread = threading.Thread(target=self._run, args=(ahead,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, ahead):
+        """Fetch data, errors are left for the next turn."""
+        try:
+            self._bot.hero._refresh_status(ahead)
+            if self._actions:
+                self._bot.get_actions().copy()
+        except Exception:
+            logger.info(traceback.format_exc())
+
+    def wait(self):
+        """Wait for the end of prefetch."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def get_prefetcher(bot, settings):
+    """
+    Create prefetcher by settings.
+
+    :param bot: `barbot.Bot` instance with chosen game.
+    :param settings: section `prefetch` of settings.
+    :returns: `Prefetcher` instance or `None` if prefetch is disabled.
+    """
+    if not settings.enabled:
+        return None
+    return Prefetcher(bot, settings.actions)
@@ -0,0 +1,233 @@
+# coding=utf-8
+"""
+Profiling of bot loop.
+
+Profilers write collapsed stacks (`module:function;module:function count`
+per line), which are read by standard flamegraph tools, for example
+`flamegraph.pl profile.txt > profile.svg`.
+
+- `Sampler`: samples stack of main thread by `SIGPROF` every `interval`
+  seconds of CPU time, count is number of samples. Low overhead, so it is
+  suitable for production hosts.
+- `Tracer`: records every call by `sys.setprofile`, count is microseconds
+  of own time of stack. Exact, but slows down the profiled code.
+- `MemoryProfiler`: compares `tracemalloc` snapshots after every turn,
+  `tracemalloc` is optional (Python 3.4+ or `pytracemalloc`).
+"""
+
+import sys
+import time
+import signal
+import collections
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def get_frame_name(frame):
+    """
+    Get name of frame for collapsed stacks.
+
+    :param frame: frame object.
+    :returns: `str` `module:function`.
+    """
+    return '{}:{}'.format(
+        frame.f_globals.get('__name__', '?'), frame.f_code.co_name
+    )
+
+
+def get_stack(frame):
+    """
+    Get collapsed stack of frame from the outermost call.
+
+    :param frame: frame object or `None`.
+    :returns: `str` names of frames separated by `;`.
+    """
+    names = []
+    while frame is not None:
+        names.append(get_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler(object):
+
+    """Base class of profilers with collapsed stacks."""
+
+    def __init__(self):
+        """Initialization class."""
+        self.stacks = collections.defaultdict(float)
+
+    def start(self):
+        """Start profiling."""
+        raise NotImplementedError('Need override this function.')
+
+    def stop(self):
+        """Stop profiling."""
+        raise NotImplementedError('Need override this function.')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def get_lines(self):
+        """
+        Get collapsed stacks, the heaviest first.
+
+        :returns: `list` of `str` lines.
+        """
+        return [
+            '{} {}'.format(stack, int(round(count)))
+            for stack, count in sorted(
+                self.stacks.items(), key=lambda item: -item[1]
+            ) if round(count)
+        ]
+
+    def write(self, filename):
+        """
+        Write collapsed stacks to file.
+
+        :param filename: path to file.
+        """
+        with open(filename, 'w') as f:
+            for line in self.get_lines():
+                f.write(line + '\n')
+
+
+class Sampler(Profiler):
+
+    """Class for sampling profiling of main thread."""
+
+    def __init__(self, interval=0.005):
+        """
+        Initialization class.
+
+        :param interval (optional): seconds of CPU time between samples.
+        """
+        super(Sampler, self).__init__()
+        self._interval = interval
+        self._handler = None
+
+    def _sample(self, signum, frame):
+        """Handler of `SIGPROF`, add stack of interrupted frame."""
+        self.stacks[get_stack(frame)] += 1
+
+    def start(self):
+        """Start timer of samples, must be called from main thread."""
+        self._handler = signal.signal(signal.SIGPROF, self._sample)
+        # Restart system calls (socket reads) interrupted by samples.
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self._interval, self._interval)
+
+    def stop(self):
+        """Stop timer of samples."""
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._handler or signal.SIG_DFL)
+
+
+class Tracer(Profiler):
+
+    """Class for deterministic profiling of current thread."""
+
+    def __init__(self, clock=time.time):
+        """
+        Initialization class.
+
+        :param clock (optional): function which returns current time.
+        """
+        super(Tracer, self).__init__()
+        self._clock = clock
+        self._last = None
+
+    def _trace(self, frame, event, arg):
+        """Profile function, add time since last event to its stack."""
+        now = self._clock()
+        if event == 'call':
+            stack = get_stack(frame.f_back)  # Time of caller before call.
+        elif event in ('c_return', 'c_exception'):
+            stack = '{};builtins:{}'.format(get_stack(frame), arg.__name__)
+        else:
+            stack = get_stack(frame)
+
+        if stack:
+            self.stacks[stack] += (now - self._last) * 1e6
+        self._last = self._clock()  # Time of profiler itself is skipped.
+
+    def start(self):
+        """Start tracing of calls."""
+        self._last = self._clock()
+        sys.setprofile(self._trace)
+
+    def stop(self):
+        """Stop tracing of calls."""
+        sys.setprofile(None)
+
+
+class MemoryProfiler(object):
+
+    """Class for compare allocations of memory between turns."""
+
+    def __init__(self, filename, limit=10, frames=1):
+        """
+        Initialization class.
+
+        :param filename: path to file of report.
+        :param limit (optional): `int` count of lines with the largest
+            growth per turn.
+        :param frames (optional): `int` count of frames of traceback of
+            allocation.
+        :raises: `RuntimeError` if `tracemalloc` is not available.
+        """
+        if tracemalloc is None:
+            raise RuntimeError('Module `tracemalloc` is not available.')
+
+        self._filename = filename
+        self._limit = limit
+        self._frames = frames
+        self._snapshot = None
+        self._turn = 0
+
+    def start(self):
+        """Start tracing of allocations and take first snapshot."""
+        tracemalloc.start(self._frames)
+        self._snapshot = tracemalloc.take_snapshot()
+        open(self._filename, 'w').close()
+
+    def snapshot(self, *args):
+        """Take snapshot after turn and write growth since previous one."""
+        snapshot = tracemalloc.take_snapshot()
+        statistics = snapshot.compare_to(self._snapshot, 'lineno')
+        self._snapshot = snapshot
+        self._turn += 1
+
+        current, peak = tracemalloc.get_traced_memory()
+        with open(self._filename, 'a') as f:
+            f.write('Turn {}: current {} B, peak {} B\n'.format(
+                self._turn, current, peak
+            ))
+            for statistic in statistics[:self._limit]:
+                f.write('    {}\n'.format(statistic))
+
+    def stop(self):
+        """Stop tracing of allocations."""
+        tracemalloc.stop()
+
+
+def get_profiler(mode, interval=0.005):
+    """
+    Create profiler.
+
+    :param mode: `sample` or `trace`.
+    :param interval (optional): seconds between samples for `sample`.
+    :returns: `Profiler` instance.
+    """
+    if mode == 'sample':
+        return Sampler(interval)
+    elif mode == 'trace':
+        return Tracer()
+    raise ValueError('Unknown mode of profiler: {}.'.format(mode))
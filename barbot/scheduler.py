@@ -0,0 +1,131 @@
+# coding=utf-8
+"""
+Pacing of turns.
+
+`Pacer` keeps target rate of actions: time of request and parse of turn
+is subtracted from pause before next turn, pauses vary by jitter to keep
+human-like spacing. Urgent actions (like retreat after damage) skip the
+pause.
+"""
+
+import time
+import random
+
+
+class Pacer(object):
+
+    """Class for pause between turns of one player."""
+
+    def __init__(self, rate=None, jitter=0.25, min_interval=0,
+                 clock=time.time, sleep=time.sleep):
+        """
+        Initialization class.
+
+        :param rate (optional): `float` target actions per hour, `None` for
+            no pauses.
+        :param jitter (optional): `float` max relative deviation of interval
+            between actions.
+        :param min_interval (optional): `float` min seconds between starts of
+            actions, also for urgent actions.
+        :param clock (optional): function which returns current time.
+        :param sleep (optional): function which waits seconds.
+        """
+        self.configure(rate, jitter, min_interval)
+        self.hooks = []  # Functions which return `True` for urgent action.
+
+        self._clock = clock
+        self._sleep = sleep
+        self._random = random.Random()
+        self._started = None
+
+    def configure(self, rate=None, jitter=0.25, min_interval=0):
+        """
+        Change pacing, for example after reload of settings.
+
+        :param rate (optional): `float` target actions per hour, `None` for
+            no pauses.
+        :param jitter (optional): `float` max relative deviation of interval
+            between actions.
+        :param min_interval (optional): `float` min seconds between starts of
+            actions, also for urgent actions.
+        """
+        self.interval = 3600.0 / rate if rate else 0.0
+        self.jitter = jitter
+        self.min_interval = min_interval
+
+    def start(self):
+        """Mark start of turn."""
+        self._started = self._clock()
+
+    @property
+    def is_urgent(self):
+        """
+        Check hooks of urgent actions.
+
+        :returns: `bool`.
+        """
+        return any(hook() for hook in self.hooks)
+
+    def get_delay(self):
+        """
+        Get pause before next turn.
+
+        :returns: `float` seconds.
+        """
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = self._clock() - self._started
+
+        interval = self.min_interval
+        if not self.is_urgent:
+            deviation = self._random.uniform(-self.jitter, self.jitter)
+            interval = max(interval, self.interval * (1 + deviation))
+
+        return max(interval - elapsed, 0.0)
+
+    def wait(self):
+        """
+        Pause before next turn.
+
+        Sleep is repeated until the end of pause, because signals (for
+        example samples of profiler) interrupt it.
+        """
+        deadline = self._clock() + self.get_delay()
+        remaining = deadline - self._clock()
+        while remaining > 0:
+            self._sleep(remaining)
+            remaining = deadline - self._clock()
+
+
+def from_delay(delay, **kwargs):
+    """
+    Create pacer with same mean interval as pause in range.
+
+    :param delay: `tuple` min and max seconds between turns.
+    :returns: `Pacer` instance.
+    """
+    low, high = delay
+    if not high:
+        return Pacer(**kwargs)
+    return Pacer(
+        rate=7200.0 / (low + high),
+        jitter=float(high - low) / (high + low), **kwargs
+    )
+
+
+def get_pacer(settings, pacer=None):
+    """
+    Create pacer by settings.
+
+    :param settings: section `pacing` of settings.
+    :param pacer (optional): `Pacer` instance to configure instead of new
+        one.
+    :returns: `Pacer` instance.
+    """
+    if pacer is None:
+        pacer = Pacer()
+    pacer.configure(
+        rate=settings.rate or None, jitter=settings.jitter,
+        min_interval=settings.min_interval
+    )
+    return pacer
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""
+Selectors of elements of barbars.ru pages.
+
+All markers of layout of site are kept here, so change of site needs
+change of this module only. XPath expressions are compiled once, on first
+use (`lxml` is not imported with `barbot`), and shared by games and hero.
+"""
+
+import re
+
+
+class XPath(object):
+
+    """Class for XPath expression compiled on first call."""
+
+    __slots__ = ('path', '_compiled')
+
+    def __init__(self, path):
+        """
+        Initialization class.
+
+        :param path: `str` XPath expression, may contain `$variables`.
+        """
+        self.path = path
+        self._compiled = None
+
+    def __call__(self, element, **variables):
+        """
+        Evaluate expression.
+
+        :param element: `lxml.html` instance.
+        :param variables: values of `$variables` of expression.
+        :returns: result of expression.
+        """
+        compiled = self._compiled
+        if compiled is None:
+            from lxml import etree
+            compiled = self._compiled = etree.XPath(self.path)
+        return compiled(element, **variables)
+
+    def __repr__(self):
+        return 'XPath({!r})'.format(self.path)
+
+
+# Text normalization.
+SPACES = re.compile(r'\s+')
+
+# Links.
+LINK_HREF = XPath('//a[contains(@href, $part)]/@href')
+HREF = XPath('@href')
+SPAN_TEXT = XPath('span/text()')
+
+# Hero page: name, level, class and side in blocks with icon of side.
+HERO_BLOCKS = XPath(
+    '//*[contains(img/@src, "blue_") or contains(img/@src, "red_")]'
+    '//span/text()'
+)
+# Health and energy points on hero and game pages.
+STATUS = XPath('//*[contains(img/@src, "life")]/span/text()')
+TIRE = XPath('boolean(//a[contains(@href, "tire")])')
+REPAIR_HREF = XPath('//a[contains(@href, "repairLink")]/@href')
+
+# Towers.
+TITLE_TEXT = XPath('//h1//text()')
+LOCATION_TEXT = XPath('//h1/span/text()')
+NEAR_LOCATION = XPath('//a[contains(@href, "nearLocation")]')
+LOG_TEXT = XPath(u'//div[contains(text(), "Ты")][1]//text()')
@@ -0,0 +1,442 @@
+# coding=utf-8
+"""
+Fake barbars.ru for run bots without network.
+
+`Application` is WSGI application which simulates login, hero pages and
+towers game. It can be mounted to session by `transports.configure` or
+served on localhost by `Server`.
+"""
+
+import re
+import gzip
+import random
+import socket
+import urlparse
+import threading
+import StringIO
+import SocketServer
+from wsgiref import simple_server, util
+
+LOCATIONS = (
+    u'Южная столица', u'Южная башня', u'Южный мост', u'Центральная башня',
+    u'Северный мост', u'Северная башня', u'Северная столица',
+)
+
+HEAD = u'''<!DOCTYPE html PUBLIC "-//WAPFORUM//DTD XHTML Mobile 1.0//EN" \
+"http://www.wapforum.org/DTD/xhtml-mobile10.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=utf-8"/>
+<title>{title}</title>
+<link rel="stylesheet" type="text/css" href="/css/main.css"/>
+</head>
+<body>
+'''
+
+FOOTER = u'''<div class="footer">
+<a href="user">Мой герой</a> |
+<a href="chat">Чат</a> |
+<a href="forum">Форум</a><br/>
+<span class="minor">Онлайн: {online}</span>
+</div>
+</body>
+</html>
+'''
+
+STATUS = u'''<div class="block">
+<img src="/images/icons/life.png" alt="hp"/><span>{hp}</span> |
+<img src="/images/icons/energy.png" alt="ep"/><span>{ep}</span>
+</div>
+'''
+
+LINK = (
+    u'<a class="flhdr" href="game/towers/?wicket:interface=:{counter}:'
+    u'actions:{token}Link::ILinkListener::">{label}</a><br/>\n'
+)
+
+ACTIONS = (
+    ('damageRandom', u'Бить любого'),
+    ('damageLast', u'Бить {enemy}'),
+    ('damageTower', u'Бить башню'),
+    ('energyDamageRandom', u'Жечь любого'),
+    ('energyDamageLast', u'Жечь {enemy}'),
+    ('healRandom', u'Лечить любого'),
+    ('healLast', u'Лечить {ally}'),
+    ('healSelf', u'Лечить себя'),
+)
+
+SKILLS = (u'Ярость', u'Оглушение', u'Щит')
+
+
+class Hero(object):
+
+    """Class for keep state of hero on fake server."""
+
+    def __init__(self, id, name):
+        """
+        Initialization class.
+
+        :param id: `int` id of hero.
+        :param name: `str` name of hero.
+        """
+        self.id = id
+        self.name = name
+        self.hp = 1500
+        self.ep = 400
+        self.location = None
+        self.actions = 0
+        self.wear = 0
+        self.counter = 0
+        self.log = []
+
+
+class Application(object):
+
+    """WSGI application which simulates barbars.ru."""
+
+    def __init__(self, seed=None, tire=None, hero_class=u'воин',
+                 compress=False):
+        """
+        Initialization class.
+
+        :param seed (optional): seed of random for reproducible battles.
+        :param tire (optional): `int` count of actions before hero is tired.
+        :param hero_class (optional): class of all heroes.
+        :param compress (optional): compress pages by gzip if client accepts
+            it, only for `Server`.
+        """
+        self.requests = []  # (method, path) of all requests.
+        self.compress = compress
+
+        self._random = random.Random(seed)
+        self._tire = tire
+        self._class = hero_class
+        self._heroes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        """Handle request."""
+        method = environ['REQUEST_METHOD']
+        path = environ.get('PATH_INFO', '/')
+        query = environ.get('QUERY_STRING', '')
+
+        with self._lock:
+            self.requests.append((method, path))
+
+            if path.startswith('/login') and method == 'POST':
+                return self._login(environ, start_response)
+
+            hero = self._get_hero(environ)
+            if hero is None and path.startswith('/login'):
+                page = self._render(u'Вход', u'<h1>Вход</h1>\n')
+            elif hero is None and path != '/':
+                return self._redirect(environ, start_response, 'login')
+            else:
+                page = self._route(hero, path.rstrip('/'), query)
+
+        if page is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return ['Not found']
+
+        content = page.encode('utf-8')
+        headers = [('Content-Type', 'text/html; charset=utf-8')]
+        if self.compress and 'gzip' in environ.get('HTTP_ACCEPT_ENCODING', ''):
+            buffer = StringIO.StringIO()
+            with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+                f.write(content)
+            content = buffer.getvalue()
+            headers.append(('Content-Encoding', 'gzip'))
+
+        headers.append(('Content-Length', str(len(content))))
+        start_response('200 OK', headers)
+        return [content]
+
+    def _route(self, hero, path, query):
+        """
+        Get page by path.
+
+        :returns: `unicode` page or `None`.
+        """
+        if path == '':
+            return self._render(u'Варвары', u'<h1>Варвары</h1>\n')
+
+        hero.counter += 1
+        if path == '/user':
+            return self._render_user(hero)
+        elif path == '/user/body/id/{}'.format(hero.id):
+            return self._render_body(hero, query)
+        elif path == '/game/towers' and not query:
+            hero.location = None
+            return self._render_entry(hero)
+        elif path == '/game/towers':
+            self._act(hero, query)
+            return self._render_location(hero)
+        return None
+
+    def _login(self, environ, start_response):
+        """Authenticate hero by login form."""
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        form = urlparse.parse_qs(environ['wsgi.input'].read(length))
+        login = form.get('login', [''])[0].decode('utf-8')
+
+        if not login or not form.get('password', [''])[0]:
+            return self._redirect(environ, start_response, 'login')
+
+        hero = None
+        for candidate in self._heroes.values():
+            if candidate.name == login:
+                hero = candidate
+        if hero is None:
+            hero = Hero(len(self._heroes) + 1, login)
+            self._heroes[hero.id] = hero
+
+        return self._redirect(
+            environ, start_response, 'user', 'id={}; Path=/'.format(hero.id)
+        )
+
+    def _get_hero(self, environ):
+        """Get hero by cookie `id`."""
+        cookie = environ.get('HTTP_COOKIE', '')
+        match = re.search(r'(?:^|;\s*)id=(\d+)', cookie)
+        if match is None:
+            return None
+        return self._heroes.get(int(match.group(1)))
+
+    @staticmethod
+    def _redirect(environ, start_response, location, cookie=None):
+        """Redirect to location relative to host."""
+        headers = [('Location', util.application_uri(environ) + location)]
+        if cookie is not None:
+            headers.append(('Set-Cookie', cookie))
+        start_response('302 Found', headers)
+        return ['']
+
+    def _is_tired(self, hero):
+        """Check tire of hero."""
+        return self._tire is not None and hero.actions >= self._tire
+
+    def _render(self, title, content, hero=None):
+        """Render page with header and footer."""
+        page = HEAD.format(title=title) + content
+        if hero is not None and self._is_tired(hero):
+            page += u'<div class="block">\n<a href="user/tire">Отдых</a>\n'
+            page += u'</div>\n'
+        return page + FOOTER.format(online=self._random.randint(1000, 2000))
+
+    def _render_user(self, hero):
+        """Render page of hero."""
+        content = (
+            u'<div class="head">\n<h1>Мой герой</h1>\n</div>\n'
+            u'<div class="block">\n'
+            u'<img src="/images/icons/blue_warrior.png" alt=""/>\n'
+            u'<span>{name}</span>, <span> 25 </span> ур.<br/>\n'
+            u'Класс: <span>{hero_class}</span>, сторона: <span>юг</span>\n'
+            u'</div>\n'
+        ).format(name=hero.name, hero_class=self._class)
+        content += STATUS.format(hp=hero.hp, ep=hero.ep)
+        content += (
+            u'<div class="block">\n'
+            u'<a href="user/body/id/{}">Снаряжение</a><br/>\n</div>\n'
+        ).format(hero.id)
+        return self._render(u'Мой герой', content, hero)
+
+    def _render_body(self, hero, query):
+        """Render equipment of hero and repair it by link."""
+        if 'repairLink' in query:
+            hero.wear = 0
+
+        content = u'<div class="head">\n<h1>Снаряжение</h1>\n</div>\n'
+        if hero.wear >= 100:
+            content += (
+                u'<div class="block"><a href="user/body/id/{}/?wicket:'
+                u'interface=:{}:repairLink::ILinkListener::">Починить всё</a>'
+                u'</div>\n'
+            ).format(hero.id, hero.counter)
+        return self._render(u'Снаряжение', content, hero)
+
+    def _render_entry(self, hero):
+        """Render entry page of towers."""
+        content = u'<div class="head">\n<h1>{}</h1>\n</div>\n'.format(
+            LOCATIONS[0]
+        )
+        content += STATUS.format(hp=hero.hp, ep=hero.ep)
+        content += (
+            u'<div class="block">\n<a href="game/towers/?wicket:interface='
+            u':{}:nearLocationLink::ILinkListener::"><img src="/images/'
+            u'icons/arrow-n.png" alt=""/><span>{}</span></a><br/>\n</div>\n'
+        ).format(hero.counter, LOCATIONS[1])
+        return self._render(u'Башни', content, hero)
+
+    def _act(self, hero, query):
+        """Do action of hero by link."""
+        match = re.search(r':(\w+?)Link::', query)
+        token = match.group(1) if match else ''
+        location = re.search(r'locations:(\d+):', query)
+
+        if token == 'nearLocation':
+            hero.location = 1
+        elif location is not None and hero.location is not None:
+            hero.location = self._get_neighbours(hero)[int(location.group(1))]
+            hero.log.insert(0, u'Ты перешёл в локацию {}'.format(
+                LOCATIONS[hero.location]
+            ))
+        elif token in dict(ACTIONS) or token == 'ability':
+            hero.actions += 1
+            hero.wear += 1
+            damage = self._random.randint(50, 150)
+            hero.log.insert(0, u'Ты ударил врага на {}'.format(damage))
+            if self._random.random() < 0.3:
+                hero.hp = max(hero.hp - damage, 1)
+                hero.log.insert(0, u'Враг ударил тебя на {}'.format(damage))
+            else:
+                hero.hp = min(hero.hp + 20, 1500)
+            hero.ep = max(hero.ep - 10, 0)
+
+        del hero.log[10:]
+
+    @staticmethod
+    def _get_neighbours(hero):
+        """Get indexes of neighbour locations."""
+        return [
+            index for index in (hero.location - 1, hero.location + 1)
+            if 0 <= index < len(LOCATIONS)
+        ]
+
+    def _render_location(self, hero):
+        """Render location of towers with actions."""
+        if hero.location is None:
+            return self._render_entry(hero)
+
+        content = u'<div class="head">\n<h1><span>{}</span></h1>\n</div>\n'
+        content = content.format(LOCATIONS[hero.location])
+        content += STATUS.format(hp=hero.hp, ep=hero.ep)
+
+        enemies = self._random.randint(0, 5)
+        content += u'<div class="block center">\n'
+        if enemies:
+            for token, label in ACTIONS:
+                content += LINK.format(
+                    counter=hero.counter, token=token,
+                    label=label.format(enemy=u'Злобный_Орк', ally=u'Друг')
+                )
+        content += u'</div>\n<div class="block">\n'
+        if enemies:
+            for number, skill in enumerate(SKILLS):
+                content += (
+                    u'<a class="btn{}" href="game/towers/?wicket:interface='
+                    u':{}:abilities:{}:abilityLink::ILinkListener::">{}</a>\n'
+                ).format(
+                    ' buff' if number == 2 else '', hero.counter, number,
+                    skill
+                )
+        content += u'</div>\n<div class="block">\n'
+        for number, index in enumerate(self._get_neighbours(hero)):
+            direction = 'n' if index > hero.location else 's'
+            content += (
+                u'<a href="game/towers/?wicket:interface=:{}:locations:{}:'
+                u'locationLink::ILinkListener::"><img src="/images/icons/'
+                u'arrow-{}.png" alt=""/><span>{}</span></a><br/>\n'
+            ).format(hero.counter, number, direction, LOCATIONS[index])
+        content += u'</div>\n<div class="block">\n'
+        content += u'<span class="minor">Враги: {}</span>\n</div>\n'.format(
+            enemies
+        )
+        if hero.wear >= 100:
+            content += (
+                u'<div class="block">Снаряжение изношено: <a href="user/body/'
+                u'id/{}/?wicket:interface=:{}:repairLink::ILinkListener::">'
+                u'починить</a></div>\n'
+            ).format(hero.id, hero.counter)
+        content += u'<div class="block log">\n'
+        for line in hero.log or [u'Ты в бою']:
+            content += u'<div>{}</div>\n'.format(line)
+        content += u'</div>\n'
+
+        return self._render(u'Башни', content, hero)
+
+
+class Server(object):
+
+    """
+    Class for serve application on localhost in thread.
+
+    Connections are kept alive by HTTP/1.1 if response has length.
+    """
+
+    def __init__(self, application=None, port=0):
+        """
+        Initialization class and start server.
+
+        :param application (optional): WSGI application, `Application` by
+            default.
+        :param port (optional): `int` port, free port by default.
+        """
+        self.application = application or Application()
+
+        class WSGIServer(SocketServer.ThreadingMixIn,
+                         simple_server.WSGIServer):
+            daemon_threads = True
+
+        class ServerHandler(simple_server.ServerHandler):
+            http_version = '1.1'
+
+            def cleanup_headers(self):
+                simple_server.ServerHandler.cleanup_headers(self)
+                if 'Content-Length' not in self.headers:
+                    self.request_handler.close_connection = 1
+                if self.request_handler.close_connection:
+                    self.headers['Connection'] = 'close'
+
+        class WSGIRequestHandler(simple_server.WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                self.server.connections.add(self.connection)
+                try:
+                    self.close_connection = 1
+                    self.handle_one_request()
+                    while not self.close_connection:
+                        self.handle_one_request()
+                except socket.error:
+                    pass
+                finally:
+                    self.server.connections.discard(self.connection)
+
+            def handle_one_request(self):
+                self.raw_requestline = self.rfile.readline(65537)
+                if not self.raw_requestline or not self.parse_request():
+                    self.close_connection = 1
+                    return
+
+                handler = ServerHandler(
+                    self.rfile, self.wfile, self.get_stderr(),
+                    self.get_environ()
+                )
+                handler.request_handler = self
+                handler.run(self.server.get_app())
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = simple_server.make_server(
+            '127.0.0.1', port, self.application, WSGIServer,
+            WSGIRequestHandler
+        )
+        self._server.connections = set()
+        self.host = 'http://127.0.0.1:{}/'.format(self._server.server_port)
+
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        """Stop server and close keep-alive connections."""
+        self._server.shutdown()
+        self._server.server_close()
+        for connection in list(self._server.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
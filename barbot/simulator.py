@@ -0,0 +1,284 @@
+# coding=utf-8
+"""
+Offline simulator of towers for comparison of strategies.
+
+Battles of many heroes run in batch on `numpy` arrays, every turn is a
+few vector operations for all battles. Strategy is a function of dict of
+actions of the same shape as `Towers.get_actions` (like
+`strategies.choice_warrior_action`), so strategy which wins in simulation
+is used by bot without changes. Strategy is compiled to decision table:
+action for every bitmask of available actions. Links in simulated dicts
+are placeholders, so strategy must depend on availability of actions
+only.
+
+Model of towers:
+
+- locations are a line from own capital (0) to enemy capital, hero
+  starts at the first tower and towers of `towers` can be attacked;
+- count of enemies and allies at location is Poisson with mean growing
+  to enemy capital (enemies) or to own capital (allies), no enemies are
+  in own capital;
+- every enemy at location hits hero with `HIT` probability;
+- in own capital health and energy are restored, hero dies at 0 health.
+
+`numpy` is optional dependency, it is needed only for simulation.
+"""
+
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import constants
+
+# Available actions of page as (group, name), index is bit in bitmask.
+ACTIONS = (
+    ('attack', 'random'), ('attack', 'last'), ('attack', 'tower'),
+    ('heal', 'random'), ('heal', 'last'), ('heal', 'self'),
+    ('burning', 'random'), ('burning', 'last'), ('skills', None),
+    ('move', 'backward'), ('move', 'forward'), ('move', 'capital'),
+)
+(ATTACK_RANDOM, ATTACK_LAST, ATTACK_TOWER, HEAL_RANDOM, HEAL_LAST, HEAL_SELF,
+ BURNING_RANDOM, BURNING_LAST, SKILL, MOVE_BACKWARD, MOVE_FORWARD,
+ MOVE_CAPITAL) = range(len(ACTIONS))
+WAIT = len(ACTIONS)  # No action, bot enters game again.
+
+URLS = [
+    u'simulator/{}'.format(group if name is None else group + '.' + name)
+    for group, name in ACTIONS
+]
+CODES = {url: code for code, url in enumerate(URLS)}
+
+HP = 1500  # Max health points.
+EP = 400  # Max energy points.
+DAMAGE = (50, 150)  # Range of damage of hit.
+HEAL = (100, 200)  # Range of healed health points.
+HIT = 0.1  # Probability of hit by every enemy at location.
+SKILL_COST = 50
+SKILL_COOLDOWN = 5  # Turns.
+BURNING_COST = 10
+HEAL_COST = 20
+REGEN = (50, 10)  # Health and energy points per turn in own capital.
+
+Report = collections.namedtuple(
+    'Report', ('battles', 'survival', 'damage', 'tower_damage', 'healing',
+               'turns')
+)
+
+
+def get_actions(mask):
+    """
+    Create dict of actions like `Towers.get_actions` by bitmask.
+
+    :param mask: `int` bitmask of available actions.
+    :returns: `dict` of actions.
+    """
+    actions = {
+        'attack': {'random': None, 'last': None, 'tower': None},
+        'heal': {'random': None, 'last': None, 'self': None},
+        'burning': {'random': None, 'last': None},
+        'skills': [],
+        'move': {
+            'backward': [], 'forward': [], 'capital': None,
+            'retreat': None, 'tower': None,  # No graph of locations.
+        },
+    }
+    for code, (group, name) in enumerate(ACTIONS):
+        if not mask & 1 << code:
+            continue
+        if name is None:
+            actions[group].append(URLS[code])
+        elif isinstance(actions[group][name], list):
+            actions[group][name].append(URLS[code])
+        else:
+            actions[group][name] = URLS[code]
+    return actions
+
+
+def compile_policy(policy):
+    """
+    Compile strategy to decision table.
+
+    :param policy: function which takes dict of actions and returns url
+        of action or `None`.
+    :returns: `numpy.ndarray` of codes of actions by bitmask.
+    """
+    table = numpy.empty(1 << len(ACTIONS), dtype=numpy.uint8)
+    for mask in range(len(table)):
+        table[mask] = CODES.get(policy(get_actions(mask)), WAIT)
+    return table
+
+
+class Simulator(object):
+
+    """Class for simulate battles of heroes of one class in batch."""
+
+    def __init__(self, hero_class=constants.WARRIOR, battles=1000,
+                 turns=200, locations=7, towers=(3, 5), density=3.0,
+                 seed=None):
+        """
+        Initialization class.
+
+        :param hero_class (optional): `constants.WARRIOR` or
+            `constants.MEDIC`.
+        :param battles (optional): `int` count of simulated heroes.
+        :param turns (optional): `int` count of turns of every battle.
+        :param locations (optional): `int` count of locations in line.
+        :param towers (optional): indexes of locations with enemy towers.
+        :param density (optional): `float` mean count of enemies in enemy
+            capital and allies in own capital.
+        :param seed (optional): seed of random numbers, same seed gives
+            same battles for all strategies.
+        :raises: `RuntimeError` if `numpy` is not available.
+        """
+        if numpy is None:
+            raise RuntimeError('Module `numpy` is not available.')
+
+        self.hero_class = hero_class
+        self.battles = battles
+        self.turns = turns
+        self.locations = locations
+        self.seed = seed
+
+        self._enemies = numpy.linspace(0, density, locations)
+        self._allies = self._enemies[::-1].copy()
+        self._towers = numpy.zeros(locations, dtype=bool)
+        self._towers[list(towers)] = True
+        self._bits = 1 << numpy.arange(len(ACTIONS))
+
+    def _get_available(self, position, hp, ep, cooldown, last, enemies,
+                       allies):
+        """Get matrix of available actions of all battles."""
+        available = numpy.zeros((self.battles, len(ACTIONS)), dtype=bool)
+        fight = enemies > 0
+
+        if self.hero_class == constants.WARRIOR:
+            available[:, ATTACK_RANDOM] = fight
+            available[:, ATTACK_LAST] = fight & last
+            available[:, ATTACK_TOWER] = self._towers[position]
+        else:
+            healer = ep >= HEAL_COST
+            available[:, HEAL_RANDOM] = healer & (allies > 0)
+            available[:, HEAL_LAST] = healer & (allies > 0) & last
+            available[:, HEAL_SELF] = healer & (hp < HP)
+            burner = fight & (ep >= BURNING_COST)
+            available[:, BURNING_RANDOM] = burner
+            available[:, BURNING_LAST] = burner & last
+
+        available[:, SKILL] = fight & (ep >= SKILL_COST) & (cooldown == 0)
+        available[:, MOVE_BACKWARD] = position > 0
+        available[:, MOVE_FORWARD] = position < self.locations - 1
+        available[:, MOVE_CAPITAL] = position > 0
+        return available
+
+    def run(self, policy):
+        """
+        Simulate battles with strategy.
+
+        :param policy: function which takes dict of actions and returns url
+            of action or `None`.
+        :returns: `Report` with count of battles, part of survived heroes
+            and mean damage, damage of towers, healing and turns alive.
+        """
+        table = compile_policy(policy)
+        random = numpy.random.RandomState(self.seed)
+        count = self.battles
+
+        position = numpy.ones(count, dtype=int)
+        hp = numpy.full(count, HP, dtype=float)
+        ep = numpy.full(count, EP, dtype=float)
+        cooldown = numpy.zeros(count, dtype=int)
+        last = numpy.zeros(count, dtype=bool)  # Last action had a target.
+        alive = numpy.ones(count, dtype=bool)
+
+        damage = numpy.zeros(count)
+        tower_damage = numpy.zeros(count)
+        healing = numpy.zeros(count)
+        lived = numpy.zeros(count, dtype=int)
+
+        for _ in range(self.turns):
+            enemies = random.poisson(self._enemies[position])
+            allies = random.poisson(self._allies[position])
+            available = self._get_available(
+                position, hp, ep, cooldown, last, enemies, allies
+            )
+            action = numpy.where(alive, table[available.dot(self._bits)], WAIT)
+
+            roll = random.randint(DAMAGE[0], DAMAGE[1] + 1, count)
+            heal = random.randint(HEAL[0], HEAL[1] + 1, count)
+            hits = random.binomial(enemies, HIT)
+            incoming = hits * random.randint(DAMAGE[0], DAMAGE[1] + 1, count)
+
+            strike = numpy.in1d(action, (ATTACK_RANDOM, ATTACK_LAST))
+            burning = numpy.in1d(action, (BURNING_RANDOM, BURNING_LAST))
+            skill = action == SKILL
+            heal_ally = numpy.in1d(action, (HEAL_RANDOM, HEAL_LAST))
+            heal_self = action == HEAL_SELF
+
+            damage += numpy.where(strike | burning, roll, 0)
+            damage += numpy.where(skill, 2 * roll, 0)
+            tower_damage += numpy.where(action == ATTACK_TOWER, roll, 0)
+            healing += numpy.where(heal_ally | heal_self, heal, 0)
+            hp = numpy.where(heal_self, numpy.minimum(hp + heal, HP), hp)
+
+            ep -= numpy.where(skill, SKILL_COST, 0)
+            ep -= numpy.where(burning, BURNING_COST, 0)
+            ep -= numpy.where(heal_ally | heal_self, HEAL_COST, 0)
+            cooldown = numpy.where(
+                skill, SKILL_COOLDOWN, numpy.maximum(cooldown - 1, 0)
+            )
+            last = strike | burning | skill | heal_ally
+
+            # Enemies hit before hero leaves location.
+            hp -= numpy.where(alive, incoming, 0)
+
+            position = position - (action == MOVE_BACKWARD)
+            position = position + (action == MOVE_FORWARD)
+            position[action == MOVE_CAPITAL] = 0
+
+            capital = position == 0
+            hp = numpy.where(capital, numpy.minimum(hp + REGEN[0], HP), hp)
+            ep = numpy.where(capital, numpy.minimum(ep + REGEN[1], EP), ep)
+
+            lived += alive
+            alive &= hp > 0
+
+        return Report(
+            battles=count, survival=float(alive.mean()),
+            damage=float(damage.mean()),
+            tower_damage=float(tower_damage.mean()),
+            healing=float(healing.mean()), turns=float(lived.mean())
+        )
+
+    def compare(self, policies):
+        """
+        Simulate same battles with every strategy.
+
+        :param policies: `dict` of name and strategy.
+        :returns: `dict` of name and `Report`.
+        """
+        return {name: self.run(policy) for name, policy in policies.items()}
+
+
+def format_reports(reports):
+    """
+    Format reports as table.
+
+    :param reports: `dict` of name of strategy and `Report`.
+    :returns: `unicode` text.
+    """
+    width = max([len(name) for name in reports] + [len(u'strategy')])
+    template = u'{:<' + str(width) + u'} {:>9} {:>9} {:>9} {:>9} {:>7}'
+    lines = [template.format(
+        u'strategy', u'survival', u'damage', u'towers', u'healing', u'turns'
+    )]
+    for name, report in sorted(reports.items()):
+        lines.append(template.format(
+            name, '{:.1%}'.format(report.survival),
+            '{:.0f}'.format(report.damage),
+            '{:.0f}'.format(report.tower_damage),
+            '{:.0f}'.format(report.healing), '{:.1f}'.format(report.turns)
+        ))
+    return u'\n'.join(lines)
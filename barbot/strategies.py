@@ -0,0 +1,134 @@
+# coding=utf-8
+
+import random
+
+from . import constants
+
+
+class Player(object):
+
+    """Class for play towers by strategy for class of hero."""
+
+    def __init__(self, bot):
+        """
+        Initialization class.
+
+        :param bot: `barbot.Bot` instance with chosen game.
+        """
+        self.bot = bot
+        self.turns = 0
+        self.is_started = False
+
+    def start(self):
+        """
+        Enter to game.
+
+        :returns: `lxml.html` instance.
+        """
+        page = self.bot.entry()
+        self.is_started = True
+        return page
+
+    @property
+    def is_over(self):
+        """
+        Check end of game for hero.
+
+        :returns: `bool`.
+        """
+        return self.bot.hero.is_tired
+
+    @property
+    def is_urgent(self):
+        """
+        Check need of retreat after damage by last action.
+
+        :returns: `bool`.
+        """
+        return self.bot.hero.history.get_damage(1) > 0
+
+    def turn(self):
+        """
+        Choice and do one action.
+
+        :returns: `True` if action done else `False` (game re-entered).
+        """
+        actions = self.bot.get_actions()
+        with self.bot.metrics.span('decision'):  # With lazy parse of actions.
+            action = self.choice_action(actions)
+
+        if action is None:
+            self.bot.entry()
+            return False
+
+        self.bot.move(action)
+        self.turns += 1
+        return True
+
+    def choice_action(self, actions):
+        """
+        Choice action by strategy for class of hero.
+
+        :param actions: `dict` of actions.
+        :returns: `str` action url or `None`.
+        """
+        if self.is_urgent:
+            if actions['move'].get('retreat'):  # Known route to capital.
+                return actions['move']['retreat']
+            elif actions['move']['forward']:
+                return random.choice(actions['move']['forward'])
+            elif actions['move']['backward']:
+                return random.choice(actions['move']['backward'])
+            return None
+        elif self.bot.hero._class == constants.WARRIOR:
+            return choice_warrior_action(actions)
+        return choice_medic_action(actions)
+
+
+def choice_warrior_action(actions):
+    """Choice the optimal action for warrior."""
+    if actions['skills'] and any(actions['attack'].values()):
+        action = actions['skills'][0]
+    elif actions['attack']:
+        if actions['attack']['tower']:
+            action = actions['attack']['tower']
+        elif actions['attack']['last']:
+            action = actions['attack']['last']
+        else:
+            action = actions['attack']['random']
+    elif actions['move']:
+        if actions['move']['forward']:
+            action = random.choice(actions['move']['forward'])
+        else:
+            action = random.choice(actions['move']['backward'])
+    else:
+        action = None
+
+    return action
+
+
+def choice_medic_action(actions):
+    """Choice the optimal action for medic."""
+    if actions['heal']:
+        if actions['heal']['self']:
+            action = actions['heal']['self']
+        elif actions['heal']['last']:
+            action = actions['heal']['last']
+        else:
+            action = actions['heal']['random']
+    elif actions['skills'] and any(actions['burning'].values()):
+        action = actions['skills'][0]
+    elif actions['burning']:
+        if actions['burning']['last']:
+            action = actions['burning']['last']
+        else:
+            action = actions['burning']['random']
+    elif actions['move']:
+        if actions['move']['forward']:
+            action = random.choice(actions['move']['forward'])
+        else:
+            action = random.choice(actions['move']['backward'])
+    else:
+        action = None
+
+    return action
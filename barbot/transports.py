@@ -0,0 +1,409 @@
+# coding=utf-8
+"""
+Transports of requests to barbars.ru.
+
+Modes of transport:
+
+- `live`: requests go to barbars.ru;
+- `record`: requests go to barbars.ru and pairs of request and response
+  are written to compressed archive;
+- `replay`: responses are taken from archive, no network;
+- `fake`: responses are created by `server.Application`, no network.
+
+Requests to barbars.ru go through `TunedAdapter` with pool of keep-alive
+connections, timeouts and retries of idempotent requests. By default all
+sessions of process share one adapter and so one pool of connections.
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import gzip
+import zlib
+import base64
+import struct
+import urllib
+import urlparse
+import httplib
+import StringIO
+import threading
+import collections
+
+import requests
+from requests import adapters
+from requests.packages.urllib3 import response as urllib3_response
+from requests.packages.urllib3.util import retry
+
+from . import constants, server
+
+SKIP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+_adapters = {}
+_archives = {}
+_application = None
+_lock = threading.Lock()
+
+
+class _OriginalResponse(object):
+
+    """Headers of response for extract cookies by `requests`."""
+
+    def __init__(self, headers):
+        """
+        Initialization class.
+
+        :param headers: `list` of (name, value) headers.
+        """
+        lines = ''.join(
+            '{}: {}\r\n'.format(name, value) for name, value in headers
+        )
+        self.msg = httplib.HTTPMessage(StringIO.StringIO(lines + '\r\n'))
+
+    def isclosed(self):
+        """Body is always read."""
+        return True
+
+
+def build_response(adapter, request, status, reason, headers, content):
+    """
+    Create `requests.Response` from saved or generated response.
+
+    :param adapter: `requests.adapters.HTTPAdapter` instance.
+    :param request: `requests.PreparedRequest` instance.
+    :param status: `int` status code.
+    :param reason: `str` reason of status.
+    :param headers: `list` of (name, value) headers.
+    :param content: `str` body.
+    :returns: `requests.Response` instance.
+    """
+    headers = [
+        (name, value) for name, value in headers
+        if name.lower() not in SKIP_HEADERS
+    ]
+    headers.append(('Content-Length', str(len(content))))
+
+    raw = urllib3_response.HTTPResponse(
+        body=io.BytesIO(content), headers=headers, status=status,
+        reason=reason, preload_content=False, decode_content=False,
+        original_response=_OriginalResponse(headers)
+    )
+    return adapter.build_response(request, raw)
+
+
+def _get_body(request):
+    """Get body of request as `str`."""
+    body = request.body or b''
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return body
+
+
+def _normalize_url(url):
+    """Replace volatile counters of Wicket in url."""
+    return re.sub(r'interface=:\d+:', 'interface=:0:', url)
+
+
+class Archive(object):
+
+    """Class for write pairs of request and response to compressed file."""
+
+    def __init__(self, filename):
+        """
+        Initialization class.
+
+        :param filename: path to archive.
+        """
+        self._lock = threading.Lock()
+        self._file = gzip.open(filename, 'ab')
+
+    def write(self, request, response):
+        """
+        Write pair of request and response.
+
+        Body of request is not written: it has password of login and
+        replay finds responses by method and url only.
+
+        :param request: `requests.PreparedRequest` instance.
+        :param response: `requests.Response` instance.
+        """
+        raw = response.raw.headers
+        entry = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': [
+                (name, value) for name in raw.keys()
+                for value in raw.getlist(name)
+            ],
+            'content': base64.b64encode(response.content),
+        }
+
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        """Close file of archive."""
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def read(filename):
+        """
+        Read saved pairs of request and response.
+
+        Archive of interrupted recording is read up to the last whole
+        response.
+
+        :param filename: path to archive.
+        :returns: `list` of `dict`.
+        """
+        entries = []
+        with gzip.open(filename, 'rb') as f:
+            try:
+                for line in f:
+                    if line.endswith('\n'):
+                        entries.append(json.loads(line))
+            except (IOError, EOFError, zlib.error, struct.error):
+                pass
+        return entries
+
+
+class TunedAdapter(adapters.HTTPAdapter):
+
+    """Adapter with pool size, default timeouts and retries."""
+
+    def __init__(self, pool_size=10, timeout=None, retries=0, backoff=0,
+                 **kwargs):
+        """
+        Initialization class.
+
+        :param pool_size (optional): `int` count of keep-alive connections.
+        :param timeout (optional): (connect, read) seconds, `None` to wait
+            forever.
+        :param retries (optional): `int` count of retries of idempotent
+            requests after errors of connection or read.
+        :param backoff (optional): `float` backoff factor between retries.
+        """
+        kwargs.setdefault('pool_maxsize', pool_size)
+        kwargs.setdefault('max_retries', retry.Retry(
+            total=retries, redirect=False, backoff_factor=backoff,
+            method_whitelist=IDEMPOTENT_METHODS
+        ))
+        super(TunedAdapter, self).__init__(**kwargs)
+        self._timeout = timeout
+
+    def send(self, request, **kwargs):
+        """Send request with default timeout."""
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self._timeout
+        return super(TunedAdapter, self).send(request, **kwargs)
+
+
+class RecordAdapter(TunedAdapter):
+
+    """Adapter which writes all requests and responses to archive."""
+
+    def __init__(self, archive, *args, **kwargs):
+        """
+        Initialization class.
+
+        :param archive: `Archive` instance.
+        """
+        super(RecordAdapter, self).__init__(*args, **kwargs)
+        self._archive = archive
+
+    def send(self, request, **kwargs):
+        """Send request and write it with response to archive."""
+        response = super(RecordAdapter, self).send(request, **kwargs)
+        self._archive.write(request, response)
+        return response
+
+
+class ReplayAdapter(adapters.HTTPAdapter):
+
+    """Adapter which answers by responses from archive."""
+
+    def __init__(self, filename, *args, **kwargs):
+        """
+        Initialization class.
+
+        :param filename: path to archive.
+        """
+        super(ReplayAdapter, self).__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._responses = collections.defaultdict(collections.deque)
+
+        for entry in Archive.read(filename):
+            key = entry['method'], _normalize_url(entry['url'])
+            self._responses[key].append(entry)
+
+    def send(self, request, **kwargs):
+        """
+        Get response for request from archive.
+
+        Responses for same url are returned in order of record, last of
+        them is repeated. Counters of Wicket in url are ignored.
+        """
+        entry = None
+        with self._lock:
+            responses = self._responses[
+                request.method, _normalize_url(request.url)
+            ]
+            if responses:
+                entry = responses[0]
+                if len(responses) > 1:
+                    responses.popleft()
+
+        if entry is None:
+            raise requests.ConnectionError(
+                'No recorded response for {} {}.'.format(
+                    request.method, request.url
+                ),
+                request=request
+            )
+
+        return build_response(
+            self, request, entry['status'], entry['reason'],
+            entry['headers'], base64.b64decode(entry['content'])
+        )
+
+
+class WSGIAdapter(adapters.HTTPAdapter):
+
+    """Adapter which answers by WSGI application in current process."""
+
+    def __init__(self, application, *args, **kwargs):
+        """
+        Initialization class.
+
+        :param application: WSGI application.
+        """
+        super(WSGIAdapter, self).__init__(*args, **kwargs)
+        self._application = application
+
+    def send(self, request, **kwargs):
+        """Get response for request from application."""
+        parts = urlparse.urlsplit(request.url)
+        body = _get_body(request)
+
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': urllib.unquote(parts.path) or '/',
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': parts.hostname,
+            'SERVER_PORT': str(parts.port or 80),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+            'HTTP_HOST': parts.netloc,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': parts.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result['status'] = status
+            result['headers'] = headers
+
+        content = b''.join(self._application(environ, start_response))
+        status, reason = result['status'].split(' ', 1)
+
+        return build_response(
+            self, request, int(status), reason, result['headers'], content
+        )
+
+
+def _get_options(settings):
+    """Get options of `TunedAdapter` from settings."""
+    return {
+        'pool_size': settings.pool_size,
+        'timeout': (
+            settings.connect_timeout or None, settings.read_timeout or None
+        ),
+        'retries': settings.retries,
+        'backoff': settings.retry_backoff,
+    }
+
+
+def get_adapter(settings):
+    """
+    Get adapter for requests to barbars.ru.
+
+    :param settings: section `transport` of settings.
+    :returns: `TunedAdapter` instance, shared by all sessions of process
+        with same options if `shared_pool` is set.
+    """
+    options = _get_options(settings)
+    if not settings.shared_pool:
+        return TunedAdapter(**options)
+
+    key = tuple(sorted(options.items()))
+    with _lock:
+        if key not in _adapters:
+            _adapters[key] = TunedAdapter(**options)
+        return _adapters[key]
+
+
+def get_archive(filename):
+    """
+    Get archive for record shared by all sessions of process.
+
+    :param filename: path to archive, `{pid}` is replaced by id of process.
+    :returns: `Archive` instance.
+    """
+    filename = filename.format(pid=os.getpid())
+    with _lock:
+        if filename not in _archives:
+            _archives[filename] = Archive(filename)
+        return _archives[filename]
+
+
+def get_application():
+    """
+    Get fake barbars.ru shared by all sessions of process.
+
+    :returns: `server.Application` instance.
+    """
+    global _application
+    with _lock:
+        if _application is None:
+            _application = server.Application()
+        return _application
+
+
+def configure(session, settings):
+    """
+    Mount adapter of transport mode to session.
+
+    :param session: `requests.Session` instance.
+    :param settings: section `transport` of settings.
+    """
+    if settings.mode == 'record':
+        adapter = RecordAdapter(
+            get_archive(settings.archive), **_get_options(settings)
+        )
+    elif settings.mode == 'replay':
+        adapter = ReplayAdapter(settings.archive)
+    elif settings.mode == 'fake':
+        adapter = WSGIAdapter(get_application())
+    else:
+        adapter = get_adapter(settings)
+
+    if not settings.compression:
+        session.headers['Accept-Encoding'] = 'identity'
+
+    session.mount(constants.HOST, adapter)
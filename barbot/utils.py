@@ -1,11 +1,43 @@
 # coding=utf-8
 
 import re
-
-import configobj
-import urltools
+import time
+import threading
+import importlib
+import collections
 
 from . import constants
+from .selectors import SPACES
+
+
+class LazyModule(object):
+
+    """
+    Module which is imported on first access to its attribute.
+
+    Heavy dependencies are loaded only by code which uses them, so short
+    processes (command line, supervisor of fleet) start faster. Attributes
+    are copied from module once, so it is only for modules which do not
+    change their attributes.
+    """
+
+    def __init__(self, name):
+        """
+        Initialization class.
+
+        :param name: full name of module.
+        """
+        self.__name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+configobj = LazyModule('configobj')
+html = LazyModule('lxml.html')
+urltools = LazyModule('urltools')
+validate = LazyModule('validate')
 
 
 def get_configspec():
@@ -19,6 +51,78 @@ def get_configspec():
             'username': 'string',
             'password': 'string',
         },
+        'accounts': {
+            '__many__': {
+                'username': 'string',
+                'password': 'string',
+            },
+        },
+        'hero': {
+            'status_ttl': 'float(min=0, default=60)',
+            'history_size': 'integer(min=2, default=1024)',
+        },
+        'cache': {
+            'enabled': 'boolean(default=False)',
+            'directory': "string(default='.barbot_cache')",
+            'ttl': 'float(min=0, default=3600)',
+        },
+        'parser': {
+            'streaming': 'boolean(default=False)',
+            'chunk_size': 'integer(min=256, default=4096)',
+            'page_cache': 'integer(min=0, default=16)',
+        },
+        'transport': {
+            'mode': (
+                "option('live', 'record', 'replay', 'fake', default='live')"
+            ),
+            'archive': "string(default='barbot.rec.gz')",
+            'pool_size': 'integer(min=1, default=10)',
+            'shared_pool': 'boolean(default=True)',
+            'connect_timeout': 'float(min=0, default=10)',
+            'read_timeout': 'float(min=0, default=30)',
+            'retries': 'integer(min=0, default=3)',
+            'retry_backoff': 'float(min=0, default=0.5)',
+            'compression': 'boolean(default=True)',
+        },
+        'pacing': {
+            'rate': 'float(min=0, default=650)',
+            'jitter': 'float(min=0, max=1, default=0.25)',
+            'min_interval': 'float(min=0, default=1)',
+        },
+        'prefetch': {
+            'enabled': 'boolean(default=False)',
+            'actions': 'boolean(default=True)',
+        },
+        'maintenance': {
+            'enabled': 'boolean(default=False)',
+            'repair_interval': 'float(min=0, default=1800)',
+            'repair_actions': 'integer(min=0, default=100)',
+            'status_interval': 'float(min=0, default=0)',
+            'spread': 'boolean(default=True)',
+        },
+        'metrics': {
+            'enabled': 'boolean(default=False)',
+            'filename': "string(default='barbot-{worker}.prom')",
+            'format': "option('prometheus', 'json', default='prometheus')",
+            'interval': 'float(min=1, default=60)',
+        },
+        'journal': {
+            'enabled': 'boolean(default=False)',
+            'filename': "string(default='barbot-{worker}.jsonl')",
+            'max_bytes': 'integer(min=0, default=10485760)',
+            'backups': 'integer(min=0, default=5)',
+            'queue_size': 'integer(min=1, default=10000)',
+        },
+        'graph': {
+            'filename': "string(default='')",
+        },
+        'fleet': {
+            'workers': 'integer(min=0, default=0)',
+            'concurrency': 'integer(min=1, default=10)',
+            'backoff': 'float(min=0, default=5)',
+            'max_backoff': 'float(min=0, default=300)',
+            'report_interval': 'float(min=0, default=60)',
+        },
     }
 
 
@@ -28,11 +132,29 @@ def create_config(filename='barbot.conf'):
 
     :param filename: path to write configuration.
     """
-    config = configobj.ConfigObj(infile=filename)
-    config.update(get_configspec())
+    configspec = get_configspec()
+    config = configobj.ConfigObj(infile=filename, configspec=configspec)
+    config.validate(validate.Validator(), copy=True)
+
+    for section, options in configspec.items():
+        for option, check in options.items():
+            if option != '__many__':
+                config[section].setdefault(option, check)
+
     config.write()
 
 
+def get_link_name(url):
+    """
+    Get name of Wicket link from url.
+
+    :param url: `str` url or `None`.
+    :returns: `str` name (like `damageRandom` or `location`) or `None`.
+    """
+    match = re.search(r'(\w+)Link::', url or '')
+    return match.group(1) if match else None
+
+
 def remove_spaces(string, spaces=1):
     """
     Delete extra spaces from srting.
@@ -41,7 +163,86 @@ def remove_spaces(string, spaces=1):
     :param spaces (optional): `int` count of extra spaces to save.
     :returns: `str` cleaned string.
     """
-    return re.sub('\s+', ' ' * spaces, string).rstrip().lstrip()
+    return SPACES.sub(' ' * spaces, string).strip()
+
+
+class URLResolver(object):
+
+    """
+    Class for create absolute urls from links with cache.
+
+    Links of simple path with one query parameter (like links of Wicket)
+    are already normal and joined to host without normalization. Other
+    links are normalized by `urltools.normalize` and kept in cache with
+    limited size, least recently used links are removed first.
+    """
+
+    simple = re.compile(r'^(?:[\w\-]+/)*[\w\-]*(?:\?[\w\-:.]+=[\w\-:.]+)?$')
+
+    def __init__(self, size=1024):
+        """
+        Initialization class.
+
+        :param size (optional): `int` max count of links in cache.
+        """
+        self._size = size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.fast = 0  # Links joined without normalization.
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, link):
+        """
+        Create absolute url from link.
+
+        :param link: `str` relative url.
+        :returns: `str` absolute url.
+        """
+        if self.simple.match(link) is not None:
+            self.fast += 1
+            return constants.HOST + link
+
+        key = constants.HOST, link
+        with self._lock:
+            url = self._cache.pop(key, None)
+            if url is not None:
+                self.hits += 1
+                self._cache[key] = url
+                return url
+            self.misses += 1
+
+        url = urltools.normalize(''.join(key))
+
+        with self._lock:
+            self._cache[key] = url
+            if len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+
+        return url
+
+    @property
+    def statistics(self):
+        """
+        Get statistics of cache.
+
+        :returns: `dict` with counts of fast links, hits, misses and size.
+        """
+        return {
+            'fast': self.fast,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+        }
+
+    def clear(self):
+        """Clear cache and statistics."""
+        with self._lock:
+            self._cache.clear()
+            self.fast = self.hits = self.misses = 0
+
+resolver = URLResolver()
 
 
 def build_url(link):
@@ -51,7 +252,83 @@ def build_url(link):
     :param link: `str` relative url.
     :returns: `str` absolute url.
     """
-    return urltools.normalize(''.join((constants.HOST, link)))
+    return resolver(link)
+
+
+def parse_stream(chunks, stop=None, metrics=None):
+    """
+    Parse page from chunks of content and stop after needed part.
+
+    Elements which are not closed when parsing stops are closed as at the
+    end of document.
+
+    :param chunks: iterator of `str` chunks of content.
+    :param stop (optional): compiled regular expression, parsing stops
+        after chunk where it is found.
+    :param metrics (optional): `metrics.Metrics` instance, time of parse
+        without receipt of chunks is observed as phase `parse`.
+    :returns: `lxml.html` instance.
+    """
+    parser = html.HTMLParser()
+    tail = b''
+    elapsed = 0.0
+
+    for chunk in chunks:
+        started = time.time()
+        parser.feed(chunk)
+        if stop is not None:
+            window = tail + chunk
+            if stop.search(window) is not None:
+                elapsed += time.time() - started
+                break
+            tail = window[-512:]
+        elapsed += time.time() - started
+
+    started = time.time()
+    page = parser.close()
+    if metrics is not None:
+        metrics.observe('parse', elapsed + time.time() - started)
+    return page
+
+
+def get_page(session, url, streaming=False, chunk_size=4096, stop=None,
+             pages=None, metrics=None):
+    """
+    Get page and parse it.
+
+    :param session: `requests.Session` instance.
+    :param url: `str` url of page.
+    :param streaming (optional): parse chunks of response while they are
+        received and stop after needed part (see `parse_stream`). Rest of
+        response is read anyway to reuse connection, so streaming saves
+        time of parse only, not time of network.
+    :param chunk_size (optional): `int` size of chunk for streaming.
+    :param stop (optional): compiled regular expression for streaming.
+    :param pages (optional): `cache.PageCache` instance, it is not used for
+        streaming.
+    :param metrics (optional): `metrics.Metrics` instance, time of parse
+        is observed as phase `parse`.
+    :returns: `lxml.html` instance.
+    """
+    if not streaming:
+        content = session.get(url).content
+        started = time.time()
+        if pages is not None:
+            page = pages.get(content)
+        else:
+            page = html.fromstring(content)
+        if metrics is not None:
+            metrics.observe('parse', time.time() - started)
+        return page
+
+    response = session.get(url, stream=True)
+    chunks = response.iter_content(chunk_size)
+    page = parse_stream(chunks, stop, metrics)
+
+    for _ in chunks:  # Read rest of response to keep connection alive.
+        pass
+
+    return page
 
 
 def update(current, new):
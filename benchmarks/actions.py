@@ -0,0 +1,105 @@
+# coding=utf-8
+"""
+Benchmark of per-turn parse-to-actions time on saved Towers pages.
+
+Compare lookup of links by one XPath scan per action (`legacy`) with
+lookup by page index built once per response (`index`).
+
+Usage: python benchmarks/actions.py [repeat]
+"""
+
+import io
+import os
+import sys
+import glob
+import timeit
+
+from lxml import html
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import utils  # noqa
+from barbot.games import towers  # noqa
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'fixtures')
+
+TOKENS = (
+    'damageRandom', 'damageLast', 'damageTower', 'healRandom', 'healLast',
+    'healSelf', 'energyDamageRandom', 'energyDamageLast',
+)
+
+
+def legacy(content, capital):
+    """Resolve actions by one XPath scan per action."""
+    page = html.fromstring(content)
+    actions = {}
+
+    for token in TOKENS:
+        xpath = '//a[contains(@href, "{}")]/@href'.format(token)
+        hrefs = page.xpath(xpath)
+        actions[token] = utils.build_url(hrefs[0]) if hrefs else None
+
+    actions['skills'] = map(utils.build_url, page.xpath(
+        '//a[contains(@href, "ability") '
+        'and not(contains(@class, "buff"))]/@href'
+    ))
+
+    for name, position in (('backward', 0), ('forward', -1)):
+        urls = page.xpath('//a[contains(@href, "location")]')
+        source = urls[position].xpath('img/@src')[0]
+        direction = '-n' if '-n' in source else '-s'
+        urls = filter(lambda x: direction in x.xpath('img/@src')[0], urls)
+        actions[name] = map(
+            lambda x: utils.build_url(x.xpath('@href')[0]), urls
+        )
+
+    urls = page.xpath('//a[contains(@href, "location")]')
+    actions['capital'] = filter(
+        lambda x: utils.remove_spaces(x.xpath('span/text()')[0]) == capital,
+        urls
+    )
+
+    return actions
+
+
+def index(content, capital):
+    """Resolve actions by page index."""
+    game = towers.Towers(None)
+    game._capital = capital
+    game._set_page(html.fromstring(content))
+
+    actions = {}
+    for token in TOKENS:
+        actions[token] = game.get_action_url(token)
+    actions['skills'] = game.get_skills_url()
+    actions['backward'] = game.get_move_backward_urls()
+    actions['forward'] = game.get_move_forward_urls()
+    actions['capital'] = game.get_move_capital_url()
+
+    return actions
+
+
+def main(repeat=2000):
+    """Run benchmark and print results."""
+    capital = u'Южная столица'
+    template = u'{:<24} {:>12} {:>12} {:>8}'
+
+    print(template.format(u'page', u'legacy, us', u'index, us', u'speedup'))
+
+    for filename in sorted(glob.glob(os.path.join(FIXTURES, 'towers_*.html'))):
+        with io.open(filename, 'rb') as f:
+            content = f.read()
+
+        results = []
+        for function in (legacy, index):
+            timer = timeit.Timer(lambda: function(content, capital))
+            results.append(min(timer.repeat(3, repeat)) / repeat * 1e6)
+
+        print(template.format(
+            os.path.basename(filename), '{:.1f}'.format(results[0]),
+            '{:.1f}'.format(results[1]),
+            '{:.2f}x'.format(results[0] / results[1])
+        ))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""
+Benchmark of per-request latency for configurations of transport.
+
+Accounts request hero page in turn from fake barbars.ru served on
+localhost by `server.Server` with keep-alive connections and gzip.
+
+Configurations:
+
+- `close`: new connection for every request;
+- `session`: pool of connections of every session;
+- `shared`: one `transports.TunedAdapter` for all sessions;
+- `shared, identity`: same as `shared` without compression.
+
+Usage: python benchmarks/latency.py [accounts] [requests]
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import server, transports  # noqa
+
+
+def create_sessions(host, accounts, adapter=None, headers=None):
+    """Create authenticated sessions on local server."""
+    sessions = []
+    for number in range(accounts):
+        session = requests.Session()
+        if adapter is not None:
+            session.mount(host, adapter)
+        session.headers.update(headers or {})
+        session.post(host + 'login', data={
+            'login': 'Hero{}'.format(number), 'password': 'secret',
+        })
+        sessions.append(session)
+    return sessions
+
+
+def measure(host, sessions, count):
+    """
+    Request hero page by all sessions in turn.
+
+    :returns: `list` of seconds of requests.
+    """
+    latencies = []
+    for _ in range(count):
+        for session in sessions:
+            started = time.time()
+            session.get(host + 'user').content
+            latencies.append(time.time() - started)
+    return latencies
+
+
+def main(accounts=10, count=50):
+    """Run benchmark and print results."""
+    local = server.Server(server.Application(seed=0, compress=True))
+    host = local.host
+
+    configurations = (
+        ('close', None, {'Connection': 'close'}),
+        ('session', None, None),
+        ('shared', transports.TunedAdapter(timeout=(10, 30)), None),
+        ('shared, identity', transports.TunedAdapter(timeout=(10, 30)),
+         {'Accept-Encoding': 'identity'}),
+    )
+
+    template = u'{:<18} {:>10} {:>10} {:>10}'
+    print(template.format(u'configuration', u'mean, ms', u'p50, ms',
+                          u'p95, ms'))
+
+    try:
+        for name, adapter, headers in configurations:
+            sessions = create_sessions(host, accounts, adapter, headers)
+            latencies = sorted(measure(host, sessions, count))
+            print(template.format(
+                name,
+                '{:.2f}'.format(sum(latencies) / len(latencies) * 1e3),
+                '{:.2f}'.format(latencies[len(latencies) // 2] * 1e3),
+                '{:.2f}'.format(latencies[int(len(latencies) * 0.95)] * 1e3)
+            ))
+    finally:
+        local.close()
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
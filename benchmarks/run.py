@@ -0,0 +1,179 @@
+# coding=utf-8
+"""
+Benchmark suite of parse, actions and decision of one turn.
+
+Every step of turn is timed on each saved Towers page from `fixtures`.
+Results are written to JSON file and compared with stored baseline,
+exit code is 1 if any step is slower than baseline more than tolerance.
+
+Usage: python benchmarks/run.py [--output FILE] [--baseline FILE]
+                                [--save-baseline] [--tolerance 0.25]
+                                [--duration 0.02]
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import timeit
+import platform
+import argparse
+
+from lxml import html
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import barbot, strategies, utils  # noqa
+from barbot.games import towers  # noqa
+
+ROOT = os.path.dirname(__file__)
+FIXTURES = os.path.join(ROOT, '..', 'fixtures')
+BASELINE = os.path.join(ROOT, 'baseline.json')
+
+
+def get_steps(content):
+    """
+    Create steps of turn for saved page.
+
+    :param content: `str` content of page.
+    :returns: `list` of (name, function).
+    """
+    page = html.fromstring(content)
+
+    game = towers.Towers(None)
+    game._capital = u'Южная столица'
+    game._set_page(page)
+    actions = game.get_actions()
+
+    session = requests.Session()
+    session.cookies['id'] = '1'
+    hero = barbot.Hero(session)
+
+    def get_actions():
+        """Resolve all actions of new page."""
+        game._page_actions = None
+        return game.get_actions().copy()
+
+    return [
+        ('parse', lambda: html.fromstring(content)),
+        ('parse_stream', lambda: utils.parse_stream(
+            (content[i:i + 4096] for i in range(0, len(content), 4096)),
+            towers.Towers.stream_stop
+        )),
+        ('move', lambda: game._set_page(page)),
+        ('get_actions', get_actions),
+        ('get_action_log', game.get_action_log),
+        ('update_status', lambda: hero._update_status(page)),
+        ('choice_warrior_action',
+         lambda: strategies.choice_warrior_action(actions)),
+        ('choice_medic_action',
+         lambda: strategies.choice_medic_action(actions)),
+    ]
+
+
+def measure(function, duration):
+    """
+    Get best time of one call of function.
+
+    :param function: function without arguments.
+    :param duration: `float` min seconds of one measure.
+    :returns: `float` microseconds.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < duration:
+        number *= 2
+    return min(timer.repeat(7, number)) / number * 1e6
+
+
+def run(duration):
+    """
+    Time all steps on all saved Towers pages.
+
+    :param duration: `float` min seconds of one measure.
+    :returns: `dict` of microseconds by step by page.
+    """
+    results = {}
+    for filename in sorted(glob.glob(os.path.join(FIXTURES, 'towers_*.html'))):
+        with io.open(filename, 'rb') as f:
+            content = f.read()
+
+        page = results[os.path.basename(filename)] = {}
+        for name, function in get_steps(content):
+            page[name] = measure(function, duration)
+
+    return results
+
+
+def compare(results, baseline, tolerance, floor=1.0):
+    """
+    Compare results with baseline and print table.
+
+    :param results: `dict` of microseconds by step by page.
+    :param baseline: `dict` of microseconds by step by page.
+    :param tolerance: `float` allowed relative slowdown.
+    :param floor (optional): `float` allowed slowdown in microseconds.
+    :returns: `list` of (page, step) slower than baseline.
+    """
+    template = u'{:<22} {:<22} {:>10} {:>10} {:>8}'
+    print(template.format(u'page', u'step', u'us', u'baseline', u'ratio'))
+
+    regressions = []
+    for page, steps in sorted(results.items()):
+        for step, value in sorted(steps.items()):
+            base = baseline.get(page, {}).get(step)
+            if base is None:
+                ratio = u'-'
+            else:
+                ratio = u'{:.2f}'.format(value / base)
+                if value - base > max(base * tolerance, floor):
+                    regressions.append((page, step))
+                    ratio += u' !'
+            print(template.format(
+                page, step, u'{:.1f}'.format(value),
+                u'-' if base is None else u'{:.1f}'.format(base), ratio
+            ))
+
+    return regressions
+
+
+def main(arguments=None):
+    """Run suite, save results and compare them with baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--duration', type=float, default=0.02)
+    arguments = parser.parse_args(arguments)
+
+    results = {
+        'python': platform.python_version(),
+        'results': run(arguments.duration),
+    }
+
+    with open(arguments.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    if arguments.save_baseline:
+        with open(arguments.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+
+    baseline = {}
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)['results']
+
+    regressions = compare(
+        results['results'], baseline, arguments.tolerance
+    )
+    for page, step in regressions:
+        print(u'Regression: {} on {}.'.format(step, page))
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
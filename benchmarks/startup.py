@@ -0,0 +1,78 @@
+# coding=utf-8
+"""
+Benchmark of startup of bots with cold and warm cache of sessions.
+
+Bots log in to fake barbars.ru served on localhost by `server.Server`.
+Cold start logs in every account, warm start restores sessions saved
+by cold start.
+
+Usage: python benchmarks/startup.py [bots]
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import logger, barbot, constants, server  # noqa
+
+CONFIGURATION = '''[accounts]
+{accounts}
+[cache]
+enabled = True
+directory = {directory}
+'''
+
+
+def start(filename, bots):
+    """
+    Create bots for all accounts.
+
+    :returns: `float` seconds.
+    """
+    started = time.time()
+    for number in range(bots):
+        barbot.Bot(filename, 'hero{}'.format(number))
+    return time.time() - started
+
+
+def main(bots=100):
+    """Run benchmark and print results."""
+    logger.setLevel(logging.WARNING)
+
+    local = server.Server(server.Application(seed=0))
+    host = constants.HOST
+    constants.HOST = local.host
+
+    directory = tempfile.mkdtemp()
+    descriptor, filename = tempfile.mkstemp(suffix='.conf')
+    with os.fdopen(descriptor, 'w') as f:
+        f.write(CONFIGURATION.format(directory=directory, accounts='\n'.join(
+            '[[hero{0}]]\nusername = Hero{0}\npassword = secret'.format(i)
+            for i in range(bots)
+        )))
+
+    template = u'{:<6} {:>16} {:>20}'
+    print(template.format(u'cache', u'ms per bot', u'requests per bot'))
+
+    try:
+        for name in (u'cold', u'warm'):
+            count = len(local.application.requests)
+            elapsed = start(filename, bots)
+            count = len(local.application.requests) - count
+            print(template.format(
+                name, '{:.2f}'.format(elapsed / bots * 1e3),
+                '{:.1f}'.format(float(count) / bots)
+            ))
+    finally:
+        constants.HOST = host
+        local.close()
+        os.remove(filename)
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
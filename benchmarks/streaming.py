@@ -0,0 +1,71 @@
+# coding=utf-8
+"""
+Benchmark of end-to-end time of request and parse of pages with and
+without streaming parse.
+
+Pages are requested from fake barbars.ru served on localhost by
+`server.Server`. Streaming stops parsing at the footer, but the rest of
+response is read anyway to reuse connection, so streaming saves only
+time of parse, not time of network.
+
+Usage: python benchmarks/streaming.py [requests]
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import barbot, server, utils  # noqa
+from barbot.games import towers  # noqa
+
+
+def measure(session, url, streaming, stop, count):
+    """
+    Request and parse page.
+
+    :returns: `list` of seconds of requests with parse.
+    """
+    latencies = []
+    for _ in range(count):
+        started = time.time()
+        utils.get_page(session, url, streaming, 4096, stop)
+        latencies.append(time.time() - started)
+    return latencies
+
+
+def main(count=500):
+    """Run benchmark and print results."""
+    local = server.Server(server.Application(seed=0))
+    host = local.host
+
+    session = requests.Session()
+    session.post(host + 'login', data={'login': 'Hero', 'password': 'secret'})
+
+    pages = (
+        ('user', barbot.Hero.stream_stop),
+        ('game/towers', towers.Towers.stream_stop),
+    )
+
+    template = u'{:<12} {:<10} {:>10} {:>10}'
+    print(template.format(u'page', u'parse', u'mean, ms', u'p50, ms'))
+
+    try:
+        for path, stop in pages:
+            for streaming in (False, True):
+                latencies = sorted(
+                    measure(session, host + path, streaming, stop, count)
+                )
+                print(template.format(
+                    path, u'streaming' if streaming else u'full',
+                    '{:.3f}'.format(sum(latencies) / len(latencies) * 1e3),
+                    '{:.3f}'.format(latencies[len(latencies) // 2] * 1e3)
+                ))
+    finally:
+        local.close()
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,66 @@
+# coding=utf-8
+"""
+Benchmark of turns per second of many bots on fake barbars.ru.
+
+Bots play towers by `engine.Engine` without pause between turns, all
+responses are created by `server.Application` in current process.
+
+Usage: python benchmarks/throughput.py [bots] [turns] [concurrency]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import logger, barbot, engine, strategies  # noqa
+
+CONFIGURATION = '''[account]
+username = Hero{}
+password = secret
+[transport]
+mode = fake
+'''
+
+
+def create_bot(number):
+    """Create bot in towers on fake barbars.ru."""
+    descriptor, filename = tempfile.mkstemp(suffix='.conf')
+    with os.fdopen(descriptor, 'w') as f:
+        f.write(CONFIGURATION.format(number))
+
+    try:
+        bot = barbot.Bot(filename)
+    finally:
+        os.remove(filename)
+
+    bot.change_game('towers')
+    return bot
+
+
+def main(bots=20, turns=20, concurrency=4):
+    """Run benchmark and print results."""
+    logger.setLevel(logging.WARNING)
+
+    started = time.time()
+    players = [strategies.Player(create_bot(number)) for number in range(bots)]
+    startup = time.time() - started
+
+    runner = engine.Engine(concurrency=concurrency, delay=(0, 0))
+    for player in players:
+        runner.add(player)
+
+    started = time.time()
+    runner.run(turns)
+    elapsed = time.time() - started
+
+    total = sum(player.turns for player in players)
+    print('bots: {}, concurrency: {}'.format(bots, concurrency))
+    print('startup: {:.1f} ms per bot'.format(startup / bots * 1e3))
+    print('turns: {}, {:.1f} turns/s'.format(total, total / elapsed))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
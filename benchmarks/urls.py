@@ -0,0 +1,54 @@
+# coding=utf-8
+"""
+Benchmark of creating absolute urls from links of saved pages.
+
+Compare `urltools.normalize` of every link with `utils.URLResolver`.
+
+Usage: python benchmarks/urls.py [repeat]
+"""
+
+import io
+import os
+import sys
+import glob
+import timeit
+
+from lxml import html
+import urltools
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from barbot import constants, utils  # noqa
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'fixtures')
+
+
+def main(repeat=200):
+    """Run benchmark and print results."""
+    links = []
+    for filename in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with io.open(filename, 'rb') as f:
+            links.extend(html.fromstring(f.read()).xpath('//a/@href'))
+
+    resolver = utils.URLResolver()
+
+    def normalize():
+        for link in links:
+            urltools.normalize(''.join((constants.HOST, link)))
+
+    def resolve():
+        for link in links:
+            resolver(link)
+
+    template = u'{:<12} {:>12}'
+    print(u'links: {}'.format(len(links)))
+    print(template.format(u'function', u'us per link'))
+    for name, function in (('normalize', normalize), ('resolver', resolve)):
+        best = min(timeit.Timer(function).repeat(5, repeat))
+        print(template.format(
+            name, u'{:.2f}'.format(best / repeat / len(links) * 1e6)
+        ))
+    print(resolver.statistics)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,111 +1,161 @@
 # coding=utf-8
 
-import time
-import random
+import argparse
 import traceback
 
-from barbot import constants, logger, barbot
+from barbot import (
+    logger, setup_logging, barbot, exceptions, journal, metrics, prefetch,
+    profiler, scheduler
+)
+from barbot.strategies import (  # noqa
+    Player, choice_warrior_action, choice_medic_action
+)
+
+
+def get_parser():
+    """
+    Create parser of command line arguments.
+
+    :returns: `argparse.ArgumentParser` instance.
+    """
+    parser = argparse.ArgumentParser(description='Example bot for towers.')
+    parser.add_argument(
+        'config', nargs='?', default='barbot.conf',
+        help='path to configuration file.'
+    )
+    parser.add_argument(
+        '--turns', type=int, help='leave game after this count of actions.'
+    )
+    parser.add_argument(
+        '--profile', metavar='FILENAME',
+        help='write collapsed stacks of game loop for flamegraph.'
+    )
+    parser.add_argument(
+        '--profile-mode', choices=('sample', 'trace'), default='sample',
+        help='sampling (low overhead) or tracing of every call.'
+    )
+    parser.add_argument(
+        '--profile-interval', type=float, default=0.005,
+        help='seconds of CPU time between samples.'
+    )
+    parser.add_argument(
+        '--tracemalloc', metavar='FILENAME',
+        help='write growth of memory after every turn (needs tracemalloc).'
+    )
+    return parser
 
 
 def main():
     """Main function."""
-    bot = barbot.Bot('barbot.conf')
-    bot.change_game('towers')
+    parser = get_parser()
+    arguments = parser.parse_args()
+    if arguments.tracemalloc and profiler.tracemalloc is None:
+        parser.error('module `tracemalloc` is not available.')
+    setup_logging()
+
     try:
-        game(bot)
+        bot = barbot.Bot(arguments.config)
+        bot.change_game('towers')
+    except exceptions.BarbotError as e:
+        logger.info(e)
+        exit()
+
+    exporter = metrics.get_exporter(bot._settings.metrics)
+    if exporter is not None:
+        exporter.add(bot.metrics)
+        exporter.start()
+
+    # Turns are written to journal instead of console.
+    bot.journal = journal.get_journal(bot._settings.journal)
+    if bot.journal is not None:
+        bot.journal.start()
+
+    try:
+        profile(bot, arguments)
     except:
         print(traceback.format_exc())
         logger.info('Close bot.')
         bot.leave_game()
         exit()
+    else:
+        logger.info('Leave game.')  # Game is over or all turns are done.
+        bot.leave_game()
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        if bot.journal is not None:
+            bot.journal.stop()
+
+
+def profile(bot, arguments):
+    """Run game with profilers from command line arguments."""
+    memory = None
+    if arguments.tracemalloc:
+        memory = profiler.MemoryProfiler(arguments.tracemalloc)
+        memory.start()
+
+    cpu = None
+    if arguments.profile:
+        cpu = profiler.get_profiler(
+            arguments.profile_mode, arguments.profile_interval
+        )
+        cpu.start()
 
-
-def game(bot):
-    """Start and contol current game."""
+    try:
+        game(bot, arguments.turns, memory and memory.snapshot)
+    finally:
+        if cpu is not None:
+            cpu.stop()
+            cpu.write(arguments.profile)
+            logger.info(u'Profile is written to {}.'.format(arguments.profile))
+        if memory is not None:
+            memory.stop()
+
+
+def game(bot, turns=None, callback=None):
+    """
+    Start and contol current game.
+
+    :param bot: `barbot.Bot` instance with chosen game.
+    :param turns (optional): `int` max count of actions.
+    :param callback (optional): function called with player after each
+        action.
+    """
     logger.info('Enter to towers.')
 
-    bot.entry()
+    player = Player(bot)
+    player.start()
 
     logger.info(u'Tower: {}'.format(bot._game._tower))
 
-    bot.hero._update_status(bot._game._page)
-    hp = bot.hero.hp
-
-    while not bot.hero.is_tired:
-        bot.hero._update_status(bot._game._page)
-        actions = bot.get_actions()
-        if bot.hero.hp < hp:
-            if actions['move']['forward']:
-                action = random.choice(actions['move']['forward'])
-            elif actions['move']['backward']:
-                action = random.choice(actions['move']['backward'])
-            else:
-                bot.entry()
-                continue
-        else:
-            if bot.hero._class == constants.WARRIOR:
-                action = choice_warrior_action(actions)
-            else:
-                action = choice_medic_action(actions)
-
-            if action is None:
-                bot.entry()
-                continue
-
-        bot.move(action)
-        logger.info(bot.get_action_log())
-        print('=' * 60)
-        hp = bot.hero.hp
-        time.sleep(random.randint(4, 7))
-
-
-def choice_warrior_action(actions):
-    """Choice the optimal action for warrior."""
-    if actions['skills'] and any(actions['attack'].values()):
-        action = actions['skills'][0]
-    elif actions['attack']:
-        if actions['attack']['tower']:
-            action = actions['attack']['tower']
-        elif actions['attack']['last']:
-            action = actions['attack']['last']
-        else:
-            action = actions['attack']['random']
-    elif actions['move']:
-        if actions['move']['forward']:
-            action = random.choice(actions['move']['forward'])
-        else:
-            action = random.choice(actions['move']['backward'])
-    else:
-        action = None
-
-    return action
-
-
-def choice_medic_action(actions):
-    """Choice the optimal action for medic."""
-    if actions['heal']:
-        if actions['heal']['self']:
-            action = actions['heal']['self']
-        elif actions['heal']['last']:
-            action = actions['heal']['last']
-        else:
-            action = actions['heal']['new']
-    elif actions['skills'] and any(actions['burning'].values()):
-        action = actions['skills'][0]
-    elif actions['burning']:
-        if actions['burning']['last']:
-            action = actions['burning']['last']
-        else:
-            action = actions['burning']['random']
-    elif actions['move']:
-        if actions['move']['forward']:
-            action = random.choice(actions['move']['forward'])
-        else:
-            action = random.choice(actions['move']['backward'])
-    else:
-        action = None
-
-    return action
+    pacer = scheduler.get_pacer(bot._settings.pacing)
+    pacer.hooks.append(lambda: player.is_urgent)  # Retreat without pause.
+
+    # Hero page and actions are fetched while bot waits for next turn.
+    prefetcher = prefetch.get_prefetcher(bot, bot._settings.prefetch)
+
+    while not player.is_over and (turns is None or player.turns < turns):
+        pacer.start()
+        if not player.turn():
+            continue
+
+        if bot.journal is None:
+            logger.info(bot.get_action_log())
+            print('=' * 60)
+        if callback is not None:
+            callback(player)
+        if bot.reload_settings():
+            scheduler.get_pacer(bot._settings.pacing, pacer)
+        if not pacer.is_urgent:
+            bot.save_graph()
+            if bot.maintenance is not None:
+                bot.maintenance.run(pacer.interval)  # Time of pause.
+        # Urgent action has no pause, prefetch would delay it.
+        if prefetcher is not None and not pacer.is_urgent:
+            prefetcher.start(pacer.interval)
+        pacer.wait()
+        if prefetcher is not None:
+            prefetcher.wait()
 
 if __name__ == '__main__':
     main()
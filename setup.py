@@ -11,7 +11,8 @@ VERSION = '1.2.2'
 here = path.abspath(path.dirname(__file__))
 
 packages = [
-    'barbot'
+    'barbot',
+    'barbot.games',
 ]
 
 requires = [
@@ -19,7 +20,6 @@ requires = [
     'lxml',
     'randua',
     'requests',
-    'dotmap',
     'urltools'
 ]
 
@@ -31,6 +31,9 @@ setup(
     version=VERSION,
     packages=packages,
     install_requires=requires,
+    entry_points={
+        'console_scripts': ['barbot = barbot.cli:main'],
+    },
     description='Create your bot for barbars.ru.',
     long_description=long_description,
     author='Vitalii Maslov',
@@ -1,11 +1,80 @@
 # coding=utf-8
 
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import hashlib
+import tempfile
 import unittest
+import subprocess
+import collections
+import threading
 
-from barbot import barbot, constants
+from lxml import html
+import requests
+
+import urltools
+
+from barbot import (
+    barbot, cache, constants, engine, exceptions, games, graph, history,
+    journal, maintenance, metrics, prefetch, profiler, scheduler, selectors,
+    simulator, strategies, fleet, server, transports, utils
+)
 from barbot.games import towers
 
 CONFIG_PATH = 'barbot.conf'
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def get_fixture(name):
+    """
+    Get content of saved page.
+
+    :param name: filename of page in fixtures directory.
+    :returns: `str` content of page.
+    """
+    with io.open(os.path.join(FIXTURES_PATH, name), 'rb') as f:
+        return f.read()
+
+
+class ServerTestCase(unittest.TestCase):
+
+    """Base class for tests with local server instead of barbars.ru."""
+
+    def setUp(self):
+        """Start server and create configuration."""
+        self.server = server.Server(server.Application(seed=0))
+        self._host = constants.HOST
+        constants.HOST = self.server.host
+
+        descriptor, self.config = tempfile.mkstemp(suffix='.conf')
+        with os.fdopen(descriptor, 'w') as f:
+            f.write('[account]\nusername = Username\npassword = secret\n')
+
+    def tearDown(self):
+        """Stop server and remove configuration."""
+        constants.HOST = self._host
+        self.server.close()
+        os.remove(self.config)
+
+    def create_bot(self, username='Username'):
+        """Create `barbot.Bot` in towers on local server."""
+        with open(self.config) as f:
+            configuration = f.read()
+        with open(self.config, 'w') as f:
+            f.write(configuration.replace('Username', username))
+
+        bot = barbot.Bot(self.config)
+        bot.change_game('towers')
+
+        with open(self.config, 'w') as f:
+            f.write(configuration)
+        return bot
 
 
 class SettingsTests(unittest.TestCase):
@@ -26,6 +95,59 @@ class SettingsTests(unittest.TestCase):
         """Testing get setting."""
         self.assertIsInstance(self.settings.account.username, str)
 
+    def test_frozen(self):
+        """Test sections are immutable and password is hidden."""
+        with self.assertRaises(AttributeError):
+            self.settings.pacing.rate = 1
+        self.assertNotIn(self.settings.account.password, repr(self.settings))
+        self.assertIn("password='***'", repr(self.settings))
+
+
+class SettingsReloadTests(ServerTestCase):
+
+    """Tests for validation and reload of settings."""
+
+    def write(self, text, shift=0):
+        """Write configuration and move time of change."""
+        with open(self.config, 'w') as f:
+            f.write('[account]\nusername = Username\npassword = secret\n')
+            f.write(text)
+        changed = time.time() + shift
+        os.utime(self.config, (changed, changed))
+
+    def test_invalid(self):
+        """Test errors of values, unknown options and consistency."""
+        for text in ('[pacing]\nrate = fast\n', '[pacing]\nspeed = 1\n',
+                     '[fleet]\nbackoff = 10\nmax_backoff = 1\n',
+                     '[journal]\nfilename = {account}.jsonl\n',
+                     '[accounts]\n[[first]]\nusername = First\n'):
+            self.write(text)
+            with self.assertRaises(exceptions.SettingsError):
+                barbot.Settings(self.config)
+
+    def test_reload(self):
+        """Test tuning is changed between turns without login."""
+        bot = self.create_bot()
+        bot._settings.check_interval = 0
+        session = bot._session
+        self.assertIsNone(bot.maintenance)
+        bot.reload_settings()  # File is written again by `create_bot`.
+        self.assertFalse(bot.reload_settings())
+
+        self.write('[hero]\nstatus_ttl = 5\n[maintenance]\nenabled = True\n'
+                   '[pacing]\nrate = 3600\n', shift=10)
+        self.assertTrue(bot.reload_settings())
+        self.assertEqual(bot.hero._status_ttl, 5)
+        self.assertIsNotNone(bot.maintenance)
+        self.assertEqual(
+            scheduler.get_pacer(bot._settings.pacing).interval, 1
+        )
+        self.assertIs(bot._session, session)
+
+        self.write('[pacing]\nrate = fast\n', shift=20)
+        self.assertFalse(bot.reload_settings())
+        self.assertEqual(bot._settings.pacing.rate, 3600)
+
 
 class AccountTests(unittest.TestCase):
 
@@ -142,5 +264,1327 @@ class TowersTests(unittest.TestCase):
         self.towers.entry()
         self.assertIsInstance(self.towers.get_actions(), dict)
 
+
+class HeroStatusTests(unittest.TestCase):
+
+    """Tests for status of hero from game pages."""
+
+    def setUp(self):
+        """Create `Hero` class with counter of hero page requests."""
+        session = requests.Session()
+        session.cookies['id'] = '1024'
+        self.requests = []
+        test = self
+
+        class Hero(barbot.Hero):
+            __slots__ = ()
+
+            def _get_hero_page(self):
+                test.requests.append('user')
+                return html.fromstring(get_fixture('user.html'))
+
+        self.hero = Hero(session=session, status_ttl=60)
+
+    def test_status_from_game_page(self):
+        """Test status is taken from game page, tire from hero page."""
+        page = html.fromstring(get_fixture('towers_battle.html'))
+        self.assertTrue(self.hero._update_status(page))
+        self.assertEqual((self.hero.hp, self.hero.ep), (870, 95))
+        self.assertFalse(self.hero.is_tired)
+        self.assertFalse(self.hero.is_tired)
+        self.assertEqual(self.requests, ['user'])
+
+        self.hero._update_status(page)  # Status of game page is not fresh.
+        self.hero._status_time = time.time() - 61
+        self.assertFalse(self.hero.is_tired)
+        self.assertEqual(self.requests, ['user', 'user'])
+
+    def test_tired_from_hero_page(self):
+        """Test tire of hero page is kept by game page without tire."""
+        page = html.fromstring(get_fixture('user.html'))
+        page.find('body').append(html.fromstring('<a href="user/tire">t</a>'))
+        self.hero._update_status(page, hero_page=True)
+        self.hero._update_status(
+            html.fromstring(get_fixture('towers_battle.html'))
+        )
+        self.assertTrue(self.hero.is_tired)
+        self.assertEqual(self.requests, [])
+
+    def test_tired_from_game_page(self):
+        """Test tire link on game page."""
+        self.hero._status_time = time.time()
+        page = html.fromstring(get_fixture('towers_quiet.html'))
+        link = html.fromstring('<a href="user/tire">tired</a>')
+        page.find('body').append(link)
+        self.hero._update_status(page)
+        self.assertTrue(self.hero.is_tired)
+        self.assertEqual(self.requests, [])
+
+    def test_page_without_status(self):
+        """Test hero page is fetched if game page has no status."""
+        self.hero._status_time = time.time()
+        page = html.fromstring('<html><body><h1>Error</h1></body></html>')
+        self.assertFalse(self.hero._update_status(page))
+        self.assertFalse(self.hero.is_tired)
+        self.assertEqual(self.requests, ['user'])
+        self.assertEqual(self.hero.hp, 1240)
+
+    def test_status_ttl(self):
+        """Test hero page is fetched when status is stale."""
+        self.hero._update_status(
+            html.fromstring(get_fixture('user.html')), hero_page=True
+        )
+        self.hero._status_time = time.time() - 61
+        self.assertFalse(self.hero.is_tired)
+        self.assertEqual(self.requests, ['user'])
+
+
+class HistoryTests(unittest.TestCase):
+
+    """Tests for `History` class."""
+
+    def setUp(self):
+        """Create small history."""
+        self.history = history.History(size=4)
+
+    def test_ring(self):
+        """Test the oldest samples are overwritten."""
+        for turn in range(6):
+            self.history.append(turn, 100 - turn, 50, u'Башня', 'damageLast')
+
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(self.history[0].time, 2)
+        self.assertEqual(self.history[-1], history.Sample(
+            5, 95, 50, u'Башня', 'damageLast'
+        ))
+        self.assertRaises(IndexError, self.history.__getitem__, 4)
+
+    def test_damage(self):
+        """Test damage and damage rate over last turns."""
+        for turn, hp in enumerate((100, 90, 95, 80, None, 60)):
+            self.history.append(turn * 2, hp, None)
+
+        self.assertEqual(self.history.get_damage(1), 0)
+        self.assertEqual(self.history.get_damage(2), 0)
+        self.assertEqual(self.history.get_damage(3), 15)
+        self.assertEqual(self.history.get_damage(100), 15)
+        self.assertEqual(self.history.get_damage_rate(3), 2.5)
+        self.assertIsNone(self.history[-2].hp)
+
+    def test_names_limit(self):
+        """Test table of names is bounded."""
+        self.history = history.History(size=4, max_names=3)
+        for turn in range(4):
+            self.history.append(turn, 100, 50, str(turn))
+        self.assertEqual(
+            [sample.location for sample in self.history],
+            ['0', '1', None, None]
+        )
+
+    def test_slots(self):
+        """Test hero has no attributes dictionary."""
+        session = requests.Session()
+        session.cookies['id'] = '1'
+        self.assertFalse(hasattr(barbot.Hero(session), '__dict__'))
+
+
+class PacerTests(unittest.TestCase):
+
+    """Tests for `Pacer` class on simulated clock."""
+
+    def setUp(self):
+        """Create simulated clock."""
+        self.now = 0.0
+
+    def clock(self):
+        """Get simulated time."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance simulated time."""
+        self.now += seconds
+
+    def create_pacer(self, **kwargs):
+        """Create pacer on simulated clock."""
+        return scheduler.Pacer(clock=self.clock, sleep=self.sleep, **kwargs)
+
+    def test_rate(self):
+        """Test achieved rate with turns of random duration."""
+        pacer = self.create_pacer(rate=600, jitter=0.25, min_interval=1)
+        durations = random.Random(0)
+        for _ in range(1000):
+            pacer.start()
+            self.sleep(durations.uniform(0.2, 3))
+            pacer.wait()
+
+        self.assertAlmostEqual(1000 / self.now * 3600, 600, delta=600 * 0.03)
+
+    def test_turn_time_is_subtracted(self):
+        """Test duration of turn is subtracted from pause."""
+        pacer = self.create_pacer(rate=600, jitter=0)
+        pacer.start()
+        self.sleep(2)
+        self.assertAlmostEqual(pacer.get_delay(), 4)
+        self.sleep(5)
+        self.assertEqual(pacer.get_delay(), 0)
+
+    def test_urgent(self):
+        """Test urgent action skips pause but keeps min interval."""
+        pacer = self.create_pacer(rate=600, jitter=0, min_interval=1)
+        urgent = []
+        pacer.hooks.append(lambda: bool(urgent))
+
+        pacer.start()
+        self.sleep(0.25)
+        urgent.append(True)
+        self.assertAlmostEqual(pacer.get_delay(), 0.75)
+
+    def test_from_delay(self):
+        """Test pacer with mean of range of delay."""
+        pacer = scheduler.from_delay((4, 7))
+        self.assertAlmostEqual(pacer.interval, 5.5)
+        self.assertAlmostEqual(pacer.jitter, 3 / 11.0)
+        self.assertEqual(scheduler.from_delay((0, 0)).get_delay(), 0)
+
+
+class EngineTests(ServerTestCase):
+
+    """Tests for `Engine` class on local server."""
+
+    def test_run(self):
+        """Test run of many players with bounded concurrency."""
+        players = [
+            strategies.Player(self.create_bot('Hero{}'.format(number)))
+            for number in range(4)
+        ]
+
+        bots = engine.Engine(concurrency=2, delay=(0, 0))
+        for player in players:
+            bots.add(player)
+        bots.run(turns=3)
+
+        for player in players:
+            self.assertEqual(player.turns, 3)
+
+    def test_stop(self):
+        """Test stop of engine."""
+        bots = engine.Engine(concurrency=1, delay=(60, 60))
+        bots.add(strategies.Player(self.create_bot()))
+        threading.Timer(0.2, bots.stop).start()
+        bots.run()
+        self.assertEqual(self.server.application.requests[-1], ('GET', '/'))
+
+
+class FleetTests(ServerTestCase):
+
+    """Tests for `Fleet` class on local server."""
+
+    def setUp(self):
+        """Create configuration with many accounts."""
+        super(FleetTests, self).setUp()
+        with open(self.config, 'w') as f:
+            f.write('\n'.join((
+                '[accounts]',
+                '[[first]]', 'username = First', 'password = secret',
+                '[[second]]', 'username = Second', 'password = secret',
+                '[[third]]', 'username = Third', 'password = secret',
+                '[fleet]', 'workers = 2', 'backoff = 1', 'max_backoff = 4',
+                'report_interval = 0',
+            )))
+
+    def test_run(self):
+        """Test run of accounts in worker processes."""
+        bots = fleet.Fleet(self.config, delay=(0, 0), turns=2)
+        self.assertEqual(
+            [worker.accounts for worker in bots.workers],
+            [['first', 'third'], ['second']]
+        )
+        bots.run()
+        self.assertEqual([worker.total for worker in bots.workers], [4, 2])
+
+    def test_get_backoff(self):
+        """Test delay before restart of crashed worker."""
+        bots = fleet.Fleet(self.config)
+        self.assertEqual(
+            [bots.get_backoff(failures) for failures in range(1, 5)],
+            [1, 2, 4, 4]
+        )
+
+
+class TransportsTests(ServerTestCase):
+
+    """Tests for record, replay and fake transports."""
+
+    def setUp(self):
+        """Create path to archive."""
+        super(TransportsTests, self).setUp()
+        self.archive = self.config + '.rec.gz'
+
+    def tearDown(self):
+        """Remove archive."""
+        super(TransportsTests, self).tearDown()
+        transports._archives.clear()
+        if os.path.exists(self.archive):
+            os.remove(self.archive)
+
+    def configure(self, mode):
+        """Set transport mode in configuration."""
+        with open(self.config, 'a') as f:
+            f.write('[transport]\nmode = {}\narchive = {}\n'.format(
+                mode, self.archive
+            ))
+
+    def test_record_and_replay(self):
+        """Test replay of recorded requests without server."""
+        with open(self.config) as f:
+            configuration = f.read()
+
+        self.configure('record')
+        bot = self.create_bot()
+        bot.entry()
+        location = bot._game._location
+        transports._archives[self.archive].close()
+        for entry in transports.Archive.read(self.archive):
+            self.assertNotIn('body', entry)  # Form of login has password.
+
+        self.server.close()
+        self.server = server.Server()
+
+        with open(self.config, 'w') as f:
+            f.write(configuration)
+        self.configure('replay')
+        bot = self.create_bot()
+        bot.entry()
+        self.assertEqual(bot.hero._name, 'Username')
+        self.assertEqual(bot._game._location, location)
+        self.assertEqual(self.server.application.requests, [])
+
+    def test_fake(self):
+        """Test game on fake server in process."""
+        constants.HOST = self._host
+        self.configure('fake')
+        player = strategies.Player(self.create_bot())
+        player.start()
+        for _ in range(3):
+            player.turn()
+        self.assertEqual(player.bot._game._capital, u'Южная столица')
+        self.assertEqual(self.server.application.requests, [])
+
+    def test_shared_pool(self):
+        """Test bots share pool of keep-alive connections."""
+        self.configure('live')
+        bots = [self.create_bot('Hero{}'.format(i)) for i in range(2)]
+        for bot in bots:
+            bot.entry()
+
+        adapter = bots[0]._session.get_adapter(constants.HOST)
+        self.assertIsInstance(adapter, transports.TunedAdapter)
+        self.assertIs(bots[1]._session.get_adapter(constants.HOST), adapter)
+        pool = adapter.poolmanager.connection_from_url(constants.HOST)
+        self.assertEqual(pool.num_connections, 1)
+
+    def test_timeout_and_retries(self):
+        """Test retries of GET after timeout of read."""
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        connections = []
+
+        def accept():
+            while True:
+                try:
+                    connections.append(listener.accept()[0])
+                except socket.error:
+                    return
+
+        thread = threading.Thread(target=accept)
+        thread.daemon = True
+        thread.start()
+
+        host = 'http://127.0.0.1:{}/'.format(listener.getsockname()[1])
+        session = requests.Session()
+        session.mount(host, transports.TunedAdapter(
+            timeout=(1, 0.1), retries=2
+        ))
+        try:
+            self.assertRaises(
+                requests.ConnectionError, session.get, host + 'user'
+            )
+            self.assertEqual(len(connections), 3)
+        finally:
+            listener.close()
+            for connection in connections:
+                connection.close()
+
+
+class SessionCacheTests(ServerTestCase):
+
+    """Tests for cache of sessions on local server."""
+
+    def setUp(self):
+        """Enable cache of sessions in configuration."""
+        super(SessionCacheTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        with open(self.config, 'a') as f:
+            f.write('[cache]\nenabled = True\ndirectory = {}\n'.format(
+                self.directory
+            ))
+
+    def tearDown(self):
+        """Remove cache."""
+        super(SessionCacheTests, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_warm_start(self):
+        """Test bot reuses cached session without requests."""
+        hero = self.create_bot().hero
+        count = len(self.server.application.requests)
+
+        bot = self.create_bot()
+        self.assertEqual(len(self.server.application.requests), count)
+        self.assertEqual(bot.hero.information, hero.information)
+        self.assertEqual(bot.hero._id, hero._id)
+        self.assertEqual(bot._session.headers['User-Agent'],
+                         hero._session.headers['User-Agent'])
+
+        bot.entry()
+        self.assertEqual(self.server.application.requests[count][1], '/')
+
+    def test_expired(self):
+        """Test redirect to login invalidates cache and bot logs in again."""
+        self.create_bot()
+        self.server.application._heroes.clear()
+
+        bot = self.create_bot()
+        bot._session.get(constants.HOST + 'user')
+        self.assertTrue(bot._account.is_expired)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        bot.entry()
+        self.assertFalse(bot._account.is_expired)
+        self.assertEqual(bot._game._capital, u'Южная столица')
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_ttl(self):
+        """Test session is not restored after ttl."""
+        sessions = cache.SessionCache(self.directory, ttl=60)
+        sessions.set('Username', 'secret', {}, {})
+        self.assertIsNotNone(sessions.get('Username', 'secret'))
+        self.assertIsNone(sessions.get('Username', 'other'))
+
+        sessions._ttl = 0
+        time.sleep(0.01)
+        self.assertIsNone(sessions.get('Username', 'secret'))
+
+    def test_password(self):
+        """Test file is named by username and keeps salted password."""
+        sessions = cache.SessionCache(self.directory)
+        sessions.set('Username', 'secret', {}, {})
+        name, = os.listdir(self.directory)
+        self.assertEqual(name, hashlib.sha1('Username').hexdigest() + '.json')
+
+        with open(os.path.join(self.directory, name)) as f:
+            content = f.read()
+        self.assertNotIn('secret', content)
+        self.assertNotIn(hashlib.sha1('Username:secret').hexdigest(), content)
+
+        sessions.set('Username', 'secret', {}, {})
+        with open(os.path.join(self.directory, name)) as f:
+            self.assertNotEqual(f.read(), content)  # New salt.
+        self.assertIsNone(sessions.get('Username', 'other'))
+
+
+class RoundTripsTests(ServerTestCase):
+
+    """Tests for count of requests of startup and entry to game."""
+
+    def test_startup(self):
+        """Test login response is used for check and hero information."""
+        bot = barbot.Bot(self.config)
+        self.assertEqual(
+            [method for method, _ in self.server.application.requests],
+            ['POST', 'GET']
+        )
+        self.assertEqual(bot.hero._name, 'Username')
+        self.assertEqual(bot.hero.hp, 1500)
+
+    def test_reentry(self):
+        """Test entry by link to tower from last entry."""
+        bot = self.create_bot()
+        log = self.server.application.requests
+
+        count = len(log)
+        bot.entry()
+        self.assertEqual(len(log) - count, 3)
+
+        count = len(log)
+        bot.entry()
+        self.assertEqual(len(log) - count, 1)
+        self.assertEqual(bot._game._location, u'Южная башня')
+
+    def test_reentry_fallback(self):
+        """Test entry page is requested if link to tower is not valid."""
+        bot = self.create_bot()
+        bot.entry()
+        bot._game._tower_url = constants.HOST + 'game/towers'
+
+        count = len(self.server.application.requests)
+        bot.entry()
+        self.assertEqual(len(self.server.application.requests) - count, 4)
+        self.assertEqual(bot._game._location, u'Южная башня')
+
+
+class PrefetchTests(ServerTestCase):
+
+    """Tests for prefetch of data in pause between turns."""
+
+    def test_prefetch(self):
+        """Test next turn uses prefetched data without requests."""
+        bot = self.create_bot()
+        bot.entry()
+        bot.hero._status_ttl = 10
+
+        prefetcher = prefetch.Prefetcher(bot)
+        prefetcher.start(ahead=60)
+        prefetcher.wait()
+        self.assertEqual(
+            self.server.application.requests[-1], ('GET', '/user')
+        )
+
+        count = len(self.server.application.requests)
+        self.assertFalse(bot.hero.is_tired)
+        bot.get_actions()['move']
+        self.assertEqual(len(self.server.application.requests), count)
+
+    def test_fresh_status(self):
+        """Test hero page is not fetched while status is valid."""
+        bot = self.create_bot()
+        bot.entry()
+        bot.hero.is_tired
+
+        count = len(self.server.application.requests)
+        prefetcher = prefetch.Prefetcher(bot)
+        prefetcher.start(ahead=1)
+        prefetcher.wait()
+        self.assertEqual(len(self.server.application.requests), count)
+
+
+class MetricsTests(ServerTestCase):
+
+    """Tests for latency of phases and export of metrics."""
+
+    def test_histogram(self):
+        """Test cumulative counts of buckets."""
+        histogram = metrics.Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.to_dict(), {
+            'buckets': [0.1, 1, '+Inf'], 'cumulative': [2, 3, 4],
+            'count': 4, 'sum': 5.65,
+        })
+
+    def test_turn(self):
+        """Test phases and counters of turn."""
+        bot = self.create_bot()
+        player = strategies.Player(bot)
+        player.start()
+        player.turn()
+
+        snapshot = bot.metrics.snapshot()
+        self.assertEqual(snapshot['account'], 'Username')
+        self.assertTrue(set(snapshot['phases']) >= {
+            'ttfb', 'body', 'entry', 'move', 'parse', 'actions', 'decision',
+        })
+        self.assertLess(
+            snapshot['phases']['parse']['sum'],
+            snapshot['phases']['move']['sum'] +
+            snapshot['phases']['entry']['sum']
+        )
+        self.assertEqual(snapshot['counters']['actions'], 1)
+        self.assertEqual(snapshot['counters']['entries'], 1)
+        self.assertEqual(
+            snapshot['counters']['requests'],
+            len(self.server.application.requests)
+        )
+
+    def test_streaming_parse(self):
+        """Test parse of streamed page is measured."""
+        bot = self.create_bot()
+        collected = metrics.Metrics()
+        utils.get_page(
+            bot._session, utils.build_url('user'), True, 256,
+            barbot.Hero.stream_stop, metrics=collected
+        )
+        self.assertEqual(collected.snapshot()['phases']['parse']['count'], 1)
+
+    def test_export(self):
+        """Test Prometheus and JSON files."""
+        collected = metrics.Metrics(u'Hero "1"')
+        collected.observe('move', 0.2)
+        collected.increment('actions')
+
+        descriptor, filename = tempfile.mkstemp()
+        os.close(descriptor)
+        self.addCleanup(os.remove, filename)
+
+        exporter = metrics.Exporter(filename)
+        exporter.add(collected)
+        exporter.write()
+        with open(filename) as f:
+            text = f.read()
+        self.assertIn(
+            'barbot_phase_seconds_bucket{account="Hero \\"1\\"",'
+            'phase="move",le="0.25"} 1\n', text
+        )
+        self.assertIn('barbot_phase_seconds_count{account="Hero \\"1\\"",'
+                      'phase="move"} 1\n', text)
+        self.assertIn('barbot_actions_total{account="Hero \\"1\\""} 1\n',
+                      text)
+
+        exporter = metrics.Exporter(filename, 'json')
+        exporter.add(collected)
+        exporter.write()
+        with open(filename) as f:
+            snapshot = json.load(f)['accounts'][0]
+        self.assertEqual(snapshot['phases']['move']['count'], 1)
+        self.assertEqual(snapshot['counters'], {'actions': 1})
+
+
+def spin(seconds):
+    """Use CPU for seconds."""
+    started = time.clock()
+    while time.clock() - started < seconds:
+        pass
+
+
+class ProfilerTests(ServerTestCase):
+
+    """Tests for profilers of bot loop."""
+
+    def test_sampler(self):
+        """Test samples of busy function."""
+        with profiler.Sampler(0.001) as sampler:
+            spin(0.2)
+
+        stack, count = sampler.get_lines()[0].rsplit(' ', 1)
+        self.assertTrue(stack.endswith('tests:test_sampler;tests:spin'))
+        self.assertGreater(int(count), 20)
+
+    def test_tracer(self):
+        """Test stacks of turns of bot."""
+        bot = self.create_bot()
+        player = strategies.Player(bot)
+        player.start()
+
+        with profiler.Tracer() as tracer:
+            player.turn()
+
+        stacks = '\n'.join(tracer.get_lines())
+        self.assertIn('tests:test_tracer;barbot.strategies:turn;', stacks)
+        self.assertIn(';barbot.barbot:move;', stacks)
+
+        descriptor, filename = tempfile.mkstemp()
+        os.close(descriptor)
+        self.addCleanup(os.remove, filename)
+        tracer.write(filename)
+        with open(filename) as f:
+            self.assertEqual(f.read(), stacks + '\n')
+
+    @unittest.skipIf(profiler.tracemalloc is None, 'No tracemalloc.')
+    def test_memory(self):
+        """Test report of growth of memory per turn."""
+        descriptor, filename = tempfile.mkstemp()
+        os.close(descriptor)
+        self.addCleanup(os.remove, filename)
+
+        memory = profiler.MemoryProfiler(filename)
+        memory.start()
+        kept = [bytearray(1024) for _ in range(100)]  # noqa
+        memory.snapshot()
+        memory.stop()
+
+        with open(filename) as f:
+            self.assertTrue(f.readline().startswith('Turn 1: current'))
+
+
+class SelectorsTests(unittest.TestCase):
+
+    """Tests for precompiled selectors."""
+
+    def test_compile(self):
+        """Test all expressions are valid and compiled once."""
+        page = html.fromstring(get_fixture('towers_battle.html'))
+        for name in dir(selectors):
+            selector = getattr(selectors, name)
+            if isinstance(selector, selectors.XPath):
+                selector(page, part='')
+                compiled = selector._compiled
+                selector(page, part='')
+                self.assertIs(selector._compiled, compiled, name)
+
+    def test_variables(self):
+        """Test same expression with different parts of url."""
+        page = html.fromstring(get_fixture('towers_battle.html'))
+        for part in ('nearLocation', 'damageTower', '"'):
+            self.assertEqual(
+                selectors.LINK_HREF(page, part=part),
+                page.xpath('//a[contains(@href, $part)]/@href', part=part)
+            )
+
+
+@unittest.skipIf(simulator.numpy is None, 'No numpy.')
+class SimulatorTests(unittest.TestCase):
+
+    """Tests for offline simulator of towers."""
+
+    def test_get_actions(self):
+        """Test shape of actions is same as in towers."""
+        actions = simulator.get_actions(
+            1 << simulator.ATTACK_TOWER | 1 << simulator.SKILL |
+            1 << simulator.MOVE_FORWARD
+        )
+        self.assertEqual(actions['attack']['tower'], 'simulator/attack.tower')
+        self.assertEqual(actions['skills'], ['simulator/skills'])
+        self.assertEqual(
+            actions['move']['forward'], ['simulator/move.forward']
+        )
+        self.assertIsNone(actions['attack']['random'])
+
+        game = towers.Towers(None)
+        game._set_page(html.fromstring(get_fixture('towers_quiet.html')))
+        shape = lambda actions: {  # noqa
+            key: sorted(value) if isinstance(value, dict) else type(value)
+            for key, value in actions.items()
+        }
+        self.assertEqual(
+            shape(game.get_actions().copy()),
+            shape(simulator.get_actions(0))
+        )
+
+    def test_compile_policy(self):
+        """Test decision table of strategy."""
+        table = simulator.compile_policy(strategies.choice_warrior_action)
+        self.assertEqual(table[1 << simulator.ATTACK_TOWER],
+                         simulator.ATTACK_TOWER)
+        self.assertEqual(
+            table[1 << simulator.ATTACK_RANDOM | 1 << simulator.SKILL],
+            simulator.SKILL
+        )
+        self.assertEqual(table[0], simulator.WAIT)
+
+    def test_run(self):
+        """Test reports of strategies on same battles."""
+        battles = simulator.Simulator(battles=200, turns=50, seed=0)
+        reports = battles.compare({
+            'capital': lambda actions: actions['move']['capital'],
+            'forward': lambda actions: (actions['move']['forward'] or [0])[0],
+            'warrior': strategies.choice_warrior_action,
+        })
+
+        self.assertEqual(reports['capital'].survival, 1)
+        self.assertEqual(reports['capital'].damage, 0)
+        self.assertLess(reports['forward'].survival, 1)
+        self.assertGreater(reports['warrior'].damage, 0)
+        self.assertEqual(
+            battles.run(strategies.choice_warrior_action), reports['warrior']
+        )
+
+
+class PageCacheTests(unittest.TestCase):
+
+    """Tests for in-memory cache of parsed pages."""
+
+    def setUp(self):
+        """Create cache and page with changed counter of links."""
+        self.metrics = metrics.Metrics()
+        self.pages = cache.PageCache(2, self.metrics)
+        self.content = get_fixture('towers_battle.html')
+        self.changed = self.content.replace(
+            'interface=:31:', 'interface=:32:'
+        )
+
+    def test_hit(self):
+        """Test same body is not parsed again."""
+        page = self.pages.get(self.content)
+        self.assertEqual(self.pages.memoize(page, 'name', len), len(page))
+        self.assertIs(self.pages.get(self.content), page)
+        self.assertEqual(self.pages.get_data(page), {'name': len(page)})
+        self.assertEqual(self.metrics.snapshot()['counters'], {
+            'page_hits': 1, 'page_misses': 1,
+        })
+
+    def test_rewrite(self):
+        """Test page is reused if only counters are changed."""
+        page = self.pages.get(self.content)
+        self.pages.memoize(page, 'length', len)
+        self.pages.memoize(page, 'hrefs', lambda page: {
+            'all': page.xpath('//a/@href'), 'none': None,
+        })
+        self.pages.memoize(page, 'links', lambda page: page.xpath('//a'))
+
+        self.assertIs(self.pages.get(self.changed), page)
+        data = self.pages.get_data(page)
+        self.assertEqual(sorted(data), ['hrefs', 'length'])  # No elements.
+        self.assertEqual(
+            data['hrefs']['all'],
+            [href.replace(':31:', ':32:') for href in page.xpath('//a/@href')]
+        )
+        self.assertEqual(
+            self.metrics.snapshot()['counters']['page_rewrites'], 1
+        )
+        self.assertIs(self.pages.get(self.changed), page)
+
+        href = selectors.LINK_HREF(page, part='damageTower')[0]
+        self.assertIn(':32:', self.pages.translate(page, href))
+
+    def test_bounded(self):
+        """Test the least recently used page is removed."""
+        first = self.pages.get(self.content)
+        self.pages.get(get_fixture('towers_quiet.html'))
+        self.pages.get(get_fixture('towers_location.html'))
+        self.assertEqual(len(self.pages), 2)
+        self.assertIsNone(self.pages.get_data(first))
+        self.assertIsNot(self.pages.get(self.content), first)
+
+    def test_towers(self):
+        """Test index and actions of towers are reused for same page."""
+        responses = [self.content, self.content, self.changed]
+
+        class Session(object):
+            def get(self, url):
+                return collections.namedtuple('Response', 'content')(
+                    responses.pop(0)
+                )
+
+        game = towers.Towers(Session(), pages=self.pages)
+        game.move('first')
+        actions = game.get_actions()
+        urls = game.get_move_forward_urls()
+        self.assertTrue(urls)
+
+        game.move('second')
+        self.assertIs(game.get_actions(), actions)
+
+        game.move('third')
+        self.assertIsNot(game.get_actions(), actions)
+        self.assertEqual(
+            game.get_move_forward_urls(),
+            [url.replace(':31:', ':32:') for url in urls]
+        )
+
+
+class LocationGraphTests(ServerTestCase):
+
+    """Tests for graph of locations and routes."""
+
+    def setUp(self):
+        """Create line of locations."""
+        super(LocationGraphTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'graph.json')
+
+        self.graph = graph.LocationGraph(self.filename)
+        self.graph.learn('capital', ['a'], capital=True)
+        self.graph.learn('a', ['capital', 'b'])
+        self.graph.learn('b', ['a', 'c'], tower=True)
+        self.graph.learn('c', ['b', 'd'])
+
+    def tearDown(self):
+        """Remove file of graph."""
+        super(LocationGraphTests, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_routes(self):
+        """Test next locations of shortest routes."""
+        self.assertEqual(self.graph.get_next('d', 'capital'), 'c')
+        self.assertEqual(self.graph.get_next('capital', 'd'), 'a')
+        self.assertIsNone(self.graph.get_next('a', 'a'))
+        self.assertIsNone(self.graph.get_next('a', 'unknown'))
+
+        self.assertEqual(self.graph.get_nearest('d', 'capital'),
+                         ('capital', 'c'))
+        self.assertEqual(self.graph.get_nearest('a', 'tower'), ('b', 'b'))
+        self.assertEqual(self.graph.get_nearest('b', 'tower'), ('b', None))
+
+        self.assertFalse(self.graph.learn('b', ['c']))
+        self.assertTrue(self.graph.learn('d', ['capital']))
+        self.assertEqual(self.graph.get_next('d', 'capital'), 'capital')
+
+    def test_shared_file(self):
+        """Test graphs of bots are merged in file."""
+        self.graph.save()
+        other = graph.LocationGraph(self.filename)
+        self.assertEqual(other.get_next('d', 'capital'), 'c')
+
+        other.learn('e', ['d'], tower=True)
+        self.assertTrue(other.save())
+        self.assertFalse(other.save())  # Nothing is learned.
+        self.graph.learn('f', ['a'])
+        self.assertTrue(self.graph.save())
+        shared = graph.LocationGraph(self.filename)
+        self.assertEqual(shared.get_nearest('e', 'tower'), ('e', None))
+        self.assertIn('f', shared)
+        self.assertTrue(os.path.exists(self.filename + '.lock'))
+
+    def test_towers(self):
+        """Test graph is learned from pages of towers."""
+        with open(self.config, 'a') as f:
+            f.write('[graph]\nfilename = {}\n'.format(
+                os.path.join(self.directory, '{side}.json')
+            ))
+        bot = self.create_bot()
+        bot.entry()
+        game = bot._game
+        self.assertEqual(game._location, u'Южная башня')
+        self.assertIsNone(game.get_route_url(u'Южная башня'))
+        self.assertIn(u'Южная столица', game.graph)
+        self.assertIsNotNone(game.get_retreat_url())
+
+        bot.move(game.get_move_forward_urls()[0])
+        tower = game._get_location_url(u'Южная башня')
+        self.assertEqual(game.get_route_url(u'Южная башня'), tower)
+
+        moves = bot.get_actions()['move']
+        self.assertIsNone(moves['tower'])  # Own tower is not attacked.
+        self.assertEqual(moves['retreat'], tower)
+        self.assertEqual(moves['capital'], tower)  # Not a neighbour.
+
+        filename = os.path.join(self.directory, 'south.json')
+        self.assertFalse(os.path.exists(filename))  # Saved in pause.
+        self.assertTrue(bot.save_graph())
+        self.assertFalse(bot.save_graph())
+        self.assertTrue(os.path.exists(filename))
+
+    def test_strategy(self):
+        """Test urgent retreat follows known route to capital."""
+        actions = simulator.get_actions(1 << simulator.MOVE_FORWARD)
+        player = strategies.Player(self.create_bot())
+        player.bot.hero.history.append(0, 1000, 100)
+        player.bot.hero.history.append(1, 900, 100)
+        self.assertTrue(player.is_urgent)
+        self.assertEqual(
+            player.choice_action(actions),
+            simulator.URLS[simulator.MOVE_FORWARD]
+        )
+
+        actions['move']['retreat'] = 'retreat'
+        self.assertEqual(player.choice_action(actions), 'retreat')
+
+
+class MaintenanceTests(ServerTestCase):
+
+    """Tests for chores in pause between turns."""
+
+    def setUp(self):
+        """Create maintenance with manual clock."""
+        super(MaintenanceTests, self).setUp()
+        self.now = 1000.0
+        self.bot = self.create_bot()
+        self.done = []
+        self.maintenance = maintenance.Maintenance(
+            self.bot, spread=False, clock=lambda: self.now
+        )
+
+    def test_interval(self):
+        """Test chore runs once per interval."""
+        self.maintenance.add('chore', self.done.append, interval=10)
+        self.assertEqual(self.maintenance.run(5), ['chore'])
+        self.assertEqual(self.maintenance.run(), [])
+        self.now += 10
+        self.assertEqual(self.maintenance.run(), ['chore'])
+        self.assertEqual(self.done, [5, 0])
+
+    def test_actions(self):
+        """Test chore runs after count of actions and by trigger."""
+        self.maintenance.add('chore', self.done.append, actions=2)
+        self.maintenance.count_action()
+        self.assertEqual(self.maintenance.run(), [])
+        self.maintenance.count_action()
+        self.assertEqual(self.maintenance.run(), ['chore'])
+        self.assertEqual(self.maintenance.run(), [])
+
+        self.maintenance.trigger('chore')
+        self.assertEqual(self.maintenance.run(), ['chore'])
+
+    def test_spread(self):
+        """Test first runs of accounts are shifted."""
+        offsets = set()
+        for name in ('first', 'second', 'third'):
+            bot = collections.namedtuple('Bot', 'metrics')(
+                metrics.Metrics(name)
+            )
+            chore = maintenance.Maintenance(bot, clock=lambda: 0).add(
+                'chore', None, interval=100
+            )
+            self.assertTrue(0 <= chore.due < 100)
+            offsets.add(chore.due)
+        self.assertEqual(len(offsets), 3)
+
+    def test_repair(self):
+        """Test repair by actions with metrics of chore."""
+        with open(self.config, 'a') as f:
+            f.write('[maintenance]\nenabled = True\nrepair_actions = 1\n')
+        bot = self.create_bot()
+        bot.entry()
+        server_hero = self.server.application._heroes[bot.hero._id]
+        server_hero.wear = 100
+
+        self.assertEqual(bot.maintenance.run(), [])
+        bot.move(bot._game.get_move_forward_urls()[0])
+        self.assertEqual(bot.maintenance.run(), ['repair'])
+        self.assertEqual(server_hero.wear, 0)
+
+        snapshot = bot.metrics.snapshot()
+        self.assertEqual(snapshot['counters']['chore_repair'], 1)
+        self.assertEqual(snapshot['phases']['chore_repair']['count'], 1)
+
+    def test_signal(self):
+        """Test repair is triggered by worn equipment on game page."""
+        with open(self.config, 'a') as f:
+            f.write(
+                '[maintenance]\nenabled = True\nrepair_interval = 3600\n'
+                'spread = False\n'
+            )
+        bot = self.create_bot()
+        bot.entry()
+        self.assertEqual(bot.maintenance.run(), ['repair'])  # First run.
+
+        server_hero = self.server.application._heroes[bot.hero._id]
+        bot.move(bot._game.get_move_forward_urls()[0])
+        self.assertEqual(bot._game.get_signals(), [])
+        self.assertEqual(bot.maintenance.run(), [])
+
+        server_hero.wear = 100
+        bot.move(bot._game.get_move_forward_urls()[0])
+        self.assertEqual(bot._game.get_signals(), ['repair'])
+        self.assertEqual(bot.maintenance.run(), ['repair'])
+        self.assertEqual(server_hero.wear, 0)
+
+
+class JournalTests(ServerTestCase):
+
+    """Tests for journal of turns."""
+
+    def setUp(self):
+        """Create directory of journal."""
+        super(JournalTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'turns.jsonl')
+
+    def tearDown(self):
+        """Remove directory of journal."""
+        super(JournalTests, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_rotation(self):
+        """Test old files are compressed and read from the oldest."""
+        turns = journal.Journal(self.filename, max_bytes=100, backups=2)
+        for batch in range(5):
+            turns.start()
+            for number in range(batch * 10, batch * 10 + 10):
+                self.assertTrue(turns.write({'number': number}))
+            turns.stop()
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['turns.jsonl', 'turns.jsonl.1.gz', 'turns.jsonl.2.gz']
+        )
+        self.assertEqual(
+            [entry['number'] for entry in journal.read(self.filename)],
+            range(30, 50)
+        )
+
+    def test_full_queue(self):
+        """Test entries are dropped instead of wait for writer."""
+        turns = journal.Journal(self.filename, queue_size=2)
+        self.assertTrue(turns.write({}))
+        self.assertTrue(turns.write({}))
+        self.assertFalse(turns.write({}))
+        self.assertEqual(turns.dropped, 1)
+
+    def test_io_error(self):
+        """Test writer goes on after error of file and stops in time."""
+        directory = os.path.join(self.directory, 'missing')
+        turns = journal.Journal(os.path.join(directory, 'turns.jsonl'))
+        turns.start()
+        self.assertTrue(turns.write({'number': 0}))
+        started = time.time()
+        while not turns.dropped and time.time() - started < 5:
+            time.sleep(0.01)
+        self.assertEqual(turns.dropped, 1)
+
+        os.mkdir(directory)
+        self.assertTrue(turns.write({'number': 1}))
+        turns.stop()
+        self.assertEqual(
+            list(journal.read(turns.filename)), [{'number': 1}]
+        )
+
+        turns = journal.Journal(self.filename, queue_size=1)
+        turns._thread = threading.Thread(target=lambda: None)  # Dead.
+        turns._thread.start()
+        turns._thread.join()
+        self.assertTrue(turns.write({}))
+        turns.stop()  # Full queue of dead writer does not block.
+        self.assertIsNone(turns._thread)
+
+    def test_dropped_metrics(self):
+        """Test entries dropped by bot are counted in metrics."""
+        bot = self.create_bot()
+        bot.journal = journal.Journal(self.filename, queue_size=1)
+        bot.entry()
+        bot.move(bot._game.get_actions()['attack']['random'])
+        self.assertEqual(bot.journal.dropped, 1)
+        self.assertEqual(
+            bot.metrics.snapshot()['counters']['journal_dropped'], 1
+        )
+
+    def test_bot(self):
+        """Test entries of turns of bot."""
+        bot = self.create_bot()
+        bot.journal = journal.Journal(self.filename)
+        bot.journal.start()
+        bot.entry()
+        bot.move(bot._game.get_actions()['attack']['random'])
+        bot.journal.stop()
+
+        entry, turn = list(journal.read(self.filename))
+        self.assertIsNone(entry['action'])
+        self.assertIsNone(entry['latency'])
+        self.assertEqual(turn['account'], 'Username')
+        self.assertEqual(turn['action'], 'damageRandom')
+        self.assertEqual(turn['location'], u'Южная башня')
+        self.assertGreater(turn['latency'], 0)
+        self.assertEqual(turn['hp'], bot.hero.hp)
+        self.assertIn(u'Ты ударил', turn['log'])
+
+
+class ImportTests(unittest.TestCase):
+
+    """Tests for startup of short-lived processes."""
+
+    heavy = ('lxml', 'requests', 'urltools', 'randua', 'pkg_resources')
+    budget = 0.5  # Seconds for import of command line and games.
+
+    def test_import(self):
+        """Test heavy dependencies are not imported with command line."""
+        code = '; '.join((
+            'import sys, time', 'started = time.time()',
+            'import barbot.cli, barbot.games',
+            'print(time.time() - started)',
+            'print(" ".join(name.split(".")[0] for name in sys.modules))',
+        ))
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=os.path.dirname(__file__) or '.'
+        ).splitlines()
+
+        self.assertLess(float(output[0]), self.budget)
+        self.assertFalse(set(output[1].split()) & set(self.heavy))
+
+    def test_get_game(self):
+        """Test getting class of game by name."""
+        self.assertIs(games.get_game('towers'), towers.Towers)
+        self.assertRaises(exceptions.GameError, games.get_game, 'chess')
+
+
+class URLResolverTests(unittest.TestCase):
+
+    """Tests for `URLResolver` class."""
+
+    def setUp(self):
+        """Create resolver with small cache."""
+        self.resolver = utils.URLResolver(size=2)
+
+    def test_same_as_normalize(self):
+        """Test urls are same as normalized."""
+        page = html.fromstring(get_fixture('towers_battle.html'))
+        links = page.xpath('//a/@href') + [
+            '', '/user', 'a//b', 'a/./b?x=1&a=2', 'user?x=', 'a/../b', 'a%20b'
+        ]
+        for link in links:
+            self.assertEqual(
+                self.resolver(link),
+                urltools.normalize(''.join((constants.HOST, link)))
+            )
+
+    def test_statistics(self):
+        """Test fast links, hits and misses of cache."""
+        for link in ('user', 'a//b', 'a//b', 'a/./b', 'c//d', 'a//b'):
+            self.resolver(link)
+        self.assertEqual(self.resolver.statistics, {
+            'fast': 1, 'hits': 1, 'misses': 4, 'size': 2
+        })
+
+
+class TowersIndexTests(unittest.TestCase):
+
+    """Tests for index of links on saved Towers pages."""
+
+    def setUp(self):
+        """Create `Towers` class with saved page."""
+        self.towers = towers.Towers(session=None)
+        self.towers._capital = u'Южная столица'
+
+    def load(self, name):
+        """Load saved page as response of last move."""
+        self.towers._set_page(html.fromstring(get_fixture(name)))
+
+    def test_get_actions(self):
+        """Test getting actions from index."""
+        self.load('towers_location.html')
+        actions = self.towers.get_actions()
+        self.assertIn('damageRandomLink', actions['attack']['random'])
+        self.assertIn('damageTowerLink', actions['attack']['tower'])
+        self.assertIsNone(actions['heal']['self'])
+        self.assertEqual(len(actions['skills']), 2)
+
+    def test_get_move_urls(self):
+        """Test getting locations by direction."""
+        self.load('towers_location.html')
+        self.assertEqual(len(self.towers.get_move_backward_urls()), 2)
+        self.assertEqual(len(self.towers.get_move_forward_urls()), 1)
+        self.assertIn(':0:locationLink', self.towers.get_move_capital_url())
+
+    def test_get_action_url_not_indexed(self):
+        """Test getting url by part which is not in actions."""
+        self.load('towers_quiet.html')
+        self.assertIn('refreshLink', self.towers.get_action_url('refresh'))
+        self.assertIsNone(self.towers.get_action_url('damageRandom'))
+
+    def test_get_actions_lazy(self):
+        """Test actions are resolved on access and kept until next page."""
+        self.load('towers_location.html')
+        calls = []
+        get_action_url = self.towers.get_action_url
+
+        def counter(url_part):
+            calls.append(url_part)
+            return get_action_url(url_part)
+
+        self.towers.get_action_url = counter
+        actions = self.towers.get_actions()
+        self.assertEqual(calls, [])
+        actions['attack']['tower']
+        self.assertIs(self.towers.get_actions()['attack'], actions['attack'])
+        self.assertEqual(calls, ['damageTower'])
+
+        self.assertRaises(TypeError, actions.__setitem__, 'attack', None)
+        self.assertEqual(actions, actions.copy())
+        self.assertIsInstance(actions.copy()['move'], dict)
+
+        self.load('towers_quiet.html')
+        self.assertIsNot(self.towers.get_actions(), actions)
+        self.assertIsNone(self.towers.get_actions()['attack']['tower'])
+
+    def test_get_actions_override(self):
+        """Test bound methods and url parts added by `get_actions`."""
+        self.load('towers_location.html')
+        actions = self.towers.get_actions({'extra': {
+            'skills': self.towers.get_skills_url, 'attack': 'damageRandom',
+        }})
+        self.assertEqual(
+            actions['extra']['skills'], self.towers.get_skills_url()
+        )
+        self.assertEqual(
+            actions['extra']['attack'], actions['attack']['random']
+        )
+
+    def test_get_actions_schema(self):
+        """Test schema of actions is merged once per class."""
+        schema = towers.Towers._get_schema()
+        self.assertIs(towers.Towers(session=None)._get_schema(), schema)
+        self.assertEqual(
+            sorted(schema['attack']), ['last', 'random', 'tower']
+        )
+        self.assertNotIn('move', games.Game._get_schema())
+
+
+class StreamingTests(ServerTestCase):
+
+    """Tests for parse of pages by chunks with early stop."""
+
+    def split(self, content, size):
+        """Split content to chunks of size."""
+        return (content[i:i + size] for i in range(0, len(content), size))
+
+    def test_towers(self):
+        """Test equality of actions after full and streaming parse."""
+        for name in ('towers_location.html', 'towers_quiet.html',
+                     'towers_battle.html'):
+            content = get_fixture(name)
+            games = []
+            for page in [html.fromstring(content)] + [
+                utils.parse_stream(
+                    self.split(content, size), towers.Towers.stream_stop
+                )
+                for size in (256, 1024, 4096)
+            ]:
+                game = towers.Towers(session=None)
+                game._capital = u'Южная столица'
+                game._set_page(page)
+                games.append(game)
+
+            for game in games[1:]:
+                self.assertEqual(game._index, games[0]._index)
+                self.assertEqual(
+                    game.get_action_log(), games[0].get_action_log()
+                )
+                self.assertEqual(game._location, games[0]._location)
+
+    def test_hero(self):
+        """Test equality of hero status after full and streaming parse."""
+        content = get_fixture('user.html')
+        page = utils.parse_stream(
+            self.split(content, 256), barbot.Hero.stream_stop
+        )
+        self.assertNotIn(b'hero_body', html.tostring(page))
+
+        session = requests.Session()
+        session.cookies['id'] = '1'
+        hero = barbot.Hero(session)
+        self.assertTrue(hero._update_status(page))
+        self.assertEqual((hero.hp, hero.ep), (1240, 310))
+        self.assertFalse(hero._tired)
+
+    def test_tire(self):
+        """Test tire link anywhere in content is parsed before stop."""
+        tire = b'<div class="block"><a href="user/tire">tire</a></div>\n'
+        for name, stop in (('towers_battle.html', towers.Towers.stream_stop),
+                           ('towers_quiet.html', towers.Towers.stream_stop),
+                           ('user.html', barbot.Hero.stream_stop)):
+            content = get_fixture(name)
+            for marker in (b'<body>\n', b'<div class="footer">'):
+                tired = content.replace(marker, (
+                    marker + tire if marker.startswith(b'<body') else
+                    tire + marker
+                ))
+                page = utils.parse_stream(self.split(tired, 256), stop)
+                self.assertTrue(barbot.get_status(page)[2], (name, marker))
+
+    def test_server_tire(self):
+        """Test tired hero stops game with streaming parse."""
+        self.server.application._tire = 2
+        with open(self.config, 'a') as f:
+            f.write('[parser]\nstreaming = True\nchunk_size = 256\n')
+
+        player = strategies.Player(self.create_bot())
+        player.start()
+        while not player.is_over:
+            player.turn()
+            self.assertLessEqual(player.turns, 2)
+        self.assertEqual(player.turns, 2)
+
+    def test_server(self):
+        """Test game with streaming parse on local server."""
+        with open(self.config, 'a') as f:
+            f.write('[parser]\nstreaming = True\nchunk_size = 256\n')
+
+        player = strategies.Player(self.create_bot())
+        player.start()
+        for _ in range(3):
+            self.assertTrue(player.turn())
+        self.assertTrue(player.bot.get_action_log())
+        self.assertFalse(player.is_over)
+
 if __name__ == '__main__':
     unittest.main()